@@ -279,6 +279,9 @@ def fetch_rois(orig_h5, seg_iface, area, plane, num_planes=3):
     ids = tsah["value"]["%d"%(area+1)]["imagingPlane"]["%d"%plane]["ids"]
     roi_ids = ids["ids"].value
     lookup = tsah["value"]["%d"%(area+1)]["ids"]["ids"].value
+    names = []
+    descs = []
+    pixmaps = []
     for i in range(len(roi_ids)):
         rid = roi_ids[i]
         if num_planes == 1:
@@ -292,18 +295,17 @@ def fetch_rois(orig_h5, seg_iface, area, plane, num_planes=3):
         pix = parse_h5_obj(record["indicesWithinImage"])[0]
         # pix = record["indicesWithinImage/indicesWithinImage"].value
         # dt = np.dtype((np.uint16, (2)))
+        pix = np.asarray(pix).reshape(-1)
         pixmap = np.zeros([len(pix),2], dtype=np.uint16)
-        for j in range(len(pix)):
-            v = pix[j]
-            px = int(v / 512)
-            py = int(v) % 512
-            # pixmap.append([py,px])
-            pixmap[j][0] = np.uint16(py)
-            pixmap[j][1] = np.uint16(px)
-        # weight = np.zeros(len(pixmap)) + 1.0
-        weight = np.zeros(len(pix)) + 1.0
-        #- seg_iface.add_roi_mask_pixels(image_plane, "%d"%x, "ROI %d"%x, pixmap, weight, 512, 512)
-        ut.add_roi_mask_pixels(seg_iface, image_plane, "%d"%x, "ROI %d"%x, pixmap, weight, 512, 512)
+        # pixmap.append([py,px])
+        pixmap[:,0] = pix.astype(int) % 512
+        pixmap[:,1] = (pix / 512).astype(int)
+        names.append("%d"%x)
+        descs.append("ROI %d"%x)
+        pixmaps.append(pixmap)
+    # weights are all 1.0
+    #- seg_iface.add_roi_mask_pixels(image_plane, "%d"%x, "ROI %d"%x, pixmap, weight, 512, 512)
+    ut.add_roi_masks(seg_iface, image_plane, names, descs, pixmaps, width=512, height=512)
 
 
 # map between ROI ID in imaging plane and dF/F row valueMatrix:
@@ -0,0 +1,48 @@
+# This script times combining messages (function combine_messages in
+# combine_messages.py), which is used when displaying validation messages and
+# the output of h5diffsig.  It makes a list of synthetic messages (default
+# 1,000,000) similar to those made when validating or comparing large files,
+# many of which differ only by numbers, then combines them.
+
+import sys
+import time
+import random
+from nwb import combine_messages as cm
+
+def error_exit(msg):
+    if msg:
+        print(msg)
+    print ("Format is")
+    print ("%s [<num_messages>]" % sys.argv[0])
+    print ("where:")
+    print ("  <num_messages> - number of messages to combine.  Default is 1000000.")
+    sys.exit(1)
+
+def make_messages(num_messages):
+    # make messages of several kinds, some with more than one number
+    r = random.Random(1)
+    kinds = [
+        lambda i: "/acquisition/timeseries/trial_%i/data" % i,
+        lambda i: "/processing/module_%i/Clustering/cluster_%i - description" % (i % 8, i),
+        lambda i: "/epochs/epoch_%i: (group) custom_attribute_%i" % (i, i % 5),
+        lambda i: "/stimulus/presentation/image_%05i: missing attribute" % i,
+        lambda i: "%i-bit value %i at /analysis/roi_%i" % (r.choice([8, 16, 32]),
+            r.randint(0, 1000), i),
+        lambda i: "/general/message without numbers %s" % "abcdefgh"[i % 8],
+    ]
+    messages = [kinds[i % len(kinds)](i) for i in range(num_messages)]
+    r.shuffle(messages)
+    return messages
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        error_exit("Too many arguments")
+    try:
+        num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    except ValueError:
+        error_exit("Invalid number of messages: '%s'" % sys.argv[1])
+    messages = make_messages(num_messages)
+    t0 = time.time()
+    combined = cm.combine_messages(messages)
+    print ("combined %i messages into %i in %.2f seconds" % (len(messages), len(combined),
+        time.time() - t0))
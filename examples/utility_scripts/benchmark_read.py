@@ -0,0 +1,69 @@
+# This script times reading (and validating) a large NWB file.
+# It creates a file with many TimeSeries (default about 50,000 nodes) then
+# opens it in read mode, which loads every node, matches each node to the
+# format specification (function find_matching_id in h5gate.py) and validates
+# the file.  Useful for checking the speed of changes to the API.
+
+import sys
+import os
+import time
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+def error_exit(msg):
+    if msg:
+        print(msg)
+    print ("Format is")
+    print ("%s [<num_nodes> [<file_name>]]" % sys.argv[0])
+    print ("where:")
+    print ("  <num_nodes> - approximate number of nodes (groups and datasets) in file.")
+    print ("        Default is 50000.")
+    print ("  <file_name> - name of file to create.  Default is 'benchmark_read.nwb'.")
+    print ("        If the file exists, it is read without being created again.")
+    sys.exit(1)
+
+# each TimeSeries has a group and three datasets (data, timestamps and num_samples)
+nodes_per_timeseries = 4
+
+def create_file(file_name, num_nodes):
+    settings = {}
+    settings["file_name"] = file_name
+    settings["identifier"] = utils.create_identifier("read benchmark")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "File with many nodes for timing reading"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    num_timeseries = max(1, num_nodes // nodes_per_timeseries)
+    for i in range(num_timeseries):
+        ts = f.make_group("<TimeSeries>", "ts%i" % i, path="/acquisition/timeseries",
+            attrs={"source": "benchmark"})
+        ts.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+            "conversion": 1.0, "resolution": 1.0})
+        ts.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    f.close()
+    return num_timeseries
+
+def read_file(file_name):
+    f = nwb_file.open(file_name, mode="r", verbosity="none")
+    num_nodes = len(f.path2node)
+    errors = f.close()
+    return (num_nodes, errors)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3:
+        error_exit("Too many arguments")
+    try:
+        num_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    except ValueError:
+        error_exit("Invalid number of nodes: '%s'" % sys.argv[1])
+    file_name = sys.argv[2] if len(sys.argv) > 2 else "benchmark_read.nwb"
+    if not os.path.exists(file_name):
+        t0 = time.time()
+        num_timeseries = create_file(file_name, num_nodes)
+        print ("created %s with %i TimeSeries in %.2f seconds" % (file_name,
+            num_timeseries, time.time() - t0))
+    t0 = time.time()
+    num_nodes, errors = read_file(file_name)
+    print ("read %s, %i nodes in %.2f seconds" % (file_name, num_nodes, time.time() - t0))
+    print ("validation result: %s" % errors)
@@ -3,87 +3,44 @@
 # hdf5 (nwb) file contents which can be used to compare one hdf5 to another.
 
 import sys
-import glob
-import os, fnmatch
-from subprocess import check_output
-from sys import version_info
+import os
+from nwb import h5sig_batch
 
 def error_exit(msg):
     if msg:
         print(msg)
     print ( "Format is")
-    print ("%s <dir_or_file> <output_dir> [<extension>]" % sys.argv[0])
+    print ("%s [-j <processes>] [-c <cache_file>] <dir_or_file> <output_dir> [<extension>]" % sys.argv[0])
     print ("where:")
     print ("  <dir_or_file> - either a directory containing hdf5/nwb files or")
     print ("        a single hdf5/nwb file.")
     print ("  <output_dir>  - output directory for storing generated h5diffsig output file(s)")
     print ("  <extensions>   - comma separated list of  extension to use to find nwb or hdf5 files.")
     print ("        Default is 'nwb,h5'.  Other common values may include 'hdf5'.")
+    print ("  <processes> - number of processes used.  Default is number of CPUs.")
+    print ("  <cache_file> - file for saving signatures between runs, so files that have not")
+    print ("        changed are not processed again.  Default is no cache.")
     sys.exit(1)
 
-# the command that is run
-command = ['python', '-m', 'nwb.h5diffsig']
+# h5diffsig options used.
+# N option to filter NWB 'variable' datasets, e.g. /file_create_date
+# a option, to sort output (groups / datasets) alphabetically
+h5diffsig_options = "Na"
 
-# py3: convert bytes to str (unicode) if Python 3   
-def make_str3(val):
-    if isinstance(val, bytes) and version_info[0] > 2:
-        return val.decode('utf-8')
-    else:
-        return val
-
-
-
-def process_file(dirpath, filename, output_dir, output_path, extension):
-    # output path is path to create inside output_dir
-    global command
-#     print("process_file output_path=%s, dirpath=%s, filename=%s, output_dir=%s, extension=%s\n" %
-#         (output_path, dirpath, filename, output_dir, extension))
-    output_file_name = "%stxt" % filename[0:-len(extension)]
-#     print ("output_file_name=%s" % output_file_name)
-    input_file = os.path.join(dirpath, filename)
-    # N option to filter NWB 'variable' datasets, e.g. /file_create_date
-    # a option, to sort output (groups / datasets) alphabetically
-    cmd = command + [input_file] + ["-Na"]
-    command_str = " ".join(cmd)
-    if output_path != "":
-       output_dir = os.path.join(output_dir, output_path)
-       if not os.path.exists(output_dir):
-           os.makedirs(output_dir)
-    outpath = os.path.join(output_dir, output_file_name)
-    print ("doing %s > %s" % (command_str, outpath))
-    output = make_str3(check_output(cmd))
-    with open(outpath, "w") as f:
-        f.write(output)
-    
-def get_extension(file, extensions):
-    # returns extension in list extensions file ends with or None
-    extension = [e for e in extensions if file.endswith(".%s" % e)]
-    assert len(extension) <= 1
-    extension = extension[0] if len(extension) == 1 else None
-    return extension
-    
-def process_files(input_dir_or_file, output_dir, extensions):
-    # convert comma separated string to list for use with get_extension
+def process_files(input_dir_or_file, output_dir, extensions, processes=None, cache_file=None):
+    # signatures are made by running h5diffsig in a pool of processes.  See nwb/h5sig_batch.py
+    # convert comma separated string to list for use with find_hdf5_files
     extensions = extensions.split(",")
-    if os.path.isfile(input_dir_or_file):
-        dirpath, filename = os.path.split(input_dir_or_file)
-        extension = get_extension(filename, extensions)
-        if extension is None:
-            print("Single file specified, but does not end with extension '%s': %s" % (
-                extension, filename))
-            sys.exit(1)
-        output_path = ""
-        process_file(dirpath, filename, output_dir, output_path, extension)
-    else:
-        # input_dir_or_file is a directory, processes files within it
-        for dirpath, dirnames, filenames in os.walk(input_dir_or_file):
-            #for filename in [f for f in filenames if f.endswith(textensions)]:
-            for filename in filenames:
-                extension = get_extension(filename, extensions)
-                if extension is not None:
-                    assert dirpath.startswith(input_dir_or_file)
-                    output_path = dirpath[len(input_dir_or_file):].lstrip("/")
-                    process_file(dirpath, filename, output_dir, output_path, extension)
+    files = h5sig_batch.find_hdf5_files(input_dir_or_file, extensions)
+    if os.path.isfile(input_dir_or_file) and not files:
+        print("Single file specified, but does not end with extension '%s': %s" % (
+            extensions, input_dir_or_file))
+        sys.exit(1)
+    records = h5sig_batch.make_signatures(files, output_dir, options=h5diffsig_options,
+        processes=processes, cache_file=cache_file, report=sys.stdout)
+    print (h5sig_batch.summarize(records))
+    if [r for r in records if r['status'] == 'error']:
+        sys.exit(1)
 
 def clear_directory(path):
     if os.path.isdir(path):
@@ -109,15 +66,24 @@ def clear_output_directory(output_option):
 #     os.remove(f)
 
 if __name__ == '__main__':
-    if len(sys.argv) not in (3,4):
+    args = sys.argv[1:]
+    opts = {'-j': None, '-c': None}
+    while len(args) > 1 and args[0] in opts:
+        opts[args[0]] = args[1]
+        args = args[2:]
+    if len(args) not in (2,3):
         error_exit("Invalid number of command line arguments: %s" % len(sys.argv))
-    input_dir_or_file = sys.argv[1]
-    output_dir = sys.argv[2]
-    extensions = "nwb,h5" if len(sys.argv) == 3 else sys.argv[3]
+    input_dir_or_file = args[0]
+    output_dir = args[1]
+    extensions = "nwb,h5" if len(args) == 2 else args[2]
     if not os.path.exists(input_dir_or_file):
         error_exit("Input <dir_or_file> does not exist: %s" % input_dir_or_file)
     if not os.path.isdir(output_dir):
         error_exit("Output <dir_or_file> does not exist: %s" % output_dir)  
+    try:
+        processes = int(opts['-j']) if opts['-j'] else None
+    except ValueError:
+        error_exit("Invalid number of processes: %s" % opts['-j'])
     # clear_output_directory(output_dir)
-    process_files(input_dir_or_file, output_dir, extensions)
+    process_files(input_dir_or_file, output_dir, extensions, processes, opts['-c'])
     
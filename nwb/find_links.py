@@ -7,6 +7,7 @@ import h5py
 import copy
 import numpy as np
 import operator
+from collections import deque
 # import warnings
 
 from . import value_summary as vs
@@ -134,16 +135,21 @@ def find_links(fp, links):
     Also makes a dictionary in links, links['sl_from_to'] (sl stands for 'soft link').
     This stores the source and target for each soft link.  It is used
     in function merge_soft_links to merge soft link groups that point
-    to the same target through a chain of soft links."""
+    to the same target through a chain of soft links.
+    Also saves the name, type and object number of members of each group in
+    links['members'], so the groups do not need to be listed again when reading
+    the file."""
     global h5_ntypes
     fid = fp.id
     root = h5py.h5g.open(fid, b'/') #py3, b added, was: open(fid, '/')
     np = (root, '/')  # np - node & path, h5 object and path
     # groups_to_visit = [ f["/"],]
-    groups_to_visit = [ np,]
+    groups_to_visit = deque([np])
     while groups_to_visit:
-        np = groups_to_visit.pop(0)
+        np = groups_to_visit.popleft()
         h5g, path = np
+        members = []
+        links['members'][vs.make_str3(path)] = members
         for i in range(h5g.get_num_objs()):
             mname = h5g.get_objname_by_idx(i)
             mtype = h5_ntypes[h5g.get_objtype_by_idx(i)]
@@ -166,6 +172,7 @@ def find_links(fp, links):
             else:
                 full_path = path + b"/" + mname  #py3, b added
             save_info(mtype, objno, full_path, target, links)
+            members.append((vs.make_str3(mname), mtype, objno))
             if mtype == 'group':
                 mh5g = h5py.h5g.open(h5g, mname)
                 mnp = (mh5g, full_path)
@@ -418,7 +425,8 @@ def initialize():
          'sl_from_to': {},
          'targets_created': {'hard': {}, 'soft': {}},
          'missing_links': {'hard': {}, 'soft': {}},
-         'count': {'group': 0, 'dataset': 0}
+         'count': {'group': 0, 'dataset': 0},
+         'members': {}
          }
     return links  
 
@@ -438,6 +446,7 @@ def find(fp, links):
           'hard': {'loc1': ('from1', 'from2', ...), 'loc2': ('from3', 'from4', ...) }
           'soft': {'loc4': ('from6', 'from7', ...), 'loc5': ('from8', 'from9', ...) }
       'count': {'group': <number_groups>, 'dataset': <number_datasets> }
+      'members': {'group_path1': [(name1, type1, objno1), (name2, type2, objno2), ...], ... }
     }
     Where:
     'lg': contains the hard and soft "link groups".  Structure is:
@@ -763,15 +772,19 @@ def node_matches_tsig(node, tsig):
     # everything matches
     return True
 
-def fill_missing_links(f):
-    """ Fill in any links that were missing targets at time link source was read in"""
+def fill_missing_links(f, allow_missing=False):
+    """ Fill in any links that were missing targets at time link source was read in.
+    Links filled in are removed from missing_links.  If allow_missing is True, links with
+    targets not yet loaded (when using option lazy_load) are left in missing_links,
+    otherwise they are reported as an error."""
     missing_targets = {'hard': [], 'soft': []}
     for link_type in ('hard', 'soft'):
-        for loc in f.links['missing_links'][link_type]:
+        for loc in list(f.links['missing_links'][link_type]):
             from_paths = f.links['missing_links'][link_type][loc]
             if loc not in f.links['targets_created'][link_type]:
                 missing_targets[link_type].append(loc)
             else:
+                del f.links['missing_links'][link_type][loc]
                 target_path = f.links['targets_created'][link_type][loc]
                 target_node = f.path2node[target_path]
                 for from_path in from_paths:
@@ -783,7 +796,7 @@ def fill_missing_links(f):
                     # save_info(objtype, objno, path, target, links):
                     ### Actually, don't save link info.  It's already saved when reading
                     # save_info("link", None, from_node.full_path, target_node.full_path, f.links)
-    if missing_targets['hard'] or missing_targets['soft']:
+    if (missing_targets['hard'] or missing_targets['soft']) and not allow_missing:
         print ("*** Link targets were missing when reading file:")
         for link_type in ('hard', 'soft'):
             for loc in missing_targets[link_type]:
@@ -975,19 +988,50 @@ def compute_autogens(f, op, ftype):
         a = f.autogen[i]
         i = i + 1
         if op(a['agtype'], ftype):
-            compute_autogen(f, a)  # singular, not plural
+            if autogen_changed(f, a):
+                compute_autogen(f, a)  # singular, not plural
+            else:
+                # not changed (option incremental_autogen).  Skip update and validation
+                a['agvalue'] = None
+
+def autogen_changed(f, a):
+    """ Return True if autogen "a" needs to be computed because something in the enclosing
+    group changed, or because a link was made to the enclosing group (or one of its parents).
+    This is used for option incremental_autogen."""
+    changed_groups = f.get_changed_groups()
+    if changed_groups is None:
+        # not using incremental_autogen, all need to be computed
+        return True
+    if a['aid'] and a['ctype'] == 'group':
+        enclosing_path = a['node_path']
+    else:
+        enclosing_path = get_parent_path(a['node_path'])
+    if enclosing_path in changed_groups:
+        return True
+    # check for link to a group containing the enclosing group
+    path = enclosing_path
+    while path != "/":
+        path = get_parent_path(path)
+        if path in f.changed_link_targets:
+            return True
+    return False
 
     
 def update_autogens(f, op, ftype):
     """ Update all autogens that have type (equal or not equeal) to ftype.
     op is an operator, either ne or eq"""
-    # use index to go though so new ones can be added within the loop
-    i = 0
-    while i < len(f.autogen):
-        a = f.autogen[i]
-        i = i + 1
-        if op(a['agtype'], ftype):
-            update_autogen(f, a)   # singular, not plural
+    # buffer attribute values so all those for one node are written together
+    f.buffer_attributes()
+    try:
+        # use index to go though so new ones can be added within the loop
+        i = 0
+        while i < len(f.autogen):
+            a = f.autogen[i]
+            i = i + 1
+            if op(a['agtype'], ftype):
+                update_autogen(f, a)   # singular, not plural
+    finally:
+        f.flush_attributes()
 
     
 
@@ -1164,17 +1208,19 @@ def compute_autogen(f, a):
         values = set()
         for node in agtarget_nodes:
             path = node.full_path
-            nv = f.file_pointer[path].value
+            h5node = f.file_pointer[path]
+            if isinstance(h5node, h5py.Dataset) and h5node.shape and len(h5node.shape) == 1:
+                # read in blocks so entire dataset is not loaded into memory
+                for nv in iter_dataset_blocks(h5node):
+                    values.update(get_unique_values(nv))
+                continue
+            nv = h5node.value
             if not isinstance(nv, (list, tuple, np.ndarray)):
                 f.error.append("%s: autogen values must be list.  Found type: "
                     "%s at target:\n%s\nvalue found:%s" % (a['node_path'], type(nv), 
                     path, nv))
                 return
-            # convert any numpy.bytes_ to regular bytes.  This prevents crash in Python 3
-            # when using variable length strings
-            nv = [bytes(x) if isinstance(x, np.bytes_) else x for x in nv]
-            snv = set(nv)
-            values = values.union(snv)
+            values.update(get_unique_values(nv))
         lvalues = list(values)
         lvalues = natural_sort(lvalues)
         a['agvalue'] = lvalues
@@ -1182,7 +1228,13 @@ def compute_autogen(f, a):
         # get length of target
         path = agtarget_nodes[0].full_path
         try:
-            val = f.file_pointer[path].value
+            h5node = f.file_pointer[path]
+            if isinstance(h5node, h5py.Dataset) and h5node.shape:
+                # get length from shape so value does not need to be read
+                val = None
+                length = h5node.shape[0]
+            else:
+                val = h5node.value
         except KeyError:
             # unable to get value.  See if this is an external link
             # if hasattr(agtarget_nodes[0], 'link_info') and 'extlink' in agtarget_nodes[0].link_info:
@@ -1208,7 +1260,8 @@ def compute_autogen(f, a):
 #                 sys.exit(1)
         else:
             try:
-                length = len(val)
+                if val is not None:
+                    length = len(val)
             except TypeError as e:
                 msg = "%s: autogen unable to determine length of '%s' error is: '%s'" % (
                     a['node_path'], path, e)
@@ -1223,6 +1276,32 @@ def compute_autogen(f, a):
     if isinstance(a['agvalue'], list) and len(a['agvalue']) == 0:
         a['agvalue'] = np.empty([0,], dtype=np.string_)
 
+def get_unique_values(nv):
+    """ Return set of values in nv (a list or numpy array) used for autogen 'values'"""
+    if isinstance(nv, np.ndarray) and nv.ndim == 1:
+        try:
+            nv = np.unique(nv)
+        except TypeError:
+            # unable to sort values (e.g. mixed types in object array), use set below
+            pass
+    # convert any numpy.bytes_ to regular bytes.  This prevents crash in Python 3
+    # when using variable length strings
+    nv = [bytes(x) if isinstance(x, np.bytes_) else x for x in nv]
+    return set(nv)
+
+def iter_dataset_blocks(dset, block_bytes = 2**20):
+    """ Generator returning consecutive blocks (slices along the first dimension) of
+    h5py dataset dset.  Each block is about block_bytes in size, rounded to a multiple
+    of the chunk length if the dataset is chunked, so chunks are only read once."""
+    length = dset.shape[0]
+    row_bytes = max(1, dset.dtype.itemsize * int(np.prod(dset.shape[1:])))
+    block_length = max(1, block_bytes // row_bytes)
+    if dset.chunks:
+        chunk_length = dset.chunks[0]
+        block_length = max(1, block_length // chunk_length) * chunk_length
+    for start in range(0, length, block_length):
+        yield dset[start:start + block_length]
+
 def process_ag_create(f, a, enclosing_node):
     """ process autogen "create" type.  This creates group members
     that are specified to be created which are required and do not exist.
@@ -1768,9 +1847,8 @@ def update_autogen(f, a):
             if not a['agvalue'] and not a['include_empty']:
                 # value is something that evaluates as False (empty) and it should not be
                 # included as an attribute because 'include_empty' is False
-                if aid in f.file_pointer[a['node_path']].attrs:
-                    # delete attribute if it's present
-                    del f.file_pointer[a['node_path']].attrs[aid]
+                # delete attribute if it's present
+                f.delete_attribute(a['node_path'], aid)
             else:
                 # attribute value should be saved in hdf5 file
                 f.set_attribute(a['node_path'], aid, a['agvalue'])
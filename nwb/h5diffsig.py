@@ -8,7 +8,10 @@ import h5py
 # import copy
 import numpy as np
 import zlib
+import heapq
+import multiprocessing
 from operator import itemgetter
+from collections import deque
 # import combine_messages as cm
 from . import combine_messages as cm
 # from . import find_links
@@ -24,7 +27,7 @@ def display_doc():
     print ("Usage: %s <file1> [<file2>] [<opts>]" % sys.argv[0])
     print ("where: <file1> first file to compare")
     print ("       <file2> second file to compare, or empty, to generate 'signature' for <file1>")
-    print ("       <opts> is a string starting with '-', followed by any of: 'N', 'a'.  These are:")
+    print ("       <opts> is a string starting with '-', followed by any of: 'N', 'a', 'S', 'P'.  These are:")
     print ("          'N' - filter signature output to allow matching NWB files.")
     print ("              Filtering removes or places characters '<%' and '%>' around the output of the")
     print ("              command lines and the the datasets which are likely to vary across NWB")
@@ -36,6 +39,13 @@ def display_doc():
     print ("              This useful for signatures because it prevents output lines")
     print ("              getting out of order between files due to differences in the sizes")
     print ("              of a dataset or attribute.")
+    print ("          'S' - Stream large numeric datasets, comparing them block by block (aligned")
+    print ("              to storage chunks) instead of reading both into memory.  Comparison stops")
+    print ("              at the first block that does not match.  Datasets with the same chunking")
+    print ("              and filters are first compared using the stored (raw) chunks.")
+    print ("          'P' - Compare groups in parallel using a pool of processes (one per CPU).")
+    print ("              The group tree is partitioned into subtrees which are compared by")
+    print ("              separate processes.  The output is the same as without this option.")
 
 
 
@@ -241,6 +251,10 @@ def error_exit(msg = None):
     traceback.print_stack()
     sys.exit(1)
 
+# estimated work to compare a node, not including reading values, in the same units as
+# dataset sizes (bytes).  Used to balance work between processes (option 'P')
+node_weight = 2**16
+
 # datasets that are likely to vary across NWB files.  The value, size and dtype are
 # filtered out if NWB filter ("N") option is specified.
 nwb_variable_datasets = ("/file_create_date", "/identifier",
@@ -490,136 +504,9 @@ def h_combine_messages(messages, description):
     return cmsg
  
 
-def find_hard_links():
-    # search ci["locations"] for locations with multiple entries
-    # if found, copy them to ci["hard_links_found"]
-    global ci
-    for ab in ("A", "B"):
-        for loc in sorted(list(ci["locations"][ab])):
-            nodes = ci["locations"][ab][loc]
-            if len(nodes) > 1:
-                # found one or more hard links
-                paths = []
-                type = None
-                for node in nodes:
-                    path, typ = node
-                    if not type:
-                        type = typ
-                    else:
-                        assert type == typ
-                    paths.append(path)
-                pathsc = h_combine_messages(paths, type + "s")
-                # want output like
-                #  1. id=(343, 3443).  34 groups (3 combined):
-                pathsc[0] = "id=%s. %s" % (loc, pathsc[0])
-                msg = "\n\t".join(pathsc)
-                ci["hard_links"][ab][type].append(msg)
-
-
-def save_soft_link(ab, cim):
-    # cim is the dict created for members of group by function 
-    # get_group_info.  If this is a link (i.e. hdf5 soft link or ext_link)
-    # save information about the link in ci.
-    # ab is either "A" or "B"
-    global ci
-    if cim['type'] not in ("link", "ext_link"):
-        return
-    full_path = cim['full_path']
-    target = cim['target']
-    # msg = "%s: %s => %s" % (cim['type'], full_path, target)
-    if cim['type'] == "link":
-        target_type = cim['ttype'] if cim['ttype'] else "unknown"
-        if target in ci["tmp_soft_links"][ab][target_type]:
-            ci["tmp_soft_links"][ab][target_type][target].append(full_path)
-        else:
-            ci["tmp_soft_links"][ab][target_type][target] = [full_path]
-    else:
-        msg = "%s: %s => %s" % (cim['type'], full_path, target)
-        ci["ext_links"][ab].append(msg)
-    return
-
-def format_soft_links():
-    # Convert soft_links from a dictionary of targets: [paths] in tmp_soft_links
-    # to text representing that in ci["soft_links"]
-    for ab in ("A", "B"):
-        for type in ci["tmp_soft_links"][ab]:
-            dmsg = ci["soft_links"][ab][type]  # destination for messages
-            for target in sorted(ci["tmp_soft_links"][ab][type].keys()):
-                paths = ci["tmp_soft_links"][ab][type][target]
-                pathsc = h_combine_messages(paths, type + "s")
-                # want output like
-                # to: "target" 200 groups (3 combined):
-                try:
-                    # pathsc[0] = b"to: \"%s\" %s" % (target, pathsc[0].encode('utf8'))  #py3, added b, .encode('utf8')
-                    pathsc[0] = "to: \"%s\" %s" % (target, pathsc[0])
-                    # msg = b"\n\t".join(pathsc)  #py3, added b
-                    msg = "\n\t".join(pathsc)
-                except TypeError as e:
-                    error_exit("unable to format_soft_links")
-                dmsg.append(msg)
-  
-def check_link_equivalence():
-    # checks to be sure that groups formed by links (hard or soft) are
-    # equivalent
-    global single_file
-    errors = []
-    num_link_groups = {"A": {"hard": {"group": 0, "dataset": 0}, "soft": {"group": 0, "dataset": 0}},
-                      "B": {"hard": {"group": 0, "dataset": 0}, "soft": {"group": 0, "dataset": 0}}}
-    for source_ab in ("A", "B"):
-        dest_ba = "B" if source_ab is "A" else "A"
-        for hard_loc in sorted(list(ci["locations"][source_ab])):
-            hard_group_paths, type = get_hard_group_paths(source_ab, hard_loc)
-            if hard_group_paths:
-                num_link_groups[source_ab]["hard"][type] += 1
-                validate_group(source_ab, "hard", type, hard_group_paths, dest_ba, errors)
-        for target_type in ("group", "dataset"):
-            for target in ci["tmp_soft_links"][source_ab][target_type]:
-                num_link_groups[source_ab]["soft"][target_type] += 1
-                soft_group_paths = [target] + ci["tmp_soft_links"][source_ab][target_type][target]
-                validate_group(source_ab, "soft", target_type, soft_group_paths, dest_ba, errors)
-    if errors:
-        print ("%s" % ("** Above links are NOT equivalent:\n\t" + "\n\t".join(errors)))
-    else:
-        nlg = num_link_groups
-        total_found = (nlg["A"]["hard"]["group"] + nlg["A"]["hard"]["dataset"] +
-            nlg["A"]["soft"]["group"] + nlg["A"]["soft"]["dataset"] +
-            nlg["B"]["hard"]["group"] + nlg["B"]["hard"]["dataset"] + 
-            nlg["B"]["soft"]["group"] + nlg["B"]["soft"]["dataset"])
-        if total_found == 0:
-            print ("** No links found.")
-        else:
-            print ("** Above found links are equivalent. -- Good.\n   Total of %i link groups found:\n   %s" %(
-                total_found, ppdict(num_link_groups)))
-                # total_found, pp.pformat(num_link_groups)))
-                # str(num_link_groups)))  # prev version, would not sort keys
-        if not single_file:
-            print (("   Note: links inside unpaired groups will not be found.  To guarantee "
-                "finding all links, run script with just one file (comparing it to itself)."))
-                
-                
-def validate_group(source_ab, source_link_type, type, paths, dest_ba, errors):
-    """ make sure that all paths in paths are in a group in dest_ba and that
-    the type (group or dataset) matches"""
-    # pick any path for searching
-    path = paths[0]
-    # look for path in hard link group
-    for hard_loc in sorted(list(ci["locations"][dest_ba])):
-        hard_group_paths, hl_type = get_hard_group_paths(dest_ba, hard_loc)
-        if hard_group_paths and hl_type == type and path in hard_group_paths:
-            validate_groups_match(source_ab, source_link_type, type, paths, dest_ba, errors, 
-                hard_group_paths, "hard")
-            return
-    # look for path in soft link group
-    for target in ci["tmp_soft_links"][dest_ba][type].keys():
-        soft_group_paths = [target] + ci["tmp_soft_links"][dest_ba][type][target]
-        if path in soft_group_paths:
-            validate_groups_match(source_ab, source_link_type, type, paths, dest_ba, errors, 
-                soft_group_paths, "soft")
-            return
-    msg = "Unable to find links in %s matching %s in %s with path='%s'" % (
-        dest_ba, type, source_ab, path)
-    errors.append(msg)
-    
+
+
+
 def validate_groups_match(source_ab, source_link_type, type, source_paths, dest_ba, errors, 
                 dest_paths, dest_link_type):
     sp = set(source_paths)
@@ -630,29 +517,10 @@ def validate_groups_match(source_ab, source_link_type, type, source_paths, dest_
             type, source_ab, source_paths, dest_ba, dest_paths)
         errors.append(msg)
         
-def get_hard_group_paths(ab, loc):
-    """get list of paths at loc and also type if more than one path, otherwise
-    return tuple (None, None)"""
-    nodes = ci["locations"][ab][loc]
-    if len(nodes) == 1:
-        # no hard links to this location
-        return (None, None)
-    # found one or more hard links
-    paths = []
-    type = None
-    for node in nodes:
-        path, typ = node
-        if not type:
-            type = typ
-        else:
-            assert type == typ
-        paths.append(path)
-    return (paths, type)
 
 
 # Initialize "compare info" (ci) structure
 def initialize_ci():
-    global ci
     ci = {
         "only_in": {
             "A": {"group": [], "dataset": [], "attribute": [], "other": []},
@@ -685,6 +553,21 @@ def initialize_ci():
         "warning": [],
         "error": []
     }
+    return ci
+
+def merge_ci(ci, gci):
+    """ Merge "compare info" gci, made when comparing part of the files (one group) into
+    ci.  Lists are appended, dictionaries merged and counts added.  Warning and error
+    messages are only included once, as in method make_value_summary."""
+    for key, value in gci.items():
+        if isinstance(value, dict):
+            merge_ci(ci.setdefault(key, {}), value)
+        elif isinstance(value, list):
+            if key in ('warning', 'error'):
+                value = [msg for msg in value if msg not in ci[key]]
+            ci.setdefault(key, []).extend(value)
+        else:
+            ci[key] = ci.get(key, 0) + value
 
 def da_empty(da):
     """Returns True if all elements of dict da have values that are
@@ -699,156 +582,8 @@ def da_empty(da):
     return True
 
   
-def display_report():
-    global ci, alpha_sort
-    find_hard_links()
-    format_soft_links()
-    if single_file:
-        # don't display these, should be empty if single file:
-        assert da_empty(ci['only_in']['A'])
-        assert da_empty(ci['only_in']['B'])
-        assert len(ci["node_types_different"]) == 0
-    else:
-        display_sub_messages(ci['only_in']['A'], "only in A", zero_msg="Good")
-        display_sub_messages(ci['only_in']['B'], "only in B", zero_msg="Good")
-        display_messages(ci["node_types_different"], "node types differ", zero_msg="Good")
-    # don't combine links, these already combined
-    if single_file:
-        display_sub_messages(ci["hard_links"]['A'], "hard links", combine=False)
-        display_sub_messages(ci["soft_links"]['A'], "soft links", combine=False)
-        display_messages(ci["ext_links"]['A'], "ext_links")
-        display_messages(ci["unknown_node_types"], "unknown node types", zero_msg="Good")
-    else:
-        display_sub_messages(ci["hard_links"]['A'], "hard links in A", combine=False)
-        display_sub_messages(ci["hard_links"]['B'], "hard links in B", combine=False)
-        display_sub_messages(ci["soft_links"]['A'], "soft links in A", combine=False)
-        display_sub_messages(ci["soft_links"]['B'], "soft links in B", combine=False)
-        check_link_equivalence()
-        display_messages(ci["ext_links"]['A'], "ext_links in A")
-        display_messages(ci["ext_links"]['B'], "ext_links in B") 
-        display_messages(ci["unknown_node_types"], "unknown node types (in both A and B)", zero_msg="Good")
-    if alpha_sort:
-        # sort by name
-       ci["everything_matches"]['attribute'].sort()
-       ci["everything_matches"]['dataset'].sort()
-       sort_msg = "sorted alphabetically"
-    else:
-        # sort by size in decreasing order
-        sort_by_size(ci["everything_matches"]['attribute'])
-        sort_by_size(ci["everything_matches"]['dataset'])
-        sort_msg = "sorted in decreasing size"
-    ci["empty_paired_groups"].sort()
-    if single_file:
-        assert da_empty(ci["types_same_values_differ"])
-        assert da_empty(ci["types_differ_values_same"])
-        assert da_empty(ci["values_and_types_differ"])
-        assert da_empty(ci["values_match_but_sizes_different"])
-        display_messages(ci["empty_paired_groups"], "empty groups (no members or attributes)")     
-        display_sub_messages(ci["everything_matches"], "(%s)" % sort_msg)
-    else:
-        display_messages(ci["empty_paired_groups"], "empty paired groups (no members or attributes)")
-        display_sub_messages(ci["types_same_values_differ"], "types match but values differ")
-        display_sub_messages(ci["types_differ_values_same"], "types differ but values match")
-        display_sub_messages(ci["values_and_types_differ"], "values and types differ")
-        display_messages(ci["only_compressed_in"]["A"], "datasets type and values match, but only compressed in A")
-        display_messages(ci["only_compressed_in"]["B"], "datasets type and values match, but only compressed in B")   
-        display_sub_messages(ci["values_match_but_sizes_different"], "values match but sizes different")
-        display_sub_messages(ci["everything_matches"], "everything matches (%s)" % sort_msg)
-    num_paired_groups = ci["total_paired_found"]["group"]
-    num_val_match_datasets = (len(ci["types_differ_values_same"]["dataset"]) 
-        + len(ci["everything_matches"]["dataset"])
-        + len(ci["values_match_but_sizes_different"]["dataset"])
-        + len(ci["only_compressed_in"]["A"]) + len(ci["only_compressed_in"]["B"]))
-    num_val_match_attributes = (len(ci["types_differ_values_same"]["attribute"]) + 
-        len(ci["everything_matches"]["attribute"]) + len(ci["values_match_but_sizes_different"]["attribute"]))
-#     num_groups = (num_matching_groups + len(ci['only_in']['A']['group'])
-#         + len(ci['only_in']['B']['group']))
-    num_paired_datasets = ci["total_paired_found"]["dataset"] # + len(ci['only_in']['A']['dataset']) 
-        # + len(ci['only_in']['B']['dataset']))
-    num_paired_attributes = (ci["total_paired_found"]["attribute"]) # + len(ci['only_in']['A']['attribute']) +
-        # + len(ci['only_in']['B']['attribute']))
-    num_matching_datasets = len(ci["everything_matches"]['dataset'])
-    num_matching_attributes = len(ci["everything_matches"]['attribute'])
-    num_dont_match_attributes = num_paired_attributes - num_val_match_attributes
-    num_dont_match_datasets = num_paired_datasets - num_val_match_datasets
-    print ("-" * 20)
-    # display any errors or warnings
-    for msgtype in ('error','warning'):
-        if ci[msgtype]:
-            print("%i %ss:" % (len(ci[msgtype]), msgtype))
-            print("\n".join(ci[msgtype]))
-    print ("** Summary")
-    if single_file:
-        print("%i groups, %i datasets, %i attributes" % (
-            num_paired_groups, num_paired_datasets, num_paired_attributes))
-        return
-    # display summary for file comparison:
-    print ("Unpaired groups: %i only in A, %i only in B" % (
-        len(ci['only_in']['A']['group']), len(ci['only_in']['B']['group'])))
-    print ("Unpaired datasets: %i only in A, %i only in B" % (
-        len(ci['only_in']['A']['dataset']), len(ci['only_in']['B']['dataset'])))
-    print ("Unpaired attributes: %i only in A, %i only in B" % (
-        len(ci['only_in']['A']['attribute']), len(ci['only_in']['B']['attribute'])))
-    print ("Total paired: %i datasets, %i attributes, %i groups" % ( num_paired_datasets,
-        num_paired_attributes, num_paired_groups))
-    print ("Total paired with values match: %i/%i datasets, %i/%i attributes." % (num_val_match_datasets,
-        num_paired_datasets, num_val_match_attributes, num_paired_attributes))
-    print ("Total paired, vals don't match: %i/%i datasets, %i/%i attributes." % (num_dont_match_datasets,
-        num_paired_datasets, num_dont_match_attributes, num_paired_attributes))
-    print ("Total paired, everything match: %i/%i datasets, %i/%s attributes" % (
-        num_matching_datasets, num_paired_datasets, num_matching_attributes, num_paired_attributes))
-    # done displaying summary numbers
-    # now display match messages if appropriate
-    # first check for any unpaired.  If so, these files do not match
-    total_unpaired = 0
-    for ab in ("A", "B"):
-        for comp in ("group", "dataset", "attribute", "other"):
-            total_unpaired += len(ci['only_in'][ab][comp])
-    if total_unpaired > 0:
-        print("Files do not match, there are %i unpaired components" % total_unpaired)
-    else:
-        # check for exact match
-        if (num_matching_attributes == num_paired_attributes and 
-            num_matching_datasets == num_paired_datasets):
-            # these files exactly match
-            print ("** Files exactly match **")
-        else:
-            # check for match for NWB files
-            check_for_nwb_match(num_dont_match_datasets, num_dont_match_attributes)
-
-
-def check_for_nwb_match(num_dont_match_datasets, num_dont_match_attributes):
-    """ Check to see if the files are matching for everything except those
-    datasets and attributes that normally vary between NWB files.  If so, display
-    message, 'NWB files exactly match' """
-    global ci, nwb_variable_datasets, nwb_variable_attributes
-    found_vds = []  # found variable datasets
-    found_vat = []  # found variable attributes
-    # check for datasets that should ignore for NWB match
-    array_names = ["types_differ_values_same", "types_same_values_differ", "values_and_types_differ"]
-    for arn in array_names:
-        for msg in ci[arn]["dataset"]:
-            for vds in nwb_variable_datasets:
-                if msg.startswith("%s:" % vds):  # append colon to data set path for matching
-                    found_vds.append(vds)
-                    continue
-    # check for attributes that should ignore for NWB match
-    for arn in array_names:
-        for msg in ci[arn]["attribute"]:
-            for vat in nwb_variable_attributes:
-                apath, aid = vat
-                if msg.startswith("%s %s:" % (apath, aid)):
-                    found_vat.append(vat)
-                    continue
-    # now see is the found variable datasets and attributes account for all errors
-    if len(found_vds) == num_dont_match_datasets and len(found_vat) == num_dont_match_attributes:
-        vds_list = ", ".join(found_vds)
-        vat_list = ", ".join(["%s %s" % (vat[0],vat[1]) for vat in found_vat])
-        attr_msg = " and attributes: %s" % vat_list if vat_list else ""
-        print("** NWB files exactly match ** (only %s%s differ)" % (
-                    vds_list, attr_msg))
 
-    
+
 #     
 #     elif num_val_match_attributes == num_paired_attributes:
 #         if num_matching_attributes == num_paired_attributes:
@@ -924,187 +659,6 @@ def display_sub_messages(sub_messages, description, zero_msg = None, qualifier=N
         display_messages(sub_messages[type], desc, quote, zero_msg, combine=combine)
 
 
-# Save groups, datasets, or attributes that are only in one file but not the other
-# fab will be "A" or "B", ids list of ids, desc dictionary of info for all ids
-# grp is the hdf5 group containing datasets or groups (if ids is datasets or groups)
-# or is the node (group or dataset) containing the attributs, if ids are all
-# attributes.  f is the h5py file object.
-def save_only_in(fab, ids, desc, grp, f):
-    global ci
-    for id in ids:
-        path = desc[id]["full_path"]
-        type = desc[id]['type']
-        if type not in ("group", "dataset", "attribute"):
-            type = "other"
-        if type == 'attribute':
-            path = path + ": %s" % id
-            value = grp.attrs[id]
-            # tally_types(desc[id]["full_path"], id, value)
-            compress = None
-        elif type == "dataset":
-            value = grp[id].value
-            # tally_types(desc[id]["full_path"], '', value)
-            compress = desc[id]["compression"]
-        if type in ("attribute", "dataset"):
-            size = desc[id]['size']
-            val_msg = make_value_summary(value, f)
-            typ_msg = "dtype=%s, shape=%s" % (desc[id]['dtype'], desc[id]['shape'])
-            compress_msg = ", compress=%s" % compress if compress else ""
-            msg = "%s type (%s) size (%i)%s, val='%s'" % (path, typ_msg, size, compress_msg,
-                val_msg)
-        else:
-            msg = path
-        ci['only_in'][fab][type].append(msg)
-
-
-def diff_attributes(node1, node2, path):
-    """ generate diff of attribute values.  Returns total number of unique
-    attribute identifiers (num_aids).  That is only used to detect groups that
-    have no attributes or members"""
-    global single_file, f1, f2, nwb_variable_attributes, filter_nwb
-    ai1 = get_attr_info(node1, path)
-    ai2 = get_attr_info(node2, path) if not single_file else ai1
-    in_a = set(ai1.keys())
-    in_b = set(ai2.keys())
-    only_in_a = list(in_a - in_b)
-    only_in_b = list(in_b - in_a)
-    save_only_in("A", only_in_a, ai1, node1, f1)
-    save_only_in("B", only_in_b, ai2, node2, f2)
-    common = sorted(list(in_a.intersection(in_b)))
-    num_aids = len(only_in_a) + len(only_in_b) + len(common)  # number attribute ids
-    for aid in common:
-        try:
-            v1 = node1.attrs[aid]
-        except Exception as e:
-            # unable to read attribute, assume because h5py cannot read fixed length utf-8
-            v1 = "<<Unable to read; fixed size utf?>>"
-#         tally_types(path, aid, v1)
-        if single_file:
-            v2 = v1
-        else:
-            try:
-                v2 = node2.attrs[aid]
-            except Exception as e:
-                # unable to read attribute, assume because h5py cannot read fixed length utf-8
-                v2 = "<<Unable to read; fixed size utf?>>"
-        do_filtering = False
-        if filter_nwb:
-            # check if should filter this attribute
-            for vat in nwb_variable_attributes:
-                vpath, vaid = vat
-                if path == vpath and vaid == aid:
-                   do_filtering = True
-                   continue
-        save_dataset_or_attribute_diff("attribute", aid, path, ai1, ai2, v1, v2, do_filtering)
-    return num_aids
-
-
-# def save_dataset_or_attribute_diff(ctype, mid, mpath, ci1, ci2, vals_match, vals_close):
-def save_dataset_or_attribute_diff(ctype, mid, mpath, ci1, ci2, v1, v2, do_filtering=False):
-    # ctype - container type, either 'dataset' or 'attribute'
-    # mid - member id (id of dataset or attribute)
-    # ci1 - information for all members of container 1 (from file "A")
-    # ci2 - information for all members of container 2 (from file "B")
-    # v1, v2 - values from file 1 (a) and file 2 (b)
-    # do_filtering - True if info (dtype, size, value) about this value should not be displayed
-    global ci, single_file, f1, f2
-#     if mpath == '/analysis/regref_data/raw_rref' and mid == 'raw_rref':
-#         import pdb; pdb.set_trace()
-#     search_str = "Theta oscillations provide temporal wind"
-#     if search_str in v1 or search_str in v2:
-#         import pdb; pdb.set_trace()
-    vals_match = vs.values_match(v1, v2, f1, f2) if not single_file else True
-    vals_close = values_close(v1, v2) if not vals_match else None
-    ci["total_paired_found"][ctype] += 1
-    if do_filtering:
-        # need to filter display of these values for generating signatures of NWB files
-        a_size = b_size = a_dtype = b_dtype = "--"
-        v1 = v2 = "--value removed for NWB signature--"
-    else:
-        a_size = str(ci1[mid]['size'])
-        b_size = str(ci2[mid]['size'])
-        a_dtype = ci1[mid]['dtype']
-        b_dtype = ci2[mid]['dtype']
-    # compare data types, shape  Don't include rank since shape has that
-    com = "compression"  # shorthand
-    a_compress = ci1[mid][com] if com in ci1[mid] and ci1[mid][com] else None
-    b_compress = ci2[mid][com] if com in ci2[mid] and ci2[mid][com] else None
-    a_type = "dtype=%s, shape=%s" % (a_dtype, ci1[mid]['shape'])
-    b_type = "dtype=%s, shape=%s" % (b_dtype, ci2[mid]['shape'])
-    types_match = a_type == b_type
-    sizes_match = a_size == b_size
-    compress_match = a_compress == b_compress
-    size_message = "size (%s) matches" % a_size if sizes_match else "size A:%s, B:%s" % (
-        a_size, b_size)
-    compress_message = (", compress A:%s B:%s" % (a_compress, b_compress) 
-        if a_compress or b_compress else "")
-    sc_message = size_message + compress_message
-    loc = "%s %s" % (mpath, mid) if ctype == "attribute" else mpath
-    vals_cmatch = vals_match or vals_close
-    cmatch_str = "closly " if vals_close else ""
-#     if mpath == '/identifier':
-#         import pdb; pdb.set_trace()
-    vsum = make_values_summary(v1, v2, vals_cmatch)
-    if types_match and not vals_cmatch:
-        msg = "%s: types match (%s), but not values; %s %s" % (loc, a_type, vsum, sc_message)
-        ci["types_same_values_differ"][ctype].append(msg)
-    elif not types_match and vals_cmatch:
-        msg = "%s: type A: (%s) B: (%s), values %smatch, %s %s" % (loc, a_type, b_type, cmatch_str, vsum, sc_message)
-        ci["types_differ_values_same"][ctype].append(msg)
-    elif not types_match and not vals_cmatch:
-        # import pdb; pdb.set_trace()
-        msg = "%s: type A: (%s) B: (%s), and values differ. %s %s" % (
-            loc, a_type, b_type, vsum, sc_message)
-        ci["values_and_types_differ"][ctype].append(msg)
-    elif a_compress != b_compress:
-        assert types_match, "types should match, but don't"
-        assert vals_cmatch, "vals should match, but don't"
-        msg = "%s: types match (%s), values %smatch; %s" %(loc, a_type, cmatch_str, sc_message)
-        cf = "A" if a_compress else "B"
-        ci["only_compressed_in"][cf].append(msg)    
-    elif not sizes_match:
-        msg = "%s: types match (%s), values %smatch; sizes differ. %s" % (loc,
-            a_type, cmatch_str, sc_message)
-        ci["values_match_but_sizes_different"][ctype].append(msg)     
-    else:
-        assert types_match
-        assert vals_cmatch
-        assert sizes_match
-        assert compress_match
-        # everything matches
-        short_compress_msg = ", compress=%s" % a_compress if a_compress else ""
-        sclosly_msg = "closly matches " if vals_close else ""
-        # msg = "%s: (%s) %s size (%i)%s" % (loc, a_type, sclosly_msg, a_size, short_compress_msg)
-        try:
-            msg = "%s: %s %ssize (%s)%s %s" % (loc, a_type, sclosly_msg, a_size, short_compress_msg, vsum)
-        except UnicodeDecodeError as e:
-            error_exit("UnicodeDecodeError")
-        ci["everything_matches"][ctype].append(msg)
-
-# make summary for two values that may or may not match
-def make_values_summary(v1, v2, vals_cmatch):
-    """ Make short summary of values, or value if they match"""
-    global f1, f2
-    v1s = make_value_summary(v1, f1)
-    if vals_cmatch:
-        val_sum = " val='%s'" % v1s
-    else:
-        v2s = make_value_summary(v2, f2)
-        val_sum = " val A='%s' b='%s'" % (v1s, v2s)
-    return val_sum
-
-# make summary for single value
-def make_value_summary(val, fileObj):
-    global ci
-    (value_summary, vs_msg, vs_msg_type) = vs.make_value_summary(val, fileObj)
-    if vs_msg:
-        assert vs_msg_type in ('warning', 'error')
-        if vs_msg not in ci[vs_msg_type]:
-            # only include message once
-            ci[vs_msg_type].append(vs_msg)
-    return value_summary
-
-
 # def lmake_value_summary(val):
 #     # make summary for a single value
 #     uval = val2str(val)
@@ -1142,96 +696,124 @@ def make_value_summary(val, fileObj):
 #     return val_str
 
 
-def diff_groups(grp1, grp2, path):
-    ggp = (grp1, grp2, path)
-    # use list to avoid recursion (more efficient)
-    to_check = [ggp]
-    while to_check:
-        ggp = to_check.pop(0)
-        member_groups = diff_groups2(ggp)
-        to_check.extend(member_groups)
-    
-# this used within pdb to determine why some 2-D arrays did not match (had some elements NaN)    
-# def cmp_arrays(v1, v2):
-#     nx, ny = v1.shape
-#     for x in range(nx):
-#         for y in range(ny):
-#             if(v1[x, y] != v2[x, y]):
-#                 import pdb; pdb.set_trace()
-    
 
-# compare members of groups specified by ggp
-# return list of additional groups to process
-def diff_groups2(ggp):
-    global ci
-    global f1, f2
-    global filter_nwb, single_file
-    global nwb_variable_datasets
-    ci["total_paired_found"]["group"] += 1
-    grp1, grp2, path = ggp
-    num_aids = diff_attributes(grp1, grp2, path)  # num_aids - number unique attribute ids
-    gi1 = get_group_info(path, grp1)
-    gi2 = get_group_info(path, grp2) if not single_file else gi1
-    in_a = set(gi1.keys())
-    in_b = set(gi2.keys())
-    only_in_a = list(in_a - in_b)
-    only_in_b = list(in_b - in_a)
-    save_only_in("A", only_in_a, gi1, grp1, f1)
-    save_only_in("B", only_in_b, gi2, grp2, f2)
-    common = sorted(list(in_a.intersection(in_b)))
-    num_mids = len(only_in_a) + len(only_in_b) + len(common)
-    if num_aids == 0 and num_mids == 0:
-        # these paired groups have no members or attributes
-        ci["empty_paired_groups"].append(path)
-    member_groups = []
-    for mid in common:
-        mpath = make_full_path(path, mid)
-        type_a = gi1[mid]['type']
-        type_b = gi2[mid]['type']
-        # in case either are soft links, save them
-        save_soft_link("A", gi1[mid])
-        save_soft_link("B", gi2[mid])
-        # use locations (object no) for detecting common paths (hard links)
-        loc_a = str(gi1[mid]['objno'])
-        loc_b = str(gi2[mid]['objno'])
-        previously_found = loc_a in ci['locations']['A'] and loc_b in ci['locations']['B']
-        # save current location and path for both groups (appends path if was found before)
-        if type_a in ("group", "dataset"):
-            save_to_dict_array(ci['locations']['A'], loc_a, (mpath, type_a))
-        if type_b in ("group", "dataset"):
-            save_to_dict_array(ci['locations']['B'], loc_b, (mpath, type_b))
-        if previously_found:
-            # both of these nodes were found previously (because of links), no need to process
-            continue
-        if type_a != type_b:
-            msg = "%s node types different. A type='%s', B type='%s'" % (mpath, 
-                type_a, type_b)
-            ci["node_types_different"].append(msg)
-            continue
-        # from here on, type_a == type_b.  Using type_a
-        if type_a in ("ext_link", "link"):
-            # external link, and soft links are already saved, in function save_soft_link
-            continue
-        # node types are the same, make sure they are either group or dataset
-        if type_a not in ("group", "dataset"):
-            msg = "%s unknown node type (%s)" % (mpath, type_a)
-            ci["unknown_node_types"].append(msg)
-            continue
-        if type_a == "dataset":
-            diff_attributes(grp1[mid], grp2[mid], mpath)
-            # set true if should filter this
-            do_filtering = filter_nwb and mpath in nwb_variable_datasets
-            v1 = grp1[mid].value
-            v2 = grp2[mid].value
-            save_dataset_or_attribute_diff("dataset", mid, mpath, gi1, gi2, v1, v2, do_filtering)
-        else:
-            # Type is group, add to list of groups to process
-            mg1 = grp1[mid]
-            mg2 = grp2[mid]
-            ggp = (mg1, mg2, mpath)
-            member_groups.append(ggp)
-    return member_groups
-            
+def raw_chunks_match(ds1, ds2):
+    """ Return True if ds1 and ds2 have the same storage layout (chunks, filters and fill
+    value) and all of the stored (raw, e.g. compressed) chunks are identical, which means
+    the values are the same without decoding or comparing them.  Stored chunks include
+    the checksum if the fletcher32 filter is used.  Returns False if the layouts differ,
+    any chunk differs or the h5py version cannot read raw chunks."""
+    if not (ds1.chunks and ds1.chunks == ds2.chunks and ds1.compression == ds2.compression
+        and ds1.compression_opts == ds2.compression_opts and ds1.shuffle == ds2.shuffle
+        and ds1.fletcher32 == ds2.fletcher32 and ds1.fillvalue == ds2.fillvalue):
+        return False
+    id1 = ds1.id
+    id2 = ds2.id
+    if not (hasattr(id1, 'read_direct_chunk') and hasattr(id1, 'get_chunk_info')):
+        return False
+    try:
+        num_chunks = id1.get_num_chunks()
+        if num_chunks != id2.get_num_chunks():
+            return False
+        for i in range(num_chunks):
+            offset = id1.get_chunk_info(i).chunk_offset
+            if id1.read_direct_chunk(offset) != id2.read_direct_chunk(offset):
+                return False
+    except (KeyError, ValueError, RuntimeError, IOError, OSError):
+        # e.g. chunk not allocated in ds2
+        return False
+    return True
+
+def first_difference(b1, b2):
+    """ Return index (along first dimension) of first row in arrays b1 and b2 that does
+    not match.  NaN values in the same location match (as in values_match)."""
+    neq = b1 != b2
+    if b1.dtype.kind == 'f':
+        neq &= ~(np.isnan(b1) & np.isnan(b2))
+    rows = neq.reshape(len(b1), -1).any(axis=1)
+    return int(np.argmax(rows))
+
+def get_stream_prefix(dset, block, fileObj, max_summary_length = 50):
+    """ Return prefix of value for summary (see value_summary.get_prefix) using the first
+    block read from dset.  If the block is too short to make the prefix, more rows are
+    read.  Each row adds at least two characters, so 51 rows are always enough."""
+    prefix = vs.get_prefix(block, fileObj, max_summary_length)
+    if len(prefix) < max_summary_length and len(block) < dset.shape[0]:
+        prefix = vs.get_prefix(dset[0:max_summary_length + 1], fileObj, max_summary_length)
+    return prefix
+
+def make_streamed_summary(prefix, hash, max_summary_length = 50):
+    """ Make value summary like value_summary.make_value_summary from prefix of the
+    value and hash (adler32) of all the value bytes."""
+    if len(prefix) < max_summary_length:
+        return prefix
+    return "%s...%s" % (prefix[0:max_summary_length - 9], vs.int2alph(hash & 0xffffffff))
+
+
+
+def save_locations(locations, mpath, cim_a, cim_b):
+    """ Save location (object number) and path of paired group members in locations
+    (format of ci["locations"]).  cim_a and cim_b are the dicts made for the members by
+    function get_group_info.  Returns True if both locations were found previously, which
+    means the members are hard links to nodes that are already being compared."""
+    loc_a = str(cim_a['objno'])
+    loc_b = str(cim_b['objno'])
+    previously_found = loc_a in locations['A'] and loc_b in locations['B']
+    # save current location and path for both (appends path if was found before)
+    if cim_a['type'] in ("group", "dataset"):
+        save_to_dict_array(locations['A'], loc_a, (mpath, cim_a['type']))
+    if cim_b['type'] in ("group", "dataset"):
+        save_to_dict_array(locations['B'], loc_b, (mpath, cim_b['type']))
+    return previously_found
+
+def partition_groups(groups, num_tasks):
+    """ Partition groups found by method walk_groups into subtrees, each compared by a
+    worker process.  Starting with the whole tree, the subtree with the largest weight is
+    split (its root becomes a task by itself and each member group the root of a new
+    subtree) until there are num_tasks subtrees or none weighs more than the total
+    divided by num_tasks.  The subtrees are then packed into num_tasks tasks of about
+    equal weight (largest subtree first, each into the task with the smallest weight).
+    Returns list of tasks (each a list of indices into groups), largest first, so the
+    large ones are not left until the end."""
+    num_groups = len(groups)
+    children = [[] for i in range(num_groups)]
+    subtree_weight = [weight for path, parent, weight in groups]
+    # parents are always before children in groups
+    for index in range(num_groups - 1, 0, -1):
+        parent = groups[index][1]
+        children[parent].append(index)
+        subtree_weight[parent] += subtree_weight[index]
+    max_weight = subtree_weight[0] / float(num_tasks)
+    roots = set([0])
+    heap = [(-subtree_weight[0], 0)]
+    while heap and len(roots) < num_tasks:
+        neg_weight, index = heapq.heappop(heap)
+        if -neg_weight <= max_weight:
+            break
+        for child in children[index]:
+            roots.add(child)
+            heapq.heappush(heap, (-subtree_weight[child], child))
+    # find groups in each subtree, and the weight of the subtree without the parts split off
+    subtree_root = [None] * num_groups
+    subtrees = {}
+    weights = {}
+    for index, (path, parent, weight) in enumerate(groups):
+        root = index if index in roots else subtree_root[parent]
+        subtree_root[index] = root
+        save_to_dict_array(subtrees, root, index)
+        weights[root] = weights.get(root, 0) + weight
+    # pack subtrees into tasks.  heap has (weight, task number) for each task
+    tasks = [[] for i in range(min(num_tasks, len(subtrees)))]
+    heap = [(0, i) for i in range(len(tasks))]
+    for root in sorted(subtrees.keys(), key=lambda root: weights[root], reverse=True):
+        weight, i = heapq.heappop(heap)
+        tasks[i].extend(subtrees[root])
+        heapq.heappush(heap, (weight + weights[root], i))
+    task_weights = dict([(i, weight) for weight, i in heap])
+    order = sorted(range(len(tasks)), key=lambda i: task_weights[i], reverse=True)
+    return [tasks[i] for i in order]
+
+
 # def diff_files_old(file1, file2):
 #     global filter_nwb, single_file
 #     # file handles
@@ -1279,29 +861,818 @@ def open_h5file(fname):
         sys.exit(1)
     return f
 
-def diff_files(file1, file2):
-    global filter_nwb, single_file
-    # file handles
-    global f1, f2
-    ci = initialize_ci()
-    if not filter_nwb:
-        if single_file:
-            print ("<%% command was: python %s %s %%>" % (sys.argv[0], file1))
+
+class Comparison(object):
+    """ Compares two hdf5 files, or a file to itself to make a 'signature'.  Holds the
+    options, the open files and the "compare info" (ci) structure which is filled in
+    while comparing the files, then used to display the report."""
+
+    def __init__(self, file1, file2=None, filter_nwb=False, alpha_sort=False,
+        stream_datasets=False, stream_min_bytes=2**26, stream_block_bytes=2**24, processes=1):
+        """ file1, file2 - names of files to compare.  If file2 is None, file1 is compared
+        to itself to make a signature.
+        filter_nwb, alpha_sort, stream_datasets - True for options 'N', 'a' and 'S' (see
+        display_doc).  When streaming, datasets at least stream_min_bytes in size are
+        compared in blocks of about stream_block_bytes.
+        processes - number of processes used to compare groups (option 'P').  None to use
+        the number of CPUs."""
+        self.file1 = file1
+        self.file2 = file2 if file2 is not None else file1
+        # True if file is being compared to itself
+        self.single_file = file2 is None
+        self.filter_nwb = filter_nwb
+        self.alpha_sort = alpha_sort
+        self.stream_datasets = stream_datasets
+        self.stream_min_bytes = stream_min_bytes
+        self.stream_block_bytes = stream_block_bytes
+        self.processes = processes if processes else multiprocessing.cpu_count()
+        # h5py file objects, set by open_files
+        self.f1 = self.f2 = None
+        # paths of members not compared because they are hard links to nodes found before.
+        # Only used when groups are compared in worker processes, because the nodes may
+        # have been found by another process
+        self.skip_paths = None
+        self.ci = initialize_ci()
+
+    def get_options(self):
+        """ Return options as dict, used to make Comparison in worker processes"""
+        return {'filter_nwb': self.filter_nwb, 'alpha_sort': self.alpha_sort,
+            'stream_datasets': self.stream_datasets, 'stream_min_bytes': self.stream_min_bytes,
+            'stream_block_bytes': self.stream_block_bytes}
+
+    def open_files(self):
+        self.f1 = open_h5file(self.file1)
+        self.f2 = open_h5file(self.file2) if not self.single_file else self.f1
+
+    def close_files(self):
+        self.f1.close()
+        if not self.single_file:
+            self.f2.close()
+
+    def diff_files(self):
+        """ Compare files and display report"""
+        if not self.filter_nwb:
+            if self.single_file:
+                print ("<%% command was: python %s %s %%>" % (sys.argv[0], self.file1))
+            else:
+                print ("<%% command was: python %s %s %s %%>" % (sys.argv[0], self.file1, self.file2))
+        if self.single_file:
+            print ("<%% Generating signature for %s %%>" % self.file1)
         else:
-            print ("<%% command was: python %s %s %s %%>" % (sys.argv[0], file1, file2))
-    if single_file:
-        print ("<%% Generating signature for %s %%>" % file1)
-    else:
-        print ("<%% comparing %s (A) and %s (B) %%>" % (file1, file2))
-    print("")
-    f1 = open_h5file(file1)
-    if not single_file:
-        f2 = open_h5file(file2)
-    else:
-        f2 = f1
-    # get_sizes(f1, file1)
-    diff_groups(f1["/"], f2["/"], "/")
-    display_report()
+            print ("<%% comparing %s (A) and %s (B) %%>" % (self.file1, self.file2))
+        print("")
+        self.open_files()
+        try:
+            if self.processes > 1:
+                self.diff_groups_parallel()
+            else:
+                self.diff_groups(self.f1["/"], self.f2["/"], "/")
+        finally:
+            self.close_files()
+        self.display_report()
+
+    def find_hard_links(self):
+        # search self.ci["locations"] for locations with multiple entries
+        # if found, copy them to self.ci["hard_links_found"]
+        for ab in ("A", "B"):
+            for loc in sorted(list(self.ci["locations"][ab])):
+                nodes = self.ci["locations"][ab][loc]
+                if len(nodes) > 1:
+                    # found one or more hard links
+                    paths = []
+                    type = None
+                    for node in nodes:
+                        path, typ = node
+                        if not type:
+                            type = typ
+                        else:
+                            assert type == typ
+                        paths.append(path)
+                    pathsc = h_combine_messages(paths, type + "s")
+                    # want output like
+                    #  1. id=(343, 3443).  34 groups (3 combined):
+                    pathsc[0] = "id=%s. %s" % (loc, pathsc[0])
+                    msg = "\n\t".join(pathsc)
+                    self.ci["hard_links"][ab][type].append(msg)
+
+    def save_soft_link(self, ab, cim):
+        # cim is the dict created for members of group by function 
+        # get_group_info.  If this is a link (i.e. hdf5 soft link or ext_link)
+        # save information about the link in ci.
+        # ab is either "A" or "B"
+        if cim['type'] not in ("link", "ext_link"):
+            return
+        full_path = cim['full_path']
+        target = cim['target']
+        # msg = "%s: %s => %s" % (cim['type'], full_path, target)
+        if cim['type'] == "link":
+            target_type = cim['ttype'] if cim['ttype'] else "unknown"
+            if target in self.ci["tmp_soft_links"][ab][target_type]:
+                self.ci["tmp_soft_links"][ab][target_type][target].append(full_path)
+            else:
+                self.ci["tmp_soft_links"][ab][target_type][target] = [full_path]
+        else:
+            msg = "%s: %s => %s" % (cim['type'], full_path, target)
+            self.ci["ext_links"][ab].append(msg)
+        return
+
+    def format_soft_links(self):
+        # Convert soft_links from a dictionary of targets: [paths] in tmp_soft_links
+        # to text representing that in self.ci["soft_links"]
+        for ab in ("A", "B"):
+            for type in self.ci["tmp_soft_links"][ab]:
+                dmsg = self.ci["soft_links"][ab][type]  # destination for messages
+                for target in sorted(self.ci["tmp_soft_links"][ab][type].keys()):
+                    paths = self.ci["tmp_soft_links"][ab][type][target]
+                    pathsc = h_combine_messages(paths, type + "s")
+                    # want output like
+                    # to: "target" 200 groups (3 combined):
+                    try:
+                        # pathsc[0] = b"to: \"%s\" %s" % (target, pathsc[0].encode('utf8'))  #py3, added b, .encode('utf8')
+                        pathsc[0] = "to: \"%s\" %s" % (target, pathsc[0])
+                        # msg = b"\n\t".join(pathsc)  #py3, added b
+                        msg = "\n\t".join(pathsc)
+                    except TypeError as e:
+                        error_exit("unable to format_soft_links")
+                    dmsg.append(msg)
+
+
+    def check_link_equivalence(self):
+        # checks to be sure that groups formed by links (hard or soft) are
+        # equivalent
+        errors = []
+        num_link_groups = {"A": {"hard": {"group": 0, "dataset": 0}, "soft": {"group": 0, "dataset": 0}},
+                          "B": {"hard": {"group": 0, "dataset": 0}, "soft": {"group": 0, "dataset": 0}}}
+        for source_ab in ("A", "B"):
+            dest_ba = "B" if source_ab is "A" else "A"
+            for hard_loc in sorted(list(self.ci["locations"][source_ab])):
+                hard_group_paths, type = self.get_hard_group_paths(source_ab, hard_loc)
+                if hard_group_paths:
+                    num_link_groups[source_ab]["hard"][type] += 1
+                    self.validate_group(source_ab, "hard", type, hard_group_paths, dest_ba, errors)
+            for target_type in ("group", "dataset"):
+                for target in self.ci["tmp_soft_links"][source_ab][target_type]:
+                    num_link_groups[source_ab]["soft"][target_type] += 1
+                    soft_group_paths = [target] + self.ci["tmp_soft_links"][source_ab][target_type][target]
+                    self.validate_group(source_ab, "soft", target_type, soft_group_paths, dest_ba, errors)
+        if errors:
+            print ("%s" % ("** Above links are NOT equivalent:\n\t" + "\n\t".join(errors)))
+        else:
+            nlg = num_link_groups
+            total_found = (nlg["A"]["hard"]["group"] + nlg["A"]["hard"]["dataset"] +
+                nlg["A"]["soft"]["group"] + nlg["A"]["soft"]["dataset"] +
+                nlg["B"]["hard"]["group"] + nlg["B"]["hard"]["dataset"] + 
+                nlg["B"]["soft"]["group"] + nlg["B"]["soft"]["dataset"])
+            if total_found == 0:
+                print ("** No links found.")
+            else:
+                print ("** Above found links are equivalent. -- Good.\n   Total of %i link groups found:\n   %s" %(
+                    total_found, ppdict(num_link_groups)))
+                    # total_found, pp.pformat(num_link_groups)))
+                    # str(num_link_groups)))  # prev version, would not sort keys
+            if not self.single_file:
+                print (("   Note: links inside unpaired groups will not be found.  To guarantee "
+                    "finding all links, run script with just one file (comparing it to itself)."))
+
+
+
+    def validate_group(self, source_ab, source_link_type, type, paths, dest_ba, errors):
+        """ make sure that all paths in paths are in a group in dest_ba and that
+        the type (group or dataset) matches"""
+        # pick any path for searching
+        path = paths[0]
+        # look for path in hard link group
+        for hard_loc in sorted(list(self.ci["locations"][dest_ba])):
+            hard_group_paths, hl_type = self.get_hard_group_paths(dest_ba, hard_loc)
+            if hard_group_paths and hl_type == type and path in hard_group_paths:
+                validate_groups_match(source_ab, source_link_type, type, paths, dest_ba, errors, 
+                    hard_group_paths, "hard")
+                return
+        # look for path in soft link group
+        for target in self.ci["tmp_soft_links"][dest_ba][type].keys():
+            soft_group_paths = [target] + self.ci["tmp_soft_links"][dest_ba][type][target]
+            if path in soft_group_paths:
+                validate_groups_match(source_ab, source_link_type, type, paths, dest_ba, errors, 
+                    soft_group_paths, "soft")
+                return
+        msg = "Unable to find links in %s matching %s in %s with path='%s'" % (
+            dest_ba, type, source_ab, path)
+        errors.append(msg)
+
+
+    def get_hard_group_paths(self, ab, loc):
+        """get list of paths at loc and also type if more than one path, otherwise
+        return tuple (None, None)"""
+        nodes = self.ci["locations"][ab][loc]
+        if len(nodes) == 1:
+            # no hard links to this location
+            return (None, None)
+        # found one or more hard links
+        paths = []
+        type = None
+        for node in nodes:
+            path, typ = node
+            if not type:
+                type = typ
+            else:
+                assert type == typ
+            paths.append(path)
+        return (paths, type)
+
+    def display_report(self):
+        self.find_hard_links()
+        self.format_soft_links()
+        if self.single_file:
+            # don't display these, should be empty if single file:
+            assert da_empty(self.ci['only_in']['A'])
+            assert da_empty(self.ci['only_in']['B'])
+            assert len(self.ci["node_types_different"]) == 0
+        else:
+            display_sub_messages(self.ci['only_in']['A'], "only in A", zero_msg="Good")
+            display_sub_messages(self.ci['only_in']['B'], "only in B", zero_msg="Good")
+            display_messages(self.ci["node_types_different"], "node types differ", zero_msg="Good")
+        # don't combine links, these already combined
+        if self.single_file:
+            display_sub_messages(self.ci["hard_links"]['A'], "hard links", combine=False)
+            display_sub_messages(self.ci["soft_links"]['A'], "soft links", combine=False)
+            display_messages(self.ci["ext_links"]['A'], "ext_links")
+            display_messages(self.ci["unknown_node_types"], "unknown node types", zero_msg="Good")
+        else:
+            display_sub_messages(self.ci["hard_links"]['A'], "hard links in A", combine=False)
+            display_sub_messages(self.ci["hard_links"]['B'], "hard links in B", combine=False)
+            display_sub_messages(self.ci["soft_links"]['A'], "soft links in A", combine=False)
+            display_sub_messages(self.ci["soft_links"]['B'], "soft links in B", combine=False)
+            self.check_link_equivalence()
+            display_messages(self.ci["ext_links"]['A'], "ext_links in A")
+            display_messages(self.ci["ext_links"]['B'], "ext_links in B") 
+            display_messages(self.ci["unknown_node_types"], "unknown node types (in both A and B)", zero_msg="Good")
+        if self.alpha_sort:
+            # sort by name
+           self.ci["everything_matches"]['attribute'].sort()
+           self.ci["everything_matches"]['dataset'].sort()
+           sort_msg = "sorted alphabetically"
+        else:
+            # sort by size in decreasing order
+            sort_by_size(self.ci["everything_matches"]['attribute'])
+            sort_by_size(self.ci["everything_matches"]['dataset'])
+            sort_msg = "sorted in decreasing size"
+        self.ci["empty_paired_groups"].sort()
+        if self.single_file:
+            assert da_empty(self.ci["types_same_values_differ"])
+            assert da_empty(self.ci["types_differ_values_same"])
+            assert da_empty(self.ci["values_and_types_differ"])
+            assert da_empty(self.ci["values_match_but_sizes_different"])
+            display_messages(self.ci["empty_paired_groups"], "empty groups (no members or attributes)")     
+            display_sub_messages(self.ci["everything_matches"], "(%s)" % sort_msg)
+        else:
+            display_messages(self.ci["empty_paired_groups"], "empty paired groups (no members or attributes)")
+            display_sub_messages(self.ci["types_same_values_differ"], "types match but values differ")
+            display_sub_messages(self.ci["types_differ_values_same"], "types differ but values match")
+            display_sub_messages(self.ci["values_and_types_differ"], "values and types differ")
+            display_messages(self.ci["only_compressed_in"]["A"], "datasets type and values match, but only compressed in A")
+            display_messages(self.ci["only_compressed_in"]["B"], "datasets type and values match, but only compressed in B")   
+            display_sub_messages(self.ci["values_match_but_sizes_different"], "values match but sizes different")
+            display_sub_messages(self.ci["everything_matches"], "everything matches (%s)" % sort_msg)
+        num_paired_groups = self.ci["total_paired_found"]["group"]
+        num_val_match_datasets = (len(self.ci["types_differ_values_same"]["dataset"]) 
+            + len(self.ci["everything_matches"]["dataset"])
+            + len(self.ci["values_match_but_sizes_different"]["dataset"])
+            + len(self.ci["only_compressed_in"]["A"]) + len(self.ci["only_compressed_in"]["B"]))
+        num_val_match_attributes = (len(self.ci["types_differ_values_same"]["attribute"]) + 
+            len(self.ci["everything_matches"]["attribute"]) + len(self.ci["values_match_but_sizes_different"]["attribute"]))
+    #     num_groups = (num_matching_groups + len(self.ci['only_in']['A']['group'])
+    #         + len(self.ci['only_in']['B']['group']))
+        num_paired_datasets = self.ci["total_paired_found"]["dataset"] # + len(self.ci['only_in']['A']['dataset']) 
+            # + len(self.ci['only_in']['B']['dataset']))
+        num_paired_attributes = (self.ci["total_paired_found"]["attribute"]) # + len(self.ci['only_in']['A']['attribute']) +
+            # + len(self.ci['only_in']['B']['attribute']))
+        num_matching_datasets = len(self.ci["everything_matches"]['dataset'])
+        num_matching_attributes = len(self.ci["everything_matches"]['attribute'])
+        num_dont_match_attributes = num_paired_attributes - num_val_match_attributes
+        num_dont_match_datasets = num_paired_datasets - num_val_match_datasets
+        print ("-" * 20)
+        # display any errors or warnings
+        for msgtype in ('error','warning'):
+            if self.ci[msgtype]:
+                print("%i %ss:" % (len(self.ci[msgtype]), msgtype))
+                print("\n".join(self.ci[msgtype]))
+        print ("** Summary")
+        if self.single_file:
+            print("%i groups, %i datasets, %i attributes" % (
+                num_paired_groups, num_paired_datasets, num_paired_attributes))
+            return
+        # display summary for file comparison:
+        print ("Unpaired groups: %i only in A, %i only in B" % (
+            len(self.ci['only_in']['A']['group']), len(self.ci['only_in']['B']['group'])))
+        print ("Unpaired datasets: %i only in A, %i only in B" % (
+            len(self.ci['only_in']['A']['dataset']), len(self.ci['only_in']['B']['dataset'])))
+        print ("Unpaired attributes: %i only in A, %i only in B" % (
+            len(self.ci['only_in']['A']['attribute']), len(self.ci['only_in']['B']['attribute'])))
+        print ("Total paired: %i datasets, %i attributes, %i groups" % ( num_paired_datasets,
+            num_paired_attributes, num_paired_groups))
+        print ("Total paired with values match: %i/%i datasets, %i/%i attributes." % (num_val_match_datasets,
+            num_paired_datasets, num_val_match_attributes, num_paired_attributes))
+        print ("Total paired, vals don't match: %i/%i datasets, %i/%i attributes." % (num_dont_match_datasets,
+            num_paired_datasets, num_dont_match_attributes, num_paired_attributes))
+        print ("Total paired, everything match: %i/%i datasets, %i/%s attributes" % (
+            num_matching_datasets, num_paired_datasets, num_matching_attributes, num_paired_attributes))
+        # done displaying summary numbers
+        # now display match messages if appropriate
+        # first check for any unpaired.  If so, these files do not match
+        total_unpaired = 0
+        for ab in ("A", "B"):
+            for comp in ("group", "dataset", "attribute", "other"):
+                total_unpaired += len(self.ci['only_in'][ab][comp])
+        if total_unpaired > 0:
+            print("Files do not match, there are %i unpaired components" % total_unpaired)
+        else:
+            # check for exact match
+            if (num_matching_attributes == num_paired_attributes and 
+                num_matching_datasets == num_paired_datasets):
+                # these files exactly match
+                print ("** Files exactly match **")
+            else:
+                # check for match for NWB files
+                self.check_for_nwb_match(num_dont_match_datasets, num_dont_match_attributes)
+
+    def check_for_nwb_match(self, num_dont_match_datasets, num_dont_match_attributes):
+        """ Check to see if the files are matching for everything except those
+        datasets and attributes that normally vary between NWB files.  If so, display
+        message, 'NWB files exactly match' """
+        found_vds = []  # found variable datasets
+        found_vat = []  # found variable attributes
+        # check for datasets that should ignore for NWB match
+        array_names = ["types_differ_values_same", "types_same_values_differ", "values_and_types_differ"]
+        for arn in array_names:
+            for msg in self.ci[arn]["dataset"]:
+                for vds in nwb_variable_datasets:
+                    if msg.startswith("%s:" % vds):  # append colon to data set path for matching
+                        found_vds.append(vds)
+                        continue
+        # check for attributes that should ignore for NWB match
+        for arn in array_names:
+            for msg in self.ci[arn]["attribute"]:
+                for vat in nwb_variable_attributes:
+                    apath, aid = vat
+                    if msg.startswith("%s %s:" % (apath, aid)):
+                        found_vat.append(vat)
+                        continue
+        # now see is the found variable datasets and attributes account for all errors
+        if len(found_vds) == num_dont_match_datasets and len(found_vat) == num_dont_match_attributes:
+            vds_list = ", ".join(found_vds)
+            vat_list = ", ".join(["%s %s" % (vat[0],vat[1]) for vat in found_vat])
+            attr_msg = " and attributes: %s" % vat_list if vat_list else ""
+            print("** NWB files exactly match ** (only %s%s differ)" % (
+                        vds_list, attr_msg))
+
+
+
+    # Save groups, datasets, or attributes that are only in one file but not the other
+    # fab will be "A" or "B", ids list of ids, desc dictionary of info for all ids
+    # grp is the hdf5 group containing datasets or groups (if ids is datasets or groups)
+    # or is the node (group or dataset) containing the attributs, if ids are all
+    # attributes.  f is the h5py file object.
+
+    def save_only_in(self, fab, ids, desc, grp, f):
+        for id in ids:
+            path = desc[id]["full_path"]
+            type = desc[id]['type']
+            if type not in ("group", "dataset", "attribute"):
+                type = "other"
+            if type == 'attribute':
+                path = path + ": %s" % id
+                value = grp.attrs[id]
+                # tally_types(desc[id]["full_path"], id, value)
+                compress = None
+            elif type == "dataset":
+                value = grp[id]
+                # tally_types(desc[id]["full_path"], '', value)
+                compress = desc[id]["compression"]
+            if type in ("attribute", "dataset"):
+                size = desc[id]['size']
+                if type == "attribute":
+                    val_msg = self.make_value_summary(value, f)
+                else:
+                    val_msg = self.make_dataset_summary(value, f)
+                typ_msg = "dtype=%s, shape=%s" % (desc[id]['dtype'], desc[id]['shape'])
+                compress_msg = ", compress=%s" % compress if compress else ""
+                msg = "%s type (%s) size (%i)%s, val='%s'" % (path, typ_msg, size, compress_msg,
+                    val_msg)
+            else:
+                msg = path
+            self.ci['only_in'][fab][type].append(msg)
+
+    def diff_attributes(self, node1, node2, path):
+        """ generate diff of attribute values.  Returns total number of unique
+        attribute identifiers (num_aids).  That is only used to detect groups that
+        have no attributes or members"""
+        ai1 = get_attr_info(node1, path)
+        ai2 = get_attr_info(node2, path) if not self.single_file else ai1
+        in_a = set(ai1.keys())
+        in_b = set(ai2.keys())
+        only_in_a = list(in_a - in_b)
+        only_in_b = list(in_b - in_a)
+        self.save_only_in("A", only_in_a, ai1, node1, self.f1)
+        self.save_only_in("B", only_in_b, ai2, node2, self.f2)
+        common = sorted(list(in_a.intersection(in_b)))
+        num_aids = len(only_in_a) + len(only_in_b) + len(common)  # number attribute ids
+        for aid in common:
+            try:
+                v1 = node1.attrs[aid]
+            except Exception as e:
+                # unable to read attribute, assume because h5py cannot read fixed length utf-8
+                v1 = "<<Unable to read; fixed size utf?>>"
+    #         tally_types(path, aid, v1)
+            if self.single_file:
+                v2 = v1
+            else:
+                try:
+                    v2 = node2.attrs[aid]
+                except Exception as e:
+                    # unable to read attribute, assume because h5py cannot read fixed length utf-8
+                    v2 = "<<Unable to read; fixed size utf?>>"
+            do_filtering = False
+            if self.filter_nwb:
+                # check if should filter this attribute
+                for vat in nwb_variable_attributes:
+                    vpath, vaid = vat
+                    if path == vpath and vaid == aid:
+                       do_filtering = True
+                       continue
+            self.save_dataset_or_attribute_diff("attribute", aid, path, ai1, ai2, v1, v2, do_filtering)
+        return num_aids
+
+    # def save_dataset_or_attribute_diff(ctype, mid, mpath, ci1, ci2, vals_match, vals_close)
+
+    def save_dataset_or_attribute_diff(self, ctype, mid, mpath, ci1, ci2, v1, v2, do_filtering=False,
+        cmp_info=None):
+        # ctype - container type, either 'dataset' or 'attribute'
+        # mid - member id (id of dataset or attribute)
+        # ci1 - information for all members of container 1 (from file "A")
+        # ci2 - information for all members of container 2 (from file "B")
+        # v1, v2 - values from file 1 (a) and file 2 (b)
+        # do_filtering - True if info (dtype, size, value) about this value should not be displayed
+        # cmp_info - if values were compared block by block, (vals_match, vals_close, vsum) made
+        # by function compare_datasets_streaming.  v1 and v2 are not used
+    #     if mpath == '/analysis/regref_data/raw_rref' and mid == 'raw_rref':
+    #         import pdb; pdb.set_trace()
+    #     search_str = "Theta oscillations provide temporal wind"
+    #     if search_str in v1 or search_str in v2:
+    #         import pdb; pdb.set_trace()
+        if cmp_info:
+            vals_match, vals_close, streamed_vsum = cmp_info
+        else:
+            vals_match = vs.values_match(v1, v2, self.f1, self.f2) if not self.single_file else True
+            vals_close = values_close(v1, v2) if not vals_match else None
+        self.ci["total_paired_found"][ctype] += 1
+        if do_filtering:
+            # need to filter display of these values for generating signatures of NWB files
+            a_size = b_size = a_dtype = b_dtype = "--"
+            v1 = v2 = "--value removed for NWB signature--"
+        else:
+            a_size = str(ci1[mid]['size'])
+            b_size = str(ci2[mid]['size'])
+            a_dtype = ci1[mid]['dtype']
+            b_dtype = ci2[mid]['dtype']
+        # compare data types, shape  Don't include rank since shape has that
+        com = "compression"  # shorthand
+        a_compress = ci1[mid][com] if com in ci1[mid] and ci1[mid][com] else None
+        b_compress = ci2[mid][com] if com in ci2[mid] and ci2[mid][com] else None
+        a_type = "dtype=%s, shape=%s" % (a_dtype, ci1[mid]['shape'])
+        b_type = "dtype=%s, shape=%s" % (b_dtype, ci2[mid]['shape'])
+        types_match = a_type == b_type
+        sizes_match = a_size == b_size
+        compress_match = a_compress == b_compress
+        size_message = "size (%s) matches" % a_size if sizes_match else "size A:%s, B:%s" % (
+            a_size, b_size)
+        compress_message = (", compress A:%s B:%s" % (a_compress, b_compress) 
+            if a_compress or b_compress else "")
+        sc_message = size_message + compress_message
+        loc = "%s %s" % (mpath, mid) if ctype == "attribute" else mpath
+        vals_cmatch = vals_match or vals_close
+        cmatch_str = "closly " if vals_close else ""
+    #     if mpath == '/identifier':
+    #         import pdb; pdb.set_trace()
+        if cmp_info and not do_filtering:
+            vsum = streamed_vsum
+        else:
+            vsum = self.make_values_summary(v1, v2, vals_cmatch)
+        if types_match and not vals_cmatch:
+            msg = "%s: types match (%s), but not values; %s %s" % (loc, a_type, vsum, sc_message)
+            self.ci["types_same_values_differ"][ctype].append(msg)
+        elif not types_match and vals_cmatch:
+            msg = "%s: type A: (%s) B: (%s), values %smatch, %s %s" % (loc, a_type, b_type, cmatch_str, vsum, sc_message)
+            self.ci["types_differ_values_same"][ctype].append(msg)
+        elif not types_match and not vals_cmatch:
+            # import pdb; pdb.set_trace()
+            msg = "%s: type A: (%s) B: (%s), and values differ. %s %s" % (
+                loc, a_type, b_type, vsum, sc_message)
+            self.ci["values_and_types_differ"][ctype].append(msg)
+        elif a_compress != b_compress:
+            assert types_match, "types should match, but don't"
+            assert vals_cmatch, "vals should match, but don't"
+            msg = "%s: types match (%s), values %smatch; %s" %(loc, a_type, cmatch_str, sc_message)
+            cf = "A" if a_compress else "B"
+            self.ci["only_compressed_in"][cf].append(msg)    
+        elif not sizes_match:
+            msg = "%s: types match (%s), values %smatch; sizes differ. %s" % (loc,
+                a_type, cmatch_str, sc_message)
+            self.ci["values_match_but_sizes_different"][ctype].append(msg)     
+        else:
+            assert types_match
+            assert vals_cmatch
+            assert sizes_match
+            assert compress_match
+            # everything matches
+            short_compress_msg = ", compress=%s" % a_compress if a_compress else ""
+            sclosly_msg = "closly matches " if vals_close else ""
+            # msg = "%s: (%s) %s size (%i)%s" % (loc, a_type, sclosly_msg, a_size, short_compress_msg)
+            try:
+                msg = "%s: %s %ssize (%s)%s %s" % (loc, a_type, sclosly_msg, a_size, short_compress_msg, vsum)
+            except UnicodeDecodeError as e:
+                error_exit("UnicodeDecodeError")
+            self.ci["everything_matches"][ctype].append(msg)
+
+    # make summary for two values that may or may not match
+    def make_values_summary(self, v1, v2, vals_cmatch):
+        """ Make short summary of values, or value if they match"""
+        v1s = self.make_value_summary(v1, self.f1)
+        if vals_cmatch:
+            val_sum = " val='%s'" % v1s
+        else:
+            v2s = self.make_value_summary(v2, self.f2)
+            val_sum = " val A='%s' b='%s'" % (v1s, v2s)
+        return val_sum
+
+    # make summary for single value
+    def make_value_summary(self, val, fileObj):
+        (value_summary, vs_msg, vs_msg_type) = vs.make_value_summary(val, fileObj)
+        if vs_msg:
+            assert vs_msg_type in ('warning', 'error')
+            if vs_msg not in self.ci[vs_msg_type]:
+                # only include message once
+                self.ci[vs_msg_type].append(vs_msg)
+        return value_summary
+
+    # make summary for h5py dataset, reading values a block at a time if possible
+    def make_dataset_summary(self, dset, fileObj):
+        if not vs.can_summarize_blocks(dset):
+            return self.make_value_summary(dset.value, fileObj)
+        (value_summary, vs_msg, vs_msg_type) = vs.make_dataset_summary(dset, fileObj,
+            block_bytes=self.stream_block_bytes)
+        if vs_msg:
+            assert vs_msg_type in ('warning', 'error')
+            if vs_msg not in self.ci[vs_msg_type]:
+                # only include message once
+                self.ci[vs_msg_type].append(vs_msg)
+        return value_summary
+
+    def can_stream(self, ds1, ds2):
+        """ Return True if datasets ds1 and ds2 should be compared block by block (option 'S').
+        Only done for large numeric datasets with the same type and shape.  Others are read
+        into memory and compared with values_match (which allows matching different types)."""
+        return (self.stream_datasets and ds1.dtype == ds2.dtype and ds1.shape == ds2.shape
+            and len(ds1.shape) > 0 and ds1.dtype.kind in 'biuf'
+            and ds1.dtype.itemsize * ds1.size >= self.stream_min_bytes)
+
+    def compare_datasets_streaming(self, ds1, ds2):
+        """ Compare datasets ds1 and ds2 (which have the same type and shape) block by block,
+        so memory used does not depend on the dataset size.  Float values are compared as
+        in values_match (NaN values in the same location match) and values_close.  The
+        comparison stops at the first block where the values neither match nor are close.
+        The hash used in the value summary is computed as the blocks are read, and is the
+        same as made by make_value_summary if the whole dataset was read.  Returns tuple
+        (vals_match, vals_close, vsum), vsum is the value summary."""
+        if self.single_file or raw_chunks_match(ds1, ds2):
+            # values match, only need summary of ds1
+            return (True, None, " val='%s'" % self.make_dataset_summary(ds1, self.f1))
+        vals_match = True
+        vals_close = None
+        prefix1 = prefix2 = None
+        hash1 = hash2 = zlib.adler32(b"")
+        diff_row = None
+        # set True if NaN found in matching blocks.  NaN values are not close (values_close)
+        nan_found = False
+        for start, b1 in vs.iter_blocks(ds1, self.stream_block_bytes):
+            hash1 = zlib.adler32(b1.view(np.byte), hash1)
+            if prefix1 is None:
+                prefix1 = get_stream_prefix(ds1, b1, self.f1)
+            b2 = ds2[start:start + len(b1)]
+            hash2 = zlib.adler32(b2.view(np.byte), hash2)
+            if prefix2 is None:
+                prefix2 = get_stream_prefix(ds2, b2, self.f2)
+            if vals_match:
+                if vs.values_match(b1, b2):
+                    nan_found = nan_found or (b1.dtype.kind == 'f' and bool(np.isnan(b1).any()))
+                    continue
+                vals_match = False
+                vals_close = not nan_found
+                diff_row = start + first_difference(b1, b2)
+            if vals_close and not values_close(b1, b2):
+                vals_close = False
+            if not vals_close:
+                if start + len(b1) < ds1.shape[0]:
+                    # stop at first block that does not match.  Hash only made for part read
+                    summary = " val A='%s...' b='%s...' differ starting at row %i" % (
+                        prefix1[0:41], prefix2[0:41], diff_row)
+                    return (vals_match, vals_close, summary)
+        v1s = make_streamed_summary(prefix1, hash1)
+        if vals_match or vals_close:
+            summary = " val='%s'" % v1s
+        else:
+            summary = " val A='%s' b='%s'" % (v1s, make_streamed_summary(prefix2, hash2))
+        return (vals_match, vals_close, summary)
+
+    def diff_groups(self, grp1, grp2, path):
+        ggp = (grp1, grp2, path)
+        # use queue to avoid recursion (more efficient)
+        to_check = deque([ggp])
+        while to_check:
+            ggp = to_check.popleft()
+            member_groups = self.diff_groups2(ggp)
+            to_check.extend(member_groups)
+
+    # this used within pdb to determine why some 2-D arrays did not match (had some elements NaN)    
+    # def cmp_arrays(v1, v2):
+    #     nx, ny = v1.shape
+    #     for x in range(nx):
+    #         for y in range(ny):
+    #             if(v1[x, y] != v2[x, y]):
+    #                 import pdb; pdb.set_trace()
+
+    # compare members of groups specified by ggp
+    # return list of additional groups to process
+    def diff_groups2(self, ggp):
+        self.ci["total_paired_found"]["group"] += 1
+        grp1, grp2, path = ggp
+        num_aids = self.diff_attributes(grp1, grp2, path)  # num_aids - number unique attribute ids
+        gi1 = get_group_info(path, grp1)
+        gi2 = get_group_info(path, grp2) if not self.single_file else gi1
+        in_a = set(gi1.keys())
+        in_b = set(gi2.keys())
+        only_in_a = list(in_a - in_b)
+        only_in_b = list(in_b - in_a)
+        self.save_only_in("A", only_in_a, gi1, grp1, self.f1)
+        self.save_only_in("B", only_in_b, gi2, grp2, self.f2)
+        common = sorted(list(in_a.intersection(in_b)))
+        num_mids = len(only_in_a) + len(only_in_b) + len(common)
+        if num_aids == 0 and num_mids == 0:
+            # these paired groups have no members or attributes
+            self.ci["empty_paired_groups"].append(path)
+        member_groups = []
+        for mid in common:
+            mpath = make_full_path(path, mid)
+            type_a = gi1[mid]['type']
+            type_b = gi2[mid]['type']
+            # in case either are soft links, save them
+            self.save_soft_link("A", gi1[mid])
+            self.save_soft_link("B", gi2[mid])
+            # use locations (object no) for detecting common paths (hard links)
+            previously_found = save_locations(self.ci['locations'], mpath, gi1[mid], gi2[mid])
+            if self.skip_paths is not None:
+                # comparing groups in worker processes, nodes may have been found in another process
+                previously_found = mpath in self.skip_paths
+            if previously_found:
+                # both of these nodes were found previously (because of links), no need to process
+                continue
+            if type_a != type_b:
+                msg = "%s node types different. A type='%s', B type='%s'" % (mpath, 
+                    type_a, type_b)
+                self.ci["node_types_different"].append(msg)
+                continue
+            # from here on, type_a == type_b.  Using type_a
+            if type_a in ("ext_link", "link"):
+                # external link, and soft links are already saved, in function save_soft_link
+                continue
+            # node types are the same, make sure they are either group or dataset
+            if type_a not in ("group", "dataset"):
+                msg = "%s unknown node type (%s)" % (mpath, type_a)
+                self.ci["unknown_node_types"].append(msg)
+                continue
+            if type_a == "dataset":
+                self.diff_attributes(grp1[mid], grp2[mid], mpath)
+                # set true if should filter this
+                do_filtering = self.filter_nwb and mpath in nwb_variable_datasets
+                ds1 = grp1[mid]
+                ds2 = grp2[mid]
+                if self.single_file:
+                    # making signature, values only needed for the summary
+                    cmp_info = (True, None, " val='%s'" % self.make_dataset_summary(ds1, self.f1))
+                    self.save_dataset_or_attribute_diff("dataset", mid, mpath, gi1, gi2, None, None,
+                        do_filtering, cmp_info)
+                elif self.can_stream(ds1, ds2):
+                    cmp_info = self.compare_datasets_streaming(ds1, ds2)
+                    self.save_dataset_or_attribute_diff("dataset", mid, mpath, gi1, gi2, None, None,
+                        do_filtering, cmp_info)
+                else:
+                    v1 = ds1.value
+                    v2 = ds2.value
+                    self.save_dataset_or_attribute_diff("dataset", mid, mpath, gi1, gi2, v1, v2, do_filtering)
+            else:
+                # Type is group, add to list of groups to process
+                mg1 = grp1[mid]
+                mg2 = grp2[mid]
+                ggp = (mg1, mg2, mpath)
+                member_groups.append(ggp)
+        return member_groups
+
+    def walk_groups(self):
+        """ Find the groups that are compared, in the order diff_groups compares them,
+        without reading any values.  Returns tuple (groups, skip_paths).  groups is a list
+        of tuples (path, parent, weight), where parent is the index of the parent group in
+        groups (None for the root) and weight is an estimate of the work to compare the
+        group (number of members and size of datasets).  skip_paths is a list of paths of
+        members not compared because they are hard links to nodes found before."""
+        groups = []
+        skip_paths = []
+        locations = { "A": {}, "B": {} }
+        to_check = deque([("/", None)])
+        while to_check:
+            path, parent = to_check.popleft()
+            index = len(groups)
+            gi1 = get_group_info(path, self.f1[path])
+            gi2 = get_group_info(path, self.f2[path]) if not self.single_file else gi1
+            weight = sum([node_weight + cim.get('size', 0) for cim in
+                list(gi1.values()) + list(gi2.values())])
+            for mid in sorted(list(set(gi1.keys()).intersection(gi2.keys()))):
+                mpath = make_full_path(path, mid)
+                if save_locations(locations, mpath, gi1[mid], gi2[mid]):
+                    skip_paths.append(mpath)
+                elif gi1[mid]['type'] == "group" and gi2[mid]['type'] == "group":
+                    to_check.append((mpath, index))
+            groups.append((path, parent, weight))
+        return (groups, skip_paths)
+
+    def diff_groups_parallel(self):
+        """ Compare groups using a pool of processes.  The group tree is first walked
+        (without reading values) to find the groups to compare and the hard links.  The
+        tree is then partitioned into subtrees which are compared by the worker processes,
+        each group making a separate ci.  These are merged in the order the groups are
+        compared by diff_groups, so the report is the same as when using one process."""
+        groups, skip_paths = self.walk_groups()
+        tasks = partition_groups(groups, 4 * self.processes)
+        file2 = self.file2 if not self.single_file else None
+        paths = [path for path, parent, weight in groups]
+        group_cis = [None] * len(groups)
+        # workers open the files themselves.  They must not be open in this process when
+        # the pool is created (forked), or hdf5 may read corrupted data in the workers
+        self.close_files()
+        try:
+            pool = multiprocessing.Pool(self.processes, init_worker, (self.file1, file2,
+                self.get_options(), paths, skip_paths))
+            try:
+                for results in pool.imap_unordered(compare_groups, tasks):
+                    for index, gci in results:
+                        group_cis[index] = gci
+                pool.close()
+            finally:
+                # does nothing if pool already closed normally
+                pool.terminate()
+                pool.join()
+        finally:
+            self.open_files()
+        for gci in group_cis:
+            merge_ci(self.ci, gci)
+
+    def diff_group_alone(self, path):
+        """ Compare group at path in both files, but not member groups.  Returns ci made
+        for just this group.  Used in worker processes."""
+        self.ci = initialize_ci()
+        self.diff_groups2((self.f1[path], self.f2[path], path))
+        return self.ci
+
+
+# Comparison and paths of groups used by worker processes when comparing groups in
+# parallel.  Set by init_worker
+worker_comparison = None
+worker_paths = None
+
+def init_worker(file1, file2, options, paths, skip_paths):
+    """ Initialize process used to compare groups.  Opens the files once for all the
+    groups compared by the process."""
+    global worker_comparison, worker_paths
+    worker_comparison = Comparison(file1, file2, **options)
+    worker_comparison.skip_paths = set(skip_paths)
+    worker_comparison.open_files()
+    worker_paths = paths
+
+def compare_groups(indices):
+    """ Compare groups with the given indices (into worker_paths).  Returns list of
+    tuples (index, ci) for each group."""
+    try:
+        return [(index, worker_comparison.diff_group_alone(worker_paths[index]))
+            for index in indices]
+    except SystemExit:
+        # error_exit was called.  Raise exception so the pool reports it rather than
+        # waiting for a process that exited
+        raise RuntimeError("Unable to compare groups in worker process")
+
+def diff_files(file1, file2=None, **options):
+    """ Compare file1 and file2 (or make signature of file1 if file2 is None) and
+    display report.  options are passed to Comparison.  Returns the Comparison."""
+    comparison = Comparison(file1, file2, **options)
+    comparison.diff_files()
+    return comparison
 
 
 # used for profiling
@@ -1312,7 +1683,7 @@ if __name__ == '__main__':
         display_doc()
         sys.exit(1)
     file1 = sys.argv[1]
-    opts = sys.argv[-1].lstrip("-") if sys.argv[-1].startswith('-') and len(sys.argv[-1]) > 2 else None
+    opts = sys.argv[-1].lstrip("-") if sys.argv[-1].startswith('-') and len(sys.argv[-1]) > 1 else None
     if len(sys.argv) == 4 and opts is None:
         print("Third input parameter should be <opts>, but value found does not start with '-': %s" % sys.argv[3])
         display_doc()
@@ -1320,7 +1691,7 @@ if __name__ == '__main__':
     file2 = sys.argv[2] if (len(sys.argv) == 3 and opts is None) or len(sys.argv) > 3 else None
     if opts is not None:
         given_opts = set(list(opts))
-        possible_options = set(['N', 'a'])
+        possible_options = set(['N', 'a', 'S', 'P'])
         found_options = possible_options.intersection(given_opts)
         unknown_options = list(given_opts - found_options)
         if len(unknown_options) > 0:
@@ -1330,13 +1701,9 @@ if __name__ == '__main__':
             sys.exit(1)
     else:
         found_options = []
-    filter_nwb = ("N" in found_options)
-    alpha_sort = ("a" in found_options)
-    # set to True if this file is being compared to itself
-    single_file = file2 is None
-    if single_file:
-        # compare file to itself to get information about links and sizes
-        diff_files(file1, file1)
-        # cProfile.run('diff_files("%s", "%s")' % (sys.argv[1], sys.argv[1]))
-    else:
-        diff_files(file1, file2)
+    # if file2 is None, file is compared to itself to get information about links and sizes
+    comparison = Comparison(file1, file2, filter_nwb=("N" in found_options),
+        alpha_sort=("a" in found_options), stream_datasets=("S" in found_options),
+        processes=None if "P" in found_options else 1)
+    comparison.diff_files()
+    # cProfile.run('comparison.diff_files()')
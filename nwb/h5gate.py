@@ -14,6 +14,15 @@ import imp
 import ast
 import shutil
 import array
+import fnmatch
+import hashlib
+import json
+from collections import deque, OrderedDict
+import tempfile
+try:
+    import cPickle as pickle  # py2, faster pickle
+except ImportError:
+    import pickle
 from . import find_links
 from . import combine_messages as cm
 from . import value_summary as vs
@@ -30,7 +39,7 @@ except NameError:
 
 class File(object):
     """ hdf5 file """
-    def __init__(self, fname, spec_files, default_ns="core", options=[]):
+    def __init__(self, fname, spec_files, default_ns="core", options=[], schema=None):
         """ Created file.
         fname - name of file
         spec_files - list of format specification files to load (written in h5gate 
@@ -42,6 +51,10 @@ class File(object):
         options - specified options.  Either a dictionary or a tuple that can be
         converted to a dictionary (with alternating keys and values).  See 
         'validate_options' below for possible options.
+        schema - Schema object (see class Schema below) made from the same spec_files
+        and default_ns.  If given, the already processed specifications in the schema
+        are used (and shared with other File objects using the same schema) rather
+        than loading and processing the specification files.
         """
         # self.test_filter_sigs()
         # sys.exit("all done")
@@ -53,20 +66,54 @@ class File(object):
         self.fsname2ns = {}
         self.file_already_exists = self.file_name and os.path.isfile(self.file_name)
         self.initialize_storage_method()
-        self.load_format_specifications(spec_files)
-        self.make_ordered_name_spaces()
-        self.reformat_structures()
+        self.idsigs = None
+        # expanded group definitions, see function get_expanded_def_cache_key
+        self.expanded_def_cache = {}
+        self.absolute_ids = None
+        if schema is not None:
+            spec_cache_path = None
+            spec_bundle = schema.get_bundle(spec_files, default_ns)
+        else:
+            spec_cache_path = self.get_spec_cache_path(spec_files)
+            spec_bundle = self.load_spec_cache(spec_cache_path)
+        if spec_bundle:
+            # processed specifications found in cache, no need to parse spec files
+            self.ddef = spec_bundle['ddef']
+            self.fsname2ns = spec_bundle['fsname2ns']
+            self.name_spaces = spec_bundle['name_spaces']
+            self.subclasses = spec_bundle['subclasses']
+        else:
+            self.load_format_specifications(spec_files)
+            self.make_ordered_name_spaces()
+            self.reformat_structures()
 #         for ns in self.ddef:
 #             print "**** structures for namespace %s" % ns
 #             pp.pprint(self.ddef[ns]['structures'])
 #         print "done for now"
 #         sys.exit(0)
-        self.find_subclasses()
+            self.find_subclasses()
         self.initialize_subclassed_node_list()
         self.reading_file = True
         self.create_scratch_group()
         self.reading_file = False
-        self.idlookups = self.mk_idlookups()
+        # msigs_cache used for storing cached msigs in routine add_msigs
+        # Initialize to: {">>hits": 0, ">>calls": 0} for counting hits and total calls
+        self.msigs_cache = {}
+        # indexes of idsigs and msigs made by function get_idsigs_index
+        self.idsigs_indexes = {}
+        if spec_bundle:
+            self.idlookups = spec_bundle['idlookups']
+            self.idsigs = spec_bundle['idsigs']
+            if 'msigs_cache' in spec_bundle:
+                # shared with other files using the same schema
+                self.msigs_cache = spec_bundle['msigs_cache']
+        else:
+            self.idlookups = self.mk_idlookups()
+            if spec_cache_path:
+                # idsigs are only needed when reading, but are included in the cache
+                # so the cache can be used for any mode
+                self.idsigs = self.make_idsigs()
+                self.save_spec_cache(spec_cache_path)
 #         print "idlookups is:"
 #         pp.pprint(self.idlookups)
     #    self.loce = self.make_locations_explicit()  # remove since locations no longer used
@@ -74,39 +121,72 @@ class File(object):
 #           pp.pprint(self.loce)
 #           print "---- loce above----"
         self.path2node = {}
+        self.lazy_groups = {}  # groups with members not yet loaded (option lazy_load)
+        self.init_read_cache()
+        self.loading_link_targets = False
         self.autogen = []   #  find_links.initialize_autogen()
         if self.options['mode'] == 'no_file':
             # not reading or writing a file
             return
         self.creating_file = self.options['mode'] == 'w' or not self.file_already_exists 
         self.custom_attributes = []
-        self.error =[]
-        self.warning = []
+        self.error = MessageList(self, 'error', 'error')
+        self.warning = MessageList(self, 'warning', 'warning')
         self.links = find_links.initialize()
         self.file_changed = False
+        # paths of nodes changed and targets of links made (used for option incremental_autogen)
+        self.changed_paths = set()
+        self.changed_link_targets = set()
         self.close_callback = None
-        self.open_file()
-        if not self.creating_file:
-            # reading file
-            self.reading_file = True  # this prevents saving data to hdf5 file when reading
-          #  self.lidsigs = self.make_lidsigs()  # remove since locations not used anymore
+        self.appended_datasets = []  # datasets extended by Dataset.append, trimmed on close
+        # indexes of file contents made by utility routines (e.g. timestamp indexes made by
+        # nwb_utils.add_epoch_ts).  Removed when the file is closed
+        self.indexes = {}
+        # fingerprints of attribute values written (see attribute_fingerprint), used to skip
+        # writing values that are unchanged.  Format: { path: { name: fingerprint, ... }, ... }
+        self.written_attributes = {}
+        # attributes to be written by flush_attributes, if buffering (see buffer_attributes)
+        self.attribute_buffer = None
+        # operations written by flush_writes if option write_behind is set (otherwise None).
+        # Same format as h5commands, e.g. ("create_group", path)
+        self.write_queue = ([] if self.options['write_behind'] and
+            self.options['storage_method'] == 'hdf5' else None)
+        # attributes written by flush_writes.  Format: { path: { name: value, ... }, ... }
+        self.queued_attributes = OrderedDict()
+        try:
+            self.open_file()
+            if not self.creating_file:
+                # reading file
+                self.reading_file = True  # this prevents saving data to hdf5 file when reading
+              #  self.lidsigs = self.make_lidsigs()  # remove since locations not used anymore
 #             print "lidsigs="
 #             pp.pprint(self.lidsigs)
 #             print "-------- lidsigs above"
-            self.idsigs = self.make_idsigs()
+                if self.idsigs is None:
+                    self.idsigs = self.make_idsigs()
 #             print "idsigs="
 #             pp.pprint(self.idsigs)
-            find_links.find(self.file_pointer, self.links)
+                find_links.find(self.file_pointer, self.links)
 #             find_links.show_stats(self.links)
 #             sys.exit("all done for now")
-            self.load_node_tree()
-            self.reading_file = False
-        else:
-            self.reading_file = False
-            self.initialize_node_tree()
-            self.links = find_links.initialize()
-            # self.save_format_specifications(dimp)
-            self.save_format_specifications(spec_files)
+                if self.options['lazy_load'] and self.options['mode'] == 'r':
+                    # load only root node.  Others loaded when accessed
+                    self.load_node(self.file_pointer["/"], "/", 'group')
+                    self.lazy_groups["/"] = self.file_pointer["/"]
+                else:
+                    self.load_node_tree()
+                self.reading_file = False
+            else:
+                self.reading_file = False
+                self.initialize_node_tree()
+                self.links = find_links.initialize()
+                # self.save_format_specifications(dimp)
+                self.save_format_specifications(spec_files)
+        except BaseException:
+            # error (or timeout) while opening or loading the file.  Close the hdf5 file
+            # now, rather than leaving it to be closed (with a message) when collected
+            self.abort()
+            raise
 
     def get_version(self):
         """Returns version information for this software."""
@@ -120,6 +200,29 @@ class File(object):
         modified."""
         self.close_callback = callback
         
+    def get_changed_groups(self):
+        """ Return set of paths of groups that may have autogen values changed during
+        this session (because of option incremental_autogen) or None if all autogen values
+        should be processed.  Returned set includes all groups containing a changed node.
+        The set is saved and only made again if more changes were made (e.g. by autogen
+        creating groups)."""
+        if (not self.options['incremental_autogen'] or self.creating_file or
+            self.options['mode'] not in ('r+', 'a')):
+            return None
+        # changes are only added, so number of changes tells if set must be made again
+        num_changes = (len(self.changed_paths), len(self.changed_link_targets))
+        if getattr(self, 'changed_groups_count', None) != num_changes:
+            changed_groups = set()
+            for path in self.changed_paths | self.changed_link_targets:
+                while path not in changed_groups:
+                    changed_groups.add(path)
+                    if path == "/":
+                        break
+                    path = find_links.get_parent_path(path)
+            self.changed_groups = changed_groups
+            self.changed_groups_count = num_changes
+        return self.changed_groups
+
     def validate_options(self):
         """Validate provided options and adds defaults for those not specified"""
         all_options = {
@@ -172,11 +275,95 @@ class File(object):
                     '(not custom and not extension) nodes.'),
                 'default': 'schema_id', },
             'auto_compress': {
-                'description': ('Automatically compress datasets.'),
+                'description': ('Automatically compress datasets.  Arrays smaller than '
+                    'small_dataset_bytes are not compressed (see option storage_policy).'),
                 'values': {
                     True: 'yes, compress',
                     False: 'no, do not compress'},
                 'default': True },
+            'storage_policy': {
+                'description': ('Chunking and compression settings used when creating '
+                    'datasets.  Either None (use default settings), a list of rules or a '
+                    'function.  Each rule is a dict with keys used to select datasets and '
+                    'keys giving settings.  Selection keys (all optional) are: "id" - pattern '
+                    'matched (using fnmatch) to the id of the dataset, qualified by the id '
+                    'of the parent group (e.g. "<ElectricalSeries>/data") or unqualified '
+                    '(e.g. "timestamps"); "path" - pattern matched to the full path; "dtype" - '
+                    'pattern matched to the numpy data type name (e.g. "float*"); '
+                    '"min_bytes", "max_bytes" - range of size of the data.  Setting keys '
+                    'are the h5py create_dataset parameters: chunks, compression (e.g. '
+                    '"gzip", "lzf" or None), compression_opts (e.g. gzip level), shuffle, '
+                    'fletcher32, fillvalue; and "chunk_bytes" which makes chunks of about '
+                    'that size spanning whole trailing dimensions.  The first rule '
+                    'matching a dataset is used.  Datasets not matching any rule use '
+                    'the default settings.  If a function, it is called with a dict '
+                    'describing the dataset (keys: id, path, dtype, shape, nbytes, maxshape) '
+                    'and returns a dict of settings.  Scalar datasets are never chunked or '
+                    'compressed.'),
+                'default': None },
+            'small_dataset_bytes': {
+                'description': ('Size (in bytes) of datasets at or below which default storage '
+                    'settings do not use compression, since compressing small arrays '
+                    'wastes time and usually does not save space.  Not used for expandable '
+                    'datasets, since their final size is not known when created.'),
+                'default': 4096 },
+            'write_behind': {
+                'description': ('Queue groups, datasets, links and attributes created rather '
+                    'than creating each in the hdf5 file when it is made.  The queue is written '
+                    '(by File.flush_writes) when the file is closed, before reading values '
+                    'from the file (e.g. when appending to a dataset or finding the overlap '
+                    'of an epoch and time series) or when a dataset larger than '
+                    'write_behind_bytes is made.  Writing the queue creates groups parents '
+                    'first, then datasets and links grouped by parent group, then all '
+                    'attributes of each node together, so each group is opened only once.  '
+                    'This reduces the time used in hdf5 metadata operations when making files '
+                    'containing many small groups and datasets.  Programs that access the '
+                    'hdf5 file directly (using File.file_pointer) must call flush_writes first.  '
+                    'The file contents are the same as without write_behind, but the layout '
+                    'and object addresses differ.  Only used with storage_method "hdf5".'),
+                'values': {
+                    True: 'yes, queue operations and write them together',
+                    False: 'no, create each node in the file when it is made'},
+                'default': False },
+            'write_behind_bytes': {
+                'description': ('Size (in bytes) of datasets above which data is written '
+                    'immediately (after writing the queue), rather than copied into the queue.  '
+                    'Used with option write_behind.'),
+                'default': 64 * 1024 },
+            'report_sink': {
+                'description': ('Function called with each validation message (including '
+                    'errors and warnings found when reading or creating the file) as soon as it '
+                    'is generated.  It is passed a dict (event) with keys: "code" - kind of '
+                    'message (e.g. "missing_nodes", "error"); "severity" - "error", "warning" or '
+                    '"info"; "node_type" - "group", "dataset" or None; "path" - path of node '
+                    'the message is about (or None if not known); "spec_id" - namespace and id '
+                    'of the node in the specification, e.g. "core:<TimeSeries>/" (or None); '
+                    '"message" - text of the message.  If None (default) events are not made.'),
+                'default': None },
+            'keep_messages': {
+                'description': ('Keep list of all validation messages so they can be displayed '
+                    'when the file is closed.  If False, only the number of each kind of '
+                    'message is kept, which limits memory used for files with many messages.  '
+                    'Messages are then only available through option report_sink.'),
+                'values': {
+                    True: 'yes, keep messages',
+                    False: 'no, only count messages'},
+                'default': True },
+            'combine_messages': {
+                'description': ('When displaying validation messages, combine messages that '
+                    'differ only by numbers (e.g. "trial_1", "trial_2") into one message.'),
+                'values': {
+                    True: 'yes, combine messages',
+                    False: 'no, display each message'},
+                'default': True },
+            'validation_state': {
+                'description': ('Name of file used to save the validation results of each '
+                    'node.  If specified, nodes that have not changed since the file was last '
+                    'validated (with the same specifications and validation options) are not '
+                    'validated again; the saved results are used instead.  The file is '
+                    'updated each time the file is validated.  If None (default) all nodes '
+                    'are always validated.'),
+                'default': None },
             'storage_method': {
                 'description': ('Method used to store data.  This allows for storing'
                     ' data using different storage methods.'),
@@ -249,6 +436,35 @@ class File(object):
                     'from the hdf5 file.'),
                 'default': '/general/specifications' # used in NWB format
             },
+            'spec_cache_dir': {
+                'description': ('Directory used to store compiled (processed) format '
+                    'specifications so they do not need to be processed each time a file is '
+                    'opened.  Cached specifications are identified by a hash of the content '
+                    'of the specification files and the version of this software, so changing '
+                    'a specification file automatically causes it to be processed again.  '
+                    'If None, specifications are not cached.'),
+                'default': None },
+            'lazy_load': {
+                'description': ('When reading a file (mode "r"), load nodes only when they '
+                    'are first accessed (by get_node or get_members) rather than loading all '
+                    'nodes when the file is opened.  This makes opening large files much '
+                    'faster if only some nodes are needed.  Validation (done when closing '
+                    'the file) requires all nodes, so is skipped unless they have all been '
+                    'loaded (e.g. by calling load_all_nodes).  Ignored if mode is not "r".'),
+                'values': {
+                    True: 'Load nodes when they are accessed',
+                    False: 'Load all nodes when the file is opened'},
+                'default': False },
+            'incremental_autogen': {
+                'description': ('When modifying an existing file (mode "r+" or "a"), only '
+                    'compute, update and validate autogen values in groups containing nodes '
+                    'that were changed (or that contain targets of links that were made).  '
+                    'Other autogen values are assumed to be unchanged from when the file '
+                    'was last closed, so are not checked.'),
+                'values': {
+                    True: 'Only process autogen values that may have changed',
+                    False: 'Process all autogen values when the file is closed'},
+                'default': True },
             'verbosity': {
                 'description': ('Controls how much is displayed in validation report.'),
                 'values': {
@@ -272,6 +488,21 @@ class File(object):
                     and isinstance(value[0], str) and isinstance(value[1], str)):
                     errors.append(("Invalid value for option 'custom_node_identifer', "
                         "must be [attribute_id, value], is: %s") % value)
+            elif opt == 'storage_policy':
+                if not (value is None or callable(value) or (isinstance(value, (list, tuple))
+                    and all(isinstance(rule, dict) for rule in value))):
+                    errors.append(("Invalid value for option 'storage_policy', must be None, "
+                        "a list of dicts or a function, is: %s") % value)
+            elif opt == 'validation_state':
+                if not (value is None or isinstance(value, str)):
+                    errors.append(("Invalid value for option 'validation_state', must be None "
+                        "or a file name, is: %s") % value)
+                elif value and self.options.get('keep_messages') is False:
+                    errors.append("Option 'validation_state' requires option 'keep_messages' True")
+            elif opt == 'report_sink':
+                if not (value is None or callable(value)):
+                    errors.append(("Invalid value for option 'report_sink', must be None "
+                        "or a function, is: %s") % value)
         if errors:
             print ("\n".join(errors))
             print ("valid options are:")
@@ -361,7 +592,75 @@ class File(object):
             raise Exception(("Default name space ('%s') was not defined in any format "
                 "specification file") % self.default_ns)
                 
-                
+
+    def get_spec_cache_path(self, spec_files):
+        """ Return path to file storing compiled format specifications for spec_files,
+        or None if specifications should not be cached.  The file name includes a hash
+        made from the content of each specification file, the default namespace and
+        the software version, so any change to these results in a different cache file."""
+        cache_dir = self.options['spec_cache_dir']
+        if not cache_dir or not spec_files:
+            # caching not requested, or specifications are loaded from hdf5 file
+            return None
+        h = self.hash_spec_files(spec_files)
+        cache_path = os.path.join(cache_dir, "h5gate_spec_%s.pkl" % h.hexdigest())
+        return cache_path
+
+    def hash_spec_files(self, spec_files):
+        """ Return sha1 hash object made from the content of each specification file,
+        the default namespace and the software version."""
+        h = hashlib.sha1()
+        for file_name in spec_files:
+            path = self.get_spec_file_path(file_name)
+            with open(path, "rb") as f:
+                file_contents = f.read()
+            h.update(("%s\n%i\n" % (file_name, len(file_contents))).encode('utf-8'))
+            h.update(file_contents)
+        h.update(("%s\n%s\npy%i" % (self.default_ns, self.get_version(),
+            version_info[0])).encode('utf-8'))
+        return h
+
+    def load_spec_cache(self, cache_path):
+        """ Load compiled format specifications from cache_path.  Returns the
+        dictionary saved by "save_spec_cache" or None if not available."""
+        if not cache_path or not os.path.isfile(cache_path):
+            return None
+        try:
+            with open(cache_path, "rb") as f:
+                spec_bundle = pickle.load(f)
+        except Exception as e:
+            # cache file corrupt or written by incompatible version, rebuild it
+            print ("Unable to load cached specifications from '%s', error is: %s" % (
+                cache_path, e))
+            return None
+        return spec_bundle
+
+    def save_spec_cache(self, cache_path):
+        """ Save compiled format specifications (processed definitions, idlookups,
+        subclasses and idsigs) to cache_path.  File is written to a temporary name,
+        then renamed so that other processes never read a partially written file."""
+        spec_bundle = {'ddef': self.ddef, 'fsname2ns': self.fsname2ns,
+            'name_spaces': self.name_spaces, 'subclasses': self.subclasses,
+            'idlookups': self.idlookups, 'idsigs': self.idsigs}
+        cache_dir = os.path.dirname(cache_path)
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(spec_bundle, f, pickle.HIGHEST_PROTOCOL)
+            try:
+                os.rename(tmp_path, cache_path)
+            except OSError:
+                # on some platforms rename fails if another process already saved it
+                os.remove(tmp_path)
+                if not os.path.isfile(cache_path):
+                    raise
+        except (IOError, OSError) as e:
+            # caching is only an optimization, continue without it
+            print ("Unable to save cached specifications to '%s', error is: %s" % (
+                cache_path, e))
+
     def save_format_specifications(self, spec_files):
         """ If requested and if write mode, save format specification files into hdf5 file"""
         if not self.creating_file:
@@ -520,26 +819,37 @@ class File(object):
         if self.reading_file or self.options['mode'] == 'no_file':
             return
         if self.options['storage_method'] == 'hdf5':
-            # execute h5py command
-            self.file_pointer.create_group(path)
+            if self.write_queue is not None:
+                # save for writing by flush_writes
+                self.write_queue.append(("create_group", path))
+            else:
+                # execute h5py command
+                self.file_pointer.create_group(path)
         elif self.options['storage_method'] == 'commands':
             # save command for later processing
             self.h5commands.append(("create_group", path,))
         else:
             raise Exception('Invalid option value for storage_method (%s)' % self.options['storage_method'])
         self.file_changed = True
+        self.changed_paths.add(path)
     
-    def create_dataset(self, path, data, dtype=None, compress=False, maxshape=None):
+    def create_dataset(self, path, data, dtype=None, compress=False, maxshape=None, storage=None):
         """ Creates a dataset using the selected storage_method option.  If storage_method
         is 'hdf5', dataset is created in the hdf5 file using h5py.  If storage method is
         'commands', command to create the group is saved for later processing by a
-        calling program, e.g. MatLab.  This is the only function used to create a dataset"""
+        calling program, e.g. MatLab.  This is the only function used to create a dataset.
+        storage, if specified, is a dict of h5py create_dataset parameters (chunks,
+        compression, compression_opts, shuffle, fletcher32, fillvalue), usually made by
+        get_storage_settings.  It is not used with storage_method 'commands'."""
         if self.reading_file or self.options['mode'] == 'no_file':
             return
         if self.options['storage_method'] == 'hdf5':
             # execute h5py command
+            storage = dict(storage) if storage else {}
             # compress if requested
-            compress = "gzip" if compress else None
+            if compress and not storage.get('compression'):
+                storage['compression'] = "gzip"
+
             # Need to check for dtype type string because could be special h5py dtype
             # used for a text type with dimension is *unlimited*
             # set in function get_default_dtype  
@@ -575,14 +885,77 @@ class File(object):
 #             if isinstance(sdata, list) and len(sdata) > 0 and isinstance(sdata[0], unicode):
 #                 # replace unicode by array of utf8 because h5py does not allow unicode values in lists
 #                 sdata = [v.encode('utf8') for v in sdata]
+            if self.write_queue is not None:
+                queued_data = self.copy_queued_data(sdata)
+                if queued_data is not None:
+                    # save for writing by flush_writes
+                    self.write_queue.append(("create_dataset", path, queued_data[0], dtype,
+                        maxshape, storage))
+                    self.file_changed = True
+                    self.changed_paths.add(path)
+                    return
+                # dataset too large to copy into queue.  Create parents, then write it now
+                self.flush_writes()
             self.file_pointer.create_dataset(path, data=sdata, dtype=dtype, 
-                compression=compress, maxshape=maxshape)
+                maxshape=maxshape, **storage)
         elif self.options['storage_method'] == 'commands':
             # save command for later processing
             self.h5commands.append(("create_dataset", path, data, dtype, compress, maxshape))
         else:
             raise Exception('Invalid option value for storage_method (%s)' % self.options['storage_method'])
         self.file_changed = True
+        self.changed_paths.add(path)
+
+    def get_storage_settings(self, info):
+        """ Return dict of h5py create_dataset parameters (chunks, compression, ...)
+        to use for a dataset, selected using option 'storage_policy'.  info is a dict
+        describing the dataset, with keys: id (id qualified by id of parent group),
+        path, dtype (numpy dtype), shape, nbytes and maxshape."""
+        policy = self.options['storage_policy']
+        if callable(policy):
+            settings = policy(info)
+            settings = dict(settings) if settings else {}
+        else:
+            settings = None
+            for rule in (policy or []):
+                if self.storage_rule_matches(rule, info):
+                    settings = dict(rule)
+                    break
+            if settings is None:
+                # no rule matches, use default settings.  Final size of expandable
+                # datasets is not known, so they are compressed even if small
+                settings = {}
+                if (self.options['auto_compress'] and (info['maxshape'] is not None or
+                    info['nbytes'] > self.options['small_dataset_bytes'])):
+                    settings['compression'] = "gzip"
+                    settings['chunk_bytes'] = 256 * 1024
+            for key in ('id', 'path', 'dtype', 'min_bytes', 'max_bytes'):
+                settings.pop(key, None)
+        chunk_bytes = settings.pop('chunk_bytes', None)
+        if 'chunks' not in settings and (chunk_bytes or info['maxshape'] is not None):
+            # make chunks spanning whole trailing dimensions, 64 KiB if dataset expandable
+            chunk_bytes = chunk_bytes if chunk_bytes else 64 * 1024
+            settings['chunks'] = make_chunk_shape(info['shape'], info['dtype'],
+                info['maxshape'], chunk_bytes)
+        return settings
+
+    def storage_rule_matches(self, rule, info):
+        """ Return True if storage policy rule (dict) selects dataset described by info.
+        See get_storage_settings."""
+        if 'id' in rule:
+            unqualified_id = info['id'].split('/')[-1]
+            if not (fnmatch.fnmatchcase(info['id'], rule['id']) or
+                fnmatch.fnmatchcase(unqualified_id, rule['id'])):
+                return False
+        if 'path' in rule and not fnmatch.fnmatchcase(info['path'], rule['path']):
+            return False
+        if 'dtype' in rule and not fnmatch.fnmatchcase(info['dtype'].name, rule['dtype']):
+            return False
+        if 'min_bytes' in rule and info['nbytes'] < rule['min_bytes']:
+            return False
+        if 'max_bytes' in rule and info['nbytes'] > rule['max_bytes']:
+            return False
+        return True
 
     def create_dataset_old(self, path, data, dtype=None, compress=False, maxshape=None):
         """ Creates a dataset using the selected storage_method option.  If storage_method
@@ -641,14 +1014,19 @@ class File(object):
         if self.reading_file or self.options['mode'] == 'no_file':
             return
         if self.options['storage_method'] == 'hdf5':
-            # execute h5py command
-            self.file_pointer[path] = h5py.SoftLink(target_path)
+            if self.write_queue is not None:
+                # save for writing by flush_writes
+                self.write_queue.append(("create_softlink", path, target_path))
+            else:
+                # execute h5py command
+                self.file_pointer[path] = h5py.SoftLink(target_path)
         elif self.options['storage_method'] == 'commands':
             # save command for later processing
             self.h5commands.append(("create_softlink", path, target_path))
         else:
             raise Exception('Invalid option value for storage_method (%s)' % self.options['storage_method'])
         self.file_changed = True
+        self.changed_paths.add(path)
  
     def create_external_link(self, path, target_file, target_path):
         """ Creates an external link using the selected storage_method option.  If storage_method
@@ -657,47 +1035,186 @@ class File(object):
         if self.reading_file or self.options['mode'] == 'no_file':
             return
         if self.options['storage_method'] == 'hdf5':
-            # execute h5py command
-            # self.file.file_pointer[self.full_path] =  h5py.ExternalLink(file,path)
-            self.file_pointer[path] =  h5py.ExternalLink(target_file, target_path)
+            if self.write_queue is not None:
+                # save for writing by flush_writes
+                self.write_queue.append(("create_external_link", path, target_file, target_path))
+            else:
+                # execute h5py command
+                # self.file.file_pointer[self.full_path] =  h5py.ExternalLink(file,path)
+                self.file_pointer[path] =  h5py.ExternalLink(target_file, target_path)
         elif self.options['storage_method'] == 'commands':
             # save command for later processing
             self.h5commands.append(("create_external_link", path, target_file, target_path))
         else:
             raise Exception('Invalid option value for storage_method (%s)' % self.options['storage_method'])
         self.file_changed = True
+        self.changed_paths.add(path)
 
     def set_attribute(self, path, name, value):
         """ Set an attribute using the selected storage_method option.  If storage_method
         is 'hdf5', set using h5py.  If storage method is 'commands', save command for later
         processing by a calling program, e.g. MatLab."""
+        self.set_attributes(path, [(name, value)])
+
+    def set_attributes(self, path, values):
+        """ Set attributes of node at path.  values is a list of (name, value) pairs.  If
+        attributes are being buffered (see buffer_attributes), values are saved and written
+        by flush_attributes.  Otherwise they are written immediately by write_attributes."""
         if self.reading_file or self.options['mode'] == 'no_file':
             return
-        if self.options['storage_method'] == 'hdf5':
-            # execute h5py command
-            # py3 - check for array of unicode, if found replace by array of utf8
-#             if isinstance(value, list) and len(value) > 0 and isinstance(value[0], unicode):
-#                 # replace unicode by array of utf8 because h5py does not allow unicode values in lists
-#                 value = [v.encode('utf8') for v in value]
-            # experimental, convert string to value for optimized storage in hdf5
-            # for testing with variable length strings with script crcns_alm-1.py
-#             if path == '/epochs' and name == 'tags':
-#                 # import pdb; pdb.set_trace()
-#                 dt = h5py.special_dtype(vlen=unicode)
-#                 value = np.array(value, dtype=dt)
-            value2 = str2h5(value)
-            self.file_pointer[path].attrs[name] = value2
-#             try:
-#                 self.file_pointer[path].attrs[name] = value2
-#             except TypeError as e:
-#                 import pdb; pdb.set_trace()
-        elif self.options['storage_method'] == 'commands':
-            # save command for later processing
-            self.h5commands.append(("set_attribute", path, name, value))
+        if self.attribute_buffer is not None:
+            # a later value for the same attribute replaces an earlier one
+            pending = self.attribute_buffer.setdefault(path, OrderedDict())
+            for name, value in values:
+                pending[name] = value
+            return
+        self.write_attributes(path, values)
+
+    def buffer_attributes(self):
+        """ Start saving attribute values rather than writing them, so all attributes
+        set for a node can be written together (with the node opened once) by
+        flush_attributes.  Used when updating autogen values."""
+        if self.attribute_buffer is None:
+            self.attribute_buffer = {}
+
+    def flush_attributes(self):
+        """ Write attribute values saved since buffer_attributes was called and stop
+        buffering."""
+        attribute_buffer = self.attribute_buffer
+        self.attribute_buffer = None
+        if attribute_buffer:
+            for path in sorted(attribute_buffer):
+                pending = attribute_buffer[path]
+                self.write_attributes(path, list(pending.items()))
+
+    def write_attributes(self, path, values):
+        """ Write attributes (list of (name, value) pairs) of node at path using the
+        selected storage_method option.  If storage_method is 'hdf5', the node is opened
+        once and all attributes set using h5py.  If storage method is 'commands', save
+        commands for later processing by a calling program, e.g. MatLab.  Attributes
+        that have the same value as previously written are skipped."""
+        storage_method = self.options['storage_method']
+        if storage_method not in ('hdf5', 'commands'):
+            raise Exception('Invalid option value for storage_method (%s)' % storage_method)
+        written = self.written_attributes.setdefault(path, {})
+        changed = []
+        for name, value in values:
+            if storage_method == 'hdf5':
+                # experimental, convert string to value for optimized storage in hdf5
+                # py3 - this also converts arrays of unicode, which h5py does not allow in lists
+                value = str2h5(value)
+            fingerprint = attribute_fingerprint(value)
+            if fingerprint is not None and written.get(name) == fingerprint:
+                continue
+            written[name] = fingerprint
+            changed.append((name, value))
+        if not changed:
+            return
+        if storage_method == 'hdf5' and self.write_queue is not None:
+            # save copy for writing by flush_writes, so value cannot be changed by caller
+            queued = self.queued_attributes.setdefault(path, OrderedDict())
+            for name, value in changed:
+                queued[name] = copy.deepcopy(value)
+        elif storage_method == 'hdf5':
+            # execute h5py commands, opening node only once
+            attrs = self.file_pointer[path].attrs
+            for name, value in changed:
+                attrs[name] = value
         else:
-            raise Exception('Invalid option value for storage_method (%s)' % self.options['storage_method'])
+            # save commands for later processing
+            for name, value in changed:
+                self.h5commands.append(("set_attribute", path, name, value))
         self.file_changed = True
+        self.changed_paths.add(path)
+
+    def delete_attribute(self, path, name):
+        """ Delete attribute (if present) from node at path"""
+        if self.attribute_buffer is not None and path in self.attribute_buffer:
+            self.attribute_buffer[path].pop(name, None)
+        if path in self.written_attributes:
+            self.written_attributes[path].pop(name, None)
+        if path in self.queued_attributes:
+            self.queued_attributes[path].pop(name, None)
+        self.flush_writes()
+        if name in self.file_pointer[path].attrs:
+            del self.file_pointer[path].attrs[name]
                               
+    def copy_queued_data(self, data):
+        """ Return tuple containing copy of data (value for create_dataset) to save in
+        write_queue, so the value written is not changed if the caller modifies data before
+        flush_writes is called.  Return None if data is too large (larger than option
+        write_behind_bytes) or of a type that is not copied (e.g. h5py Dataset)."""
+        max_bytes = self.options['write_behind_bytes']
+        if isinstance(data, (np.ndarray, np.generic)):
+            return (data.copy(), ) if data.nbytes <= max_bytes else None
+        if isinstance(data, (list, tuple)):
+            # estimate size assuming 8 bytes per element
+            return (copy.deepcopy(data), ) if len(data) * 8 <= max_bytes else None
+        if isinstance(data, (str, unicode, bytes, int, float, bool)) or data is None:
+            # immutable, no need to copy
+            return (data, ) if not hasattr(data, '__len__') or len(data) <= max_bytes else None
+        return None
+
+    def flush_writes(self):
+        """ Write operations queued because option write_behind is set.  Groups are
+        created parents first, then datasets and links, grouped by parent so each
+        parent group is opened only once, then attributes (all those for a node
+        together).  The contents of the file (groups, datasets, links, attributes and
+        values) are the same as if the operations were not queued, but the layout in the
+        file and object addresses differ, so object ids (e.g. those shown by h5diffsig for
+        hard links) and the file bytes do not match a file made without write_behind."""
+        if not self.write_queue and not self.queued_attributes:
+            return
+        write_queue = self.write_queue
+        queued_attributes = self.queued_attributes
+        self.write_queue = []
+        self.queued_attributes = OrderedDict()
+        # h5py groups and datasets opened or created, by path
+        h5nodes = {}
+        def get_h5node(path):
+            h5node = h5nodes.get(path)
+            if h5node is None:
+                try:
+                    h5node = self.file_pointer[path]
+                except KeyError:
+                    # group not created explicitly, create it with any missing parents
+                    # (same as if create_group called with a path to a group not created)
+                    h5node = self.file_pointer.create_group(path)
+                h5nodes[path] = h5node
+            return h5node
+        # create groups, parents first.  Sort is stable, so otherwise order is unchanged
+        group_paths = [op[1] for op in write_queue if op[0] == "create_group"]
+        group_paths.sort(key=lambda path: path.count('/'))
+        for path in group_paths:
+            parent_path, name = path.rsplit('/', 1)
+            h5nodes[path] = get_h5node(parent_path or '/').create_group(name)
+        # create datasets and links grouped by parent
+        members = OrderedDict()
+        for op in write_queue:
+            if op[0] != "create_group":
+                parent_path = op[1].rsplit('/', 1)[0] or '/'
+                members.setdefault(parent_path, []).append(op)
+        for parent_path, ops in members.items():
+            parent = get_h5node(parent_path)
+            for op in ops:
+                path = op[1]
+                name = path.rsplit('/', 1)[1]
+                if op[0] == "create_dataset":
+                    data, dtype, maxshape, storage = op[2:]
+                    h5nodes[path] = parent.create_dataset(name, data=data, dtype=dtype,
+                        maxshape=maxshape, **storage)
+                elif op[0] == "create_softlink":
+                    parent[name] = h5py.SoftLink(op[2])
+                elif op[0] == "create_external_link":
+                    parent[name] = h5py.ExternalLink(op[2], op[3])
+                else:
+                    raise Exception('Invalid operation in write_queue (%s)' % op[0])
+        # set attributes, opening each node once
+        for path, values in queued_attributes.items():
+            attrs = get_h5node(path).attrs
+            for name, value in values.items():
+                attrs[name] = value
+
     def get_file_to_open(self):
         """ Checks if should open a temporary file in order to preserve the original file as
         a backup."""
@@ -776,6 +1293,22 @@ class File(object):
         # this used to update the modification_date in the nwb format api
         if self.close_callback:
             self.close_callback(self)
+        # write operations queued by option write_behind.  Nodes made after this (by
+        # autogen) are written immediately, since values are read for validation
+        self.flush_writes()
+        self.write_queue = None
+        # indexes refer to open hdf5 nodes and are not needed after the file is closed
+        self.indexes.clear()
+        # remove space allocated, but not used by Dataset.append
+        for ds in self.appended_datasets:
+            ds.trim()
+        if self.lazy_groups:
+            # not all nodes loaded (option lazy_load).  Cannot do validation
+            if self.options['verbosity'] == 'all':
+                print ("Not all nodes loaded (lazy_load option).  Skipping validation.")
+            self.file_pointer.close()
+            self.written_attributes.clear()
+            return None
         if self.options['mode'] in ['w', 'r+']:
             # file opened in write mode.  Update links information, then update autogen
             find_links.build_links_dicts(self.links)
@@ -786,6 +1319,8 @@ class File(object):
             find_links.process_autogen(self)
         self.prune_unused_subclasses()
         validation_result = self.validate_file()
+        # no more attributes will be written
+        self.written_attributes.clear()
         if self.options['storage_method'] == 'hdf5':
             self.file_pointer.close()
             self.save_temporary_file()
@@ -793,6 +1328,16 @@ class File(object):
             self.h5commands.append(("close_file", ))
         return validation_result
             
+    def abort(self):
+        """ Close the hdf5 file without finalizing it (no autogen or validation).  Used
+        when an error or timeout stops processing the file."""
+        if getattr(self, 'file_pointer', None):
+            try:
+                self.file_pointer.close()
+            except (RuntimeError, SystemError, ValueError):
+                pass
+        self.file_pointer = None
+
     def __del__(self):
         """ Close file if not already closed.  This called when the File object is
         deleted.  File might not have been closed if an error was found.
@@ -1933,6 +2478,7 @@ class File(object):
             'ext_links': {},
             'explanations': {}
             }
+        self.make_message_lists(vi)
         # check "locations" section of specification(s) for missing nodes
         # 'id_lookups' has information about nodes created there
 #         for ns in self.id_lookups:
@@ -1945,7 +2491,9 @@ class File(object):
 #                         node_info = self.format_node_info(ns, path, id)
 #                         vi['missing_nodes'][type].append(node_info)
         # check entire node_tree (all nodes created)
+        self.validation_state = self.load_validation_state()
         self.validate_nodes(self.node_tree, vi)
+        self.save_validation_state()
 #         # to_check = [self.node_tree, ]
 #         while False:  #  to_check:  # former code if have top and locations
 #             group = to_check.pop(0)
@@ -2093,6 +2641,60 @@ class File(object):
         return validation_result   
         
 
+    def make_message_lists(self, vi):
+        """ Replace each list of messages in vi (validation information) by a
+        MessageList, which sends messages to the report sink and counts them."""
+        severities = {
+            'missing_nodes': 'error',
+            'missing_attributes': 'error',
+            'incorrect_attribute_values': 'error',
+            'custom_nodes_missing_flag': 'error',
+            'extension_nodes_missing_flag': 'error',
+            'custom_nodes_inside_custom_missing_flag': 'warning',
+            'missing_recommended': 'warning',
+            'recommended_attributes_missing': 'warning',
+            'recommended_attributes_empty': 'warning',
+            'required_attributes_empty': 'warning',
+            'added_attributes_not_described_by_extension': 'warning',
+            'identified_custom_nodes': 'info',
+            'identified_extension_nodes': 'info',
+            'added_attributes_described_by_extension': 'info'}
+        for code in severities:
+            if isinstance(vi[code], dict):
+                for type in vi[code]:
+                    vi[code][type] = MessageList(self, code, severities[code], type)
+            else:
+                vi[code] = MessageList(self, code, severities[code])
+
+    def report_message(self, messages, message):
+        """ Send message (just added to MessageList messages) to the report sink
+        (option report_sink) as an event."""
+        # most messages start with the path of the node, sometimes prefixed by a namespace
+        match = re.match(r'^(?:[\w-]+:)?(/[^\s:]*)', message) if isinstance(message, str) else None
+        path = match.group(1) if match else None
+        event = {'code': messages.code, 'severity': messages.severity,
+            'node_type': messages.node_type, 'path': path,
+            'spec_id': self.get_spec_id(path, messages.node_type), 'message': message}
+        self.options['report_sink'](event)
+
+    def get_spec_id(self, path, node_type=None):
+        """ Return namespace and id of node at path, e.g. "core:<TimeSeries>/".  If there
+        is no node at path (e.g. it's missing), the id is made from the name and
+        the namespace of the parent.  Returns None if not known."""
+        if not path:
+            return None
+        path = path.rstrip('/') if path != "/" else path
+        if path in self.path2node:
+            sdef = self.path2node[path].sdef
+            if 'id' in sdef and 'ns' in sdef:
+                return "%s:%s" % (sdef['ns'], sdef['id'])
+            return None
+        parent_path, name = self.get_name_from_full_path(path)
+        if parent_path in self.path2node and 'ns' in self.path2node[parent_path].sdef:
+            suffix = "/" if node_type == 'group' else ""
+            return "%s:%s%s" % (self.path2node[parent_path].sdef['ns'], name, suffix)
+        return None
+
     def display_report_heading(self, count, name, zero_msg = None):
         # Create message text like:  "** No errors.  - Great!" or "** One error."
         # or "34 errors.".  count is the number of errors or other count.
@@ -2141,150 +2743,308 @@ class File(object):
 
 
     def validate_nodes(self, root_node, vi):
-        """ Check if node contains all required components or if it is custom."""
-        to_check = [root_node]
+        """ Check if node contains all required components or if it is custom.
+        If a validation state was loaded (option validation_state), nodes that have
+        not changed since the state was saved are not validated again.  Instead, the
+        messages saved for them are added to the validation messages."""
+        state = self.validation_state
+        if state is not None:
+            sinks = self.get_validation_sinks(vi)
+        to_check = deque([root_node])
         while len(to_check) > 0:
-            node = to_check.pop(0)
-            custom = 'custom' in node.sdef and node.sdef['custom']
-            # assign "has_df" True if definition for node present (from a namespace)
-            # a node can be custom and still have a definition if it's it's a known "top_level"
-            # structure placed in a custom location.  In that case, custom and has_df are both True
-            # has_df = len(node.sdef) > 1
-            # if node is a link, don't validate attributes or check for node identifiers
-            # (which are attributes) since links cannot have attributes
-            is_link = node.link_info is not None
-            type = node.sdef['type']
+            node = to_check.popleft()
+            if state is None:
+                self.validate_node(node, vi, to_check)
+                continue
+            key = self.make_validation_key(node)
+            saved = state['saved'].get(node.full_path)
+            if (saved and saved['key'] == key and node.full_path not in self.changed_paths
+                and all(path in self.path2node for path in saved['children'])):
+                # node unchanged, use saved validation results
+                self.replay_node_validation(node, saved, vi, sinks)
+                state['nodes'][node.full_path] = saved
+                to_check.extend([self.path2node[path] for path in saved['children']])
+                continue
+            counts = [len(messages) for name, messages in sinks]
+            children = []
+            self.validate_node(node, vi, children)
+            to_check.extend(children)
+            events = {}
+            for (name, messages), count in zip(sinks, counts):
+                if len(messages) > count:
+                    events[name] = messages[count:]
+            state['nodes'][node.full_path] = {'key': key, 'events': events,
+                'children': [child.full_path for child in children],
+                'explanation': vi['explanations'].get(node.full_path)}
+
+    def validate_node(self, node, vi, to_check):
+        """ Validate one node.  Messages are added to lists in vi (validation
+        information), self.error and self.warning.  Members of groups that should
+        be validated are appended to to_check."""
+        custom = 'custom' in node.sdef and node.sdef['custom']
+        # assign "has_df" True if definition for node present (from a namespace)
+        # a node can be custom and still have a definition if it's it's a known "top_level"
+        # structure placed in a custom location.  In that case, custom and has_df are both True
+        # has_df = len(node.sdef) > 1
+        # if node is a link, don't validate attributes or check for node identifiers
+        # (which are attributes) since links cannot have attributes
+        is_link = node.link_info is not None
+        type = node.sdef['type']
 #             if node.full_path == "/analysis/aibs_spike_times/pto_link":
 #                 import pdb; pdb.set_trace()
-            if custom:
-                if (self.options['identify_custom_nodes']) and not is_link:
-                    caid, cval = self.options['custom_node_identifier']
-                    # if not (caid in node.h5attrs and cval == node.h5attrs[caid]):
-                    if (not (caid in node.h5attrs and # py3, need to use value_match
-                        vs.values_match(cval, node.h5attrs[caid]))):
-                        # custom node identifier is missing
-                        if type not in ('group', 'dataset') or node.link_info:
-                            # type must be external link or is a custom link.  Warning will be
-                            # displayed elsewhere.  Nothing to do here.  Warnings for custom
-                            # links are generated in find_links.validate_link
-                            # print "TMP: %s, type='%s', sdef=" % (node.full_path, type)
-                            # pp.pprint(node.sdef)
-                            pass 
-                        elif (node.parent and 'custom' in node.parent.sdef and
-                            node.parent.sdef['custom'] and not self.closed_group(node.parent)):
-                            # this node is inside an already known custom node,
-                            # make a warning rather than an error
-                            vi['custom_nodes_inside_custom_missing_flag'][type].append(node.full_path)
-                        else:
-                            vi['custom_nodes_missing_flag'][type].append(node.full_path)
-                            if 'h5nsig' in node.sdef:
-                                # this was inside a non-custom node.  If possible, create explanation
-                                # for why is was not detected as non-custom
-                                explanation = self.explain_why_custom(node)
-                                if explanation:
-                                    vi['explanations'][node.full_path] = explanation
+        if custom:
+            if (self.options['identify_custom_nodes']) and not is_link:
+                caid, cval = self.options['custom_node_identifier']
+                # if not (caid in node.h5attrs and cval == node.h5attrs[caid]):
+                if (not (caid in node.h5attrs and # py3, need to use value_match
+                    vs.values_match(cval, node.h5attrs[caid]))):
+                    # custom node identifier is missing
+                    if type not in ('group', 'dataset') or node.link_info:
+                        # type must be external link or is a custom link.  Warning will be
+                        # displayed elsewhere.  Nothing to do here.  Warnings for custom
+                        # links are generated in find_links.validate_link
+                        # print "TMP: %s, type='%s', sdef=" % (node.full_path, type)
+                        # pp.pprint(node.sdef)
+                        pass 
+                    elif (node.parent and 'custom' in node.parent.sdef and
+                        node.parent.sdef['custom'] and not self.closed_group(node.parent)):
+                        # this node is inside an already known custom node,
+                        # make a warning rather than an error
+                        vi['custom_nodes_inside_custom_missing_flag'][type].append(node.full_path)
                     else:
-                        if self.closed_group(node.parent):
-                            # generate an error because additions not allowed in this group
-                            msg = "%s: addition not allowed because parent group specified as closed" % (
-                                node.full_path)
-                            self.error.append(msg)
-                        else:
-                            vi['identified_custom_nodes'][type].append(node.full_path)
-            elif (node.sdef['ns'] != self.default_ns and self.options['identify_extension_nodes']
-                and not is_link):
-                # this node defined in an extension and should be identified by an attribute
-                eaid = self.options['extension_node_identifier']
-                found_match = False
-                if eaid in node.h5attrs:
-                    found_val = node.h5attrs[eaid]
-                    expected_val = "%s:%s" % (node.sdef['ns'], node.sdef['id'])
-                    if (vs.values_match(found_val, expected_val) or 
-                        vs.values_match(found_val, node.sdef['ns'])): #py3, use values_match
-                        found_match = True
-                if found_match:
-                    vi['identified_extension_nodes'][type].append(node.full_path)
+                        vi['custom_nodes_missing_flag'][type].append(node.full_path)
+                        if 'h5nsig' in node.sdef:
+                            # this was inside a non-custom node.  If possible, create explanation
+                            # for why is was not detected as non-custom
+                            explanation = self.explain_why_custom(node)
+                            if explanation:
+                                vi['explanations'][node.full_path] = explanation
                 else:
-                    vi['extension_nodes_missing_flag'][type].append(node.full_path)
-            self.validate_attributes(node, vi)
-            if node.link_info:
-                # this node is link to another node
-                link_info = node.link_info
-                if 'node' in link_info:
-                    if link_info['node'] is None:
-                        # link was expected but not present. Error should already be generated for this
+                    if self.closed_group(node.parent):
+                        # generate an error because additions not allowed in this group
+                        msg = "%s: addition not allowed because parent group specified as closed" % (
+                            node.full_path)
+                        self.error.append(msg)
+                    else:
+                        vi['identified_custom_nodes'][type].append(node.full_path)
+        elif (node.sdef['ns'] != self.default_ns and self.options['identify_extension_nodes']
+            and not is_link):
+            # this node defined in an extension and should be identified by an attribute
+            eaid = self.options['extension_node_identifier']
+            found_match = False
+            if eaid in node.h5attrs:
+                found_val = node.h5attrs[eaid]
+                expected_val = "%s:%s" % (node.sdef['ns'], node.sdef['id'])
+                if (vs.values_match(found_val, expected_val) or 
+                    vs.values_match(found_val, node.sdef['ns'])): #py3, use values_match
+                    found_match = True
+            if found_match:
+                vi['identified_extension_nodes'][type].append(node.full_path)
+            else:
+                vi['extension_nodes_missing_flag'][type].append(node.full_path)
+        self.validate_attributes(node, vi)
+        if node.link_info:
+            # this node is link to another node
+            link_info = node.link_info
+            if 'node' in link_info:
+                if link_info['node'] is None:
+                    # link was expected but not present. Error should already be generated for this
+                    return
+                # normal link
+                target_path = node.link_info['node'].full_path
+                find_links.add_item(vi['links'], target_path, node.full_path)
+            elif 'extlink' in link_info:
+                # external link
+                target = link_info['extlink']
+                # See if can access attribute in external link
+                try:
+                    tnode = self.file_pointer[node.full_path]
+                except KeyError:
+                    # unable to open extlink
+                    msg = "%s: external link target not found: file='%s', path='%s'" % (
+                        node.full_path, target[0], target[1])
+                    self.warning.append(msg)
+                find_links.add_item(vi['ext_links'], target, node.full_path)
+            else:
+                error_exit("Unknown link_info type: %s" % link_info)
+        elif type == 'group':
+            # check if any nodes required in this group are missing using local qty info
+            # first, get list of id's that are referenced in "_required" specification
+            required_info = self.get_required_info(node)
+            required_referenced = required_info['id_status'] if required_info else {}
+            exclude_info = self.get_exclude_info(node)
+            for id in sorted(node.mstats.keys()):
+                idinfo = node.mstats[id]
+                qty = idinfo['qty']
+                type = idinfo['type']
+                created = idinfo['created']
+                is_excluded = exclude_info and id in exclude_info['ids']
+                if is_excluded:
+                    if not created:
+                        # is excluded and was not created.  Good.
                         continue
-                    # normal link
-                    target_path = node.link_info['node'].full_path
-                    find_links.add_item(vi['links'], target_path, node.full_path)
-                elif 'extlink' in link_info:
-                    # external link
-                    target = link_info['extlink']
-                    # See if can access attribute in external link
-                    try:
-                        tnode = self.file_pointer[node.full_path]
-                    except KeyError:
-                        # unable to open extlink
-                        msg = "%s: external link target not found: file='%s', path='%s'" % (
-                            node.full_path, target[0], target[1])
-                        self.warning.append(msg)
-                    find_links.add_item(vi['ext_links'], target, node.full_path)
-                else:
-                    error_exit("Unknown link_info type: %s" % link_info)
-            elif type == 'group':
-                # check if any nodes required in this group are missing using local qty info
-                # first, get list of id's that are referenced in "_required" specification
-                required_info = self.get_required_info(node)
-                required_referenced = required_info['id_status'] if required_info else {}
-                exclude_info = self.get_exclude_info(node)
-                for id in sorted(node.mstats.keys()):
-                    idinfo = node.mstats[id]
-                    qty = idinfo['qty']
-                    type = idinfo['type']
-                    created = idinfo['created']
-                    is_excluded = exclude_info and id in exclude_info['ids']
-                    if is_excluded:
-                        if not created:
-                            # is excluded and was not created.  Good.
+                    else:
+                        # is excluded but was created.  That may be an error or warning
+                        ex_qty = exclude_info['ids'][id]
+                        assert ex_qty in ('?', '!', '^')
+                        if ex_qty == '?':
+                            # creating is optional, so no error or warning
                             continue
+                        verb = "must" if ex_qty == "!" else "should"
+                        msg = "%s - '%s' %s not be present within '%s'" % (
+                            created[0].full_path, id, verb, exclude_info['path'])
+                        if ex_qty == '!':
+                            self.error.append(msg)
                         else:
-                            # is excluded but was created.  That may be an error or warning
-                            ex_qty = exclude_info['ids'][id]
-                            assert ex_qty in ('?', '!', '^')
-                            if ex_qty == '?':
-                                # creating is optional, so no error or warning
-                                continue
-                            verb = "must" if ex_qty == "!" else "should"
-                            msg = "%s - '%s' %s not be present within '%s'" % (
-                                created[0].full_path, id, verb, exclude_info['path'])
-                            if ex_qty == '!':
-                                self.error.append(msg)
-                            else:
-                                self.warning.append(msg)
-                    # if id.rstrip('/') not in required_referenced and not custom and len(created) == 0:
-                    # Don't check for not custom because can be custom and still have a definition
-                    # instead need to check for having a definition (df).  if len(created) == 0 there is a df
-                    if id.rstrip('/') not in required_referenced and len(created) == 0:
-                        # this id not referenced in "_required" spec
-                        # if it was, don't create error / warning here; let function check_required validate 
-                        id_full_path = self.make_full_path(node.full_path, id)
-                        if qty in ('!', '+'):
-                            vi['missing_nodes'][type].append(id_full_path)
-                        elif qty == "^":
-                            vi['missing_recommended'][type].append(id_full_path)
-                    # add nodes to list to check
-                    try:
-                        to_check.extend(sorted(created))
-                    except TypeError as e:
-                        # import pdb; pdb.set_trace()
-                        error_exit('failed extend')
-                # check for "_required" specification
-                self.check_required(node)
-            elif type == "dataset":
-                self.validate_dataset(node)
+                            self.warning.append(msg)
+                # if id.rstrip('/') not in required_referenced and not custom and len(created) == 0:
+                # Don't check for not custom because can be custom and still have a definition
+                # instead need to check for having a definition (df).  if len(created) == 0 there is a df
+                if id.rstrip('/') not in required_referenced and len(created) == 0:
+                    # this id not referenced in "_required" spec
+                    # if it was, don't create error / warning here; let function check_required validate 
+                    id_full_path = self.make_full_path(node.full_path, id)
+                    if qty in ('!', '+'):
+                        vi['missing_nodes'][type].append(id_full_path)
+                    elif qty == "^":
+                        vi['missing_recommended'][type].append(id_full_path)
+                # add nodes to list to check
+                try:
+                    to_check.extend(sorted(created))
+                except TypeError as e:
+                    # import pdb; pdb.set_trace()
+                    error_exit('failed extend')
+            # check for "_required" specification
+            self.check_required(node)
+        elif type == "dataset":
+            self.validate_dataset(node)
+        else:
+            # should never happen
+            error_exit("unknown type in validation: %s" %type)
+
+    def get_validation_sinks(self, vi):
+        """ Return list of (name, messages) for each list that validation messages
+        are stored in.  Used to save and restore the messages generated for each node
+        (option validation_state)."""
+        sinks = [('error', self.error), ('warning', self.warning)]
+        for key in sorted(vi):
+            if isinstance(vi[key], list):
+                sinks.append((key, vi[key]))
+            elif key not in ('links', 'ext_links', 'explanations'):
+                for type in sorted(vi[key]):
+                    sinks.append(("%s/%s" % (key, type), vi[key][type]))
+        return sinks
+
+    def make_validation_key(self, node):
+        """ Make key (a hash) from everything validation of the node depends on:
+        the definition used for the node and it's parent, link, dataset type and
+        shape, attributes and created members.  If the key for a node matches the
+        key saved in the validation state, the node does not need to be validated again.
+        Nothing is read from the hdf5 file."""
+        sdef = node.sdef
+        info = [node.full_path, sdef['type'], sdef.get('ns'), sdef.get('id'),
+            sdef.get('custom', False), sdef.get('top', False)]
+        if 'h5nsig' in sdef:
+            # used to explain why node is custom
+            info.append(make_value_key(sdef['h5nsig']))
+        if node.parent:
+            psdef = node.parent.sdef
+            info.append((psdef.get('ns'), psdef.get('id'), psdef.get('custom', False)))
+        if node.link_info:
+            if node.link_info.get('node') is not None:
+                info.append(('link', node.link_info['node'].full_path))
             else:
-                # should never happen
-                error_exit("unknown type in validation: %s" %type)
+                info.append(('link', make_value_key(node.link_info)))
+        if sdef['type'] == 'dataset':
+            info.append((node.dsinfo.get('dtype'), node.dsinfo.get('shape'),
+                'autogen' in node.dsinfo))
+        if hasattr(node, 'attributes'):
+            info.append([(aid, node.attributes[aid].get('qty'),
+                make_value_key(node.attributes[aid].get('nv'))) for aid in sorted(node.attributes)])
+        info.append([(aid, make_value_key(node.h5attrs[aid])) for aid in sorted(node.h5attrs)])
+        if sdef['type'] == 'group' and not node.link_info:
+            info.append([(id, sorted([child.full_path for child in node.mstats[id]['created']]))
+                for id in sorted(node.mstats)])
+        return hashlib.sha1(repr(info).encode('utf-8')).hexdigest()
+
+    def replay_node_validation(self, node, saved, vi, sinks):
+        """ Add messages saved in the validation state for node to the validation
+        messages, as if the node was validated."""
+        events = saved['events']
+        for name, messages in sinks:
+            if name in events:
+                messages.extend(events[name])
+        if saved['explanation']:
+            vi['explanations'][node.full_path] = saved['explanation']
+        # links are not saved, record them like function validate_node
+        link_info = node.link_info
+        if link_info:
+            if link_info.get('node') is not None:
+                find_links.add_item(vi['links'], link_info['node'].full_path, node.full_path)
+            elif 'extlink' in link_info:
+                find_links.add_item(vi['ext_links'], link_info['extlink'], node.full_path)
+
+    def get_validation_state_hash(self):
+        """ Return hash of the specifications and options used for validation.  Saved
+        validation results are only used if this matches the hash saved with them."""
+        if self.spec_files:
+            h = self.hash_spec_files(self.spec_files)
+        else:
+            # specifications loaded from the hdf5 file
+            h = hashlib.sha1()
+            h.update(("%s\n%s\n" % (self.default_ns, self.get_version())).encode('utf-8'))
+            h.update(pprint.pformat(self.ddef).encode('utf-8'))
+        for opt in ('identify_custom_nodes', 'custom_node_identifier',
+            'identify_extension_nodes', 'extension_node_identifier'):
+            h.update(repr((opt, self.options[opt])).encode('utf-8'))
+        return h.hexdigest()
+
+    def load_validation_state(self):
+        """ Load validation results saved in the file given by option validation_state.
+        Returns None if the option is not set, otherwise dict with keys:
+            'hash' - hash of specifications and options (see get_validation_state_hash)
+            'saved' - saved result for each node, or {} if not available
+            'nodes' - results of this validation, filled in by validate_nodes."""
+        state_path = self.options['validation_state']
+        if not state_path:
+            return None
+        state = {'hash': self.get_validation_state_hash(), 'saved': {}, 'nodes': {}}
+        if not os.path.isfile(state_path):
+            return state
+        try:
+            with open(state_path, "r") as f:
+                saved_state = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            print ("Unable to load validation state from '%s', error is: %s" % (
+                state_path, e))
+            return state
+        if (isinstance(saved_state, dict) and saved_state.get('version') == 1
+            and saved_state.get('hash') == state['hash']):
+            state['saved'] = saved_state['nodes']
+        return state
+
+    def save_validation_state(self):
+        """ Save validation results made by validate_nodes into the file given by
+        option validation_state.  File is written to a temporary name, then renamed
+        so that a partially written file is never read."""
+        state = self.validation_state
+        if state is None:
+            return
+        state_path = self.options['validation_state']
+        saved_state = {'version': 1, 'hash': state['hash'], 'nodes': state['nodes']}
+        state_dir = os.path.dirname(os.path.abspath(state_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=state_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(saved_state, f)
+            if os.path.isfile(state_path):
+                # rename does not replace an existing file on Windows
+                os.remove(state_path)
+            os.rename(tmp_path, state_path)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            # saving the state is only an optimization, continue without it
+            print ("Unable to save validation state to '%s', error is: %s" % (
+                state_path, e))
 
     def closed_group(self, node):
         """ return True if group is 'closed' (specified by '_properties': {'closed': True)
@@ -2736,8 +3496,14 @@ class File(object):
             if zero_msg:
                 msg = msg + " -- %s" % zero_msg
             print (msg)
+        elif not self.options['keep_messages']:
+            # messages were only counted (and sent to report_sink), not saved
+            print ("%i %s (not kept)." % (len(messages), description))
         else:
-            cmsg = cm.combine_messages(messages)
+            if self.options['combine_messages']:
+                cmsg = cm.combine_messages(messages)
+            else:
+                cmsg = list(messages)
             if len(cmsg) != len(messages):
                 print ("%i %s (%i combined):" %(len(messages), description, len(cmsg)))
             else:
@@ -2774,6 +3540,8 @@ class File(object):
     def get_node(self, full_path, abort=True):
         """ Returns node at full_path.  If no node at that path then
             either abort (if abort is True) or return None """
+        if full_path not in self.path2node and self.lazy_groups:
+            self.load_lazy_path(full_path)
         if full_path in self.path2node:
             return self.path2node[full_path]
         elif abort:
@@ -2957,6 +3725,37 @@ class File(object):
     #####################################################        
     # Additions for loading data files
     
+    def get_expanded_def_cache_key(self, node):
+        """ Return key used to save expanded definition of group node in
+        self.expanded_def_cache, or None if the expanded definition should not be
+        saved because it may depend on the actual path of the node.  That is the case if
+        there is a structure with an absolute path id located at or inside the node
+        (these are merged or included based on the path; see functions
+        find_overlapping_structures and find_implicit_includes)."""
+        full_path = node.full_path
+        if full_path is None or not node.sdef['df']:
+            return None
+        if full_path[0] != '/':
+            full_path = "/" + full_path
+        full_path_g = full_path if full_path.endswith('/') else full_path + "/"
+        if self.absolute_ids is None:
+            self.absolute_ids = set()
+            for ns in self.ddef:
+                for id in self.ddef[ns]['structures']:
+                    if id[0] == '/':
+                        self.absolute_ids.add(id)
+        id = node.sdef['id']
+        for abs_id in self.absolute_ids:
+            if abs_id.startswith(full_path_g):
+                return None
+        if re.match( r'^<[^>]+>/$', id):
+            # variable id, check for merge of "parent_path/<id>/"
+            parent_path, name = self.get_name_from_full_path(full_path)
+            if self.make_full_path(parent_path, id) in self.absolute_ids:
+                return None
+        cache_key = (node.sdef['ns'], id, self.get_variable_path(node))
+        return cache_key
+
     def get_expanded_def(self, sdef, name, path):
         """ Get expanded definition of sdef.  This uses a special "group" object
         to allow calling methods of the group object"""
@@ -3322,59 +4121,128 @@ class File(object):
         """ Reads hdf5 file and figures out what nodes in file correspond to
         structures in specifications.  Stores nodes organized by structure in
         node_tree and id_lookups and dictionary from each path to node in path2nodes. """
-        # msigs_cache used for storing cached msigs in routine add_msigs
-        # Initialize to: {">>hits": 0, ">>calls": 0} for counting hits and total calls
-        self.msigs_cache = {}
         num_groups = self.links['count']['group']
         num_datasets = self.links['count']['dataset']
         if self.options['verbosity'] in ('all', ):
             print ("Reading %i groups and %i datasets" % (num_groups, num_datasets))
         np = (self.file_pointer["/"], "/")  # np == 'node, path'
-        groups_to_visit = [ np,]
+        groups_to_visit = deque([np])
         while groups_to_visit:
-            np = groups_to_visit.pop(0)
+            np = groups_to_visit.popleft()
             h5_group, path = np
-#             if h5_group.name == "/acquisition/timeseries/whisker_video":
-#                 # print ("in load_node, found %s" % full_path)
-#                 import pdb; pdb.set_trace()
-            # if 'spontaneous_stimulus/data' in h5_group.name:
-            # if h5_group.name == '/stimulus/presentation/spontaneous_stimulus/data':
-            # if h5_group.name == '/processing/brain_observatory_pipeline/MotionCorrection/2p_image_series/corrected':
-            #    import pdb; pdb.set_trace()
             node = self.load_node(h5_group, path, 'group')
             if node.link_info:
                 # this node was a link.  No further processing
                 continue
-            for mname in sorted(h5_group):  # py3, added sorted
-                mpath = self.make_full_path(path, mname)
-                h5_node, ext_target = self.open_node_member(h5_group, mname)
-                if not h5_node:
-                    # unable to open the member
-                    if ext_target:
-                        # this is an external link that's not available.  Make a warning.
-                        link_file, link_path = ext_target.split("\n")
-                        self.save_extrn_link_warning(mpath, link_file, link_path)
-                    else:
-                        msg = ("%s - unable to open node and not external link.  "
-                            "Perhaps a dangling link?  Ignoring.") % mpath
-                        self.error.append(msg)
-                    # load node passing type "extlink" (deduce actual type i.e. group or dataset later)
-                    self.load_node(h5_node, mpath, 'extlink')
-                else:
-                    # successfully loaded h5_node
-                    if ext_target:
-                        # found external link which exists
-                        msg = ("%s: found external link.  Loading nodes from it, even though it's not "
-                            "part of the original hdf5 file") % mpath
-                        self.warning.append(msg)
-                    if isinstance(h5_node, h5py.Dataset):
-                        self.load_node(h5_node, mpath, 'dataset')
-                    else:
-                        np2 = (h5_node, mpath)
-                        groups_to_visit.append(np2)
+            groups_to_visit.extend(self.load_group_members(h5_group, path))
+        # members of groups that were links are left in the cache
+        self.init_read_cache()
         # fill in any links that did not have target available when reading
         find_links.fill_missing_links(self)
 
+    def load_group_members(self, h5_group, path):
+        """ Load datasets (and unavailable external links) that are members of
+        h5_group (at path).  Returns list of tuples (h5_node, path) for the member
+        groups, which are not loaded here."""
+        member_groups = []
+        if path in self.links['members']:
+            # use member names found when finding links, so group is not listed again
+            mnames = sorted(minfo[0] for minfo in self.links['members'][path])
+        else:
+            # group not visited when finding links (e.g. inside an external link)
+            mnames = sorted(h5_group)  # py3, added sorted
+        for mname in mnames:
+            mpath = self.make_full_path(path, mname)
+            # this is the last time member is opened, so remove it from the cache
+            h5_node, ext_target = self.open_node_member(h5_group, mname, True)
+            if not h5_node:
+                # unable to open the member
+                if ext_target:
+                    # this is an external link that's not available.  Make a warning.
+                    link_file, link_path = ext_target.split("\n")
+                    self.save_extrn_link_warning(mpath, link_file, link_path)
+                else:
+                    msg = ("%s - unable to open node and not external link.  "
+                        "Perhaps a dangling link?  Ignoring.") % mpath
+                    self.error.append(msg)
+                # load node passing type "extlink" (deduce actual type i.e. group or dataset later)
+                self.load_node(h5_node, mpath, 'extlink')
+            else:
+                # successfully loaded h5_node
+                if ext_target:
+                    # found external link which exists
+                    msg = ("%s: found external link.  Loading nodes from it, even though it's not "
+                        "part of the original hdf5 file") % mpath
+                    self.warning.append(msg)
+                if isinstance(h5_node, h5py.Dataset):
+                    self.load_node(h5_node, mpath, 'dataset')
+                else:
+                    member_groups.append((h5_node, mpath))
+        return member_groups
+
+    def load_lazy_group(self, path):
+        """ If members of group at path have not been loaded (because of option
+        lazy_load) load them now.  Member groups are loaded, but not their members."""
+        if path not in self.lazy_groups:
+            return
+        h5_group = self.lazy_groups.pop(path)
+        self.reading_file = True  # prevent saving data to hdf5 file
+        for h5_node, mpath in self.load_group_members(h5_group, path):
+            node = self.load_node(h5_node, mpath, 'group')
+            if not node.link_info:
+                self.lazy_groups[mpath] = h5_node
+        self.reading_file = False
+        self.load_lazy_link_targets()
+
+    def load_lazy_path(self, full_path):
+        """ Load (if using option lazy_load) groups needed to reach the node at
+        full_path, i.e. the members of each of its ancestors."""
+        self.load_lazy_group("/")
+        path = ""
+        for part in full_path.strip("/").split("/")[:-1]:
+            path = path + "/" + part
+            if path not in self.path2node:
+                # path not in file
+                return
+            self.load_lazy_group(path)
+
+    def load_lazy_link_targets(self):
+        """ Load nodes that are targets of links found when loading nodes with option
+        lazy_load, then fill in the links.  When loading all nodes, the targets are
+        loaded as part of the traversal of the file."""
+        if self.loading_link_targets:
+            # already loading targets, (called from get_node below)
+            return
+        self.loading_link_targets = True
+        tried = set()
+        found_new = True
+        while found_new:
+            found_new = False
+            for link_type in ('hard', 'soft'):
+                targets_created = self.links['targets_created'][link_type]
+                for loc in list(self.links['missing_links'][link_type]):
+                    if loc in targets_created or (link_type, loc) in tried:
+                        continue
+                    tried.add((link_type, loc))
+                    found_new = True
+                    # for soft links, loc is path to target
+                    paths = [loc] if link_type == 'soft' else []
+                    paths = paths + self.links['lg'][link_type].get(loc, [])
+                    for path in paths:
+                        self.get_node(path, abort=False)
+                        if loc in targets_created:
+                            break
+        self.loading_link_targets = False
+        find_links.fill_missing_links(self, allow_missing=True)
+
+    def load_all_nodes(self):
+        """ Load all nodes not yet loaded because of option lazy_load.  This is
+        required to validate the file."""
+        while self.lazy_groups:
+            self.load_lazy_group(next(iter(self.lazy_groups)))
+        self.init_read_cache()
+        find_links.fill_missing_links(self)
+
     def save_extrn_link_warning(self, node_path, link_file, link_path):
         # save warning about external link file or path not available
         msg = "%s: unable to open hdf5 external link, file='%s', path='%s'" % (
@@ -3382,16 +4250,33 @@ class File(object):
         self.warning.append(msg)
         
 
-    def open_node_member(self, h5group, mname):
+    def init_read_cache(self):
+        """ Initialize cache used when reading a file so each hdf5 node is opened and
+        has it's attributes read only once (rather than once when making the signature of
+        the parent group, again when making the signature of the node and when loading
+        the node).  Format is:
+          { 'members': { path: (member, ext_target), ... },  -- returned by open_node_member
+            'attrs': { objno: <attribute info>, ... } }
+        objno is the (fileno, objno) tuple from h5py.h5g.get_objinfo and <attribute info>
+        is made by function read_attributes.  Entries are removed after the node is
+        loaded."""
+        self.read_cache = {'members': {}, 'attrs': {}}
+
+    def open_node_member(self, h5group, mname, remove_from_cache=False):
         """ Attempts to open the member (group or dataset) with mname inside
         h5group.  Normally this should succeed.  But it may fail if the member
         is a hdf5 external link.  Return tuple: (member, ext_target).
         member is the opened node (if opened successfully) otherwise None.
         ext_target is the target for the external link (if this member is
         an hdf5 external link.  Otherwise None.
+        Opened members are saved in the read_cache.  If remove_from_cache is True,
+        the member is removed from the cache because it will not be needed again.
         """
-        # first, get external link target if any
         path = self.make_full_path(h5group.name, mname)
+        members = self.read_cache['members']
+        if path in members:
+            return members.pop(path) if remove_from_cache else members[path]
+        # first, get external link target if any
         if path in self.links['path2lg']['ext']:
             ext_target = self.links['path2lg']['ext'][path]
         else:
@@ -3405,6 +4290,8 @@ class File(object):
                 msg = "%s: unable to read node.  Perhaps a dangling link?" % path
                 self.warning.append(msg)
             member = None
+        if not remove_from_cache:
+            members[path] = (member, ext_target)
         return (member, ext_target)
         
     
@@ -3453,19 +4340,14 @@ class File(object):
         # Save hdf5 node attributes for later validation (checking for missing attributes)
         # only save if h5_node is not None.  It will be None if there is an external link
         if h5_node:
-            for key in h5_node.attrs:
-                try:
-                    value = h5_node.attrs[key]
-                except IOError as e:
-                    msg = ("%s: unable to read attribute '%s' due to h5py IOError. "
-                        "Value is probably unicode array.  See https://github.com/h5py/h5py/issues/624.") % (
-                        h5_node.name, key)
-                    assert msg not in self.warning, "warning message already stored:\n%s" % msg
-                    self.warning.append(msg)
-                    value = "???"
-                if version_info[0] > 2:  # py3, convert from bytes to str (unicode) if needed
-                    value = vs.make_str(value)
-                node.h5attrs[key] = value
+            ainfo = self.read_attributes(h5_node, True)
+            for key in ainfo['errors']:
+                msg = ("%s: unable to read attribute '%s' due to h5py IOError. "
+                    "Value is probably unicode array.  See https://github.com/h5py/h5py/issues/624.") % (
+                    h5_node.name, key)
+                assert msg not in self.warning, "warning message already stored:\n%s" % msg
+                self.warning.append(msg)
+            node.h5attrs.update(ainfo['str_values'])
         return node
 
     def save_counts(self, dict, key):
@@ -3738,17 +4620,19 @@ class File(object):
             (in a location or a group).  2 if matching to all top-level structures.
         Returns id of matching signature or None"""
         matches = []
-        for id in idsigs:
+        index = self.get_idsigs_index(idsigs)
+        for id in self.find_candidate_ids(h5nsig, index):
             match_count = self.match_sigs(h5nsig, idsigs[id])
             if match_count == -1:
                 # definitely not a match
                 continue
             if match_count < level and 'msigs' in idsigs[id] and 'msigs' in h5nsig:
-                # did not find required number matches yet.  Check members
-                # hopefully there will not be many members.  A more efficient way
-                # of doing this should be developed.
+                # did not find required number matches yet.  Check members.
+                # Only members in the index with the same type and name, or with an
+                # attribute key in common can match, so only those are checked.
+                mindex = index['members'][id]
                 for msig1 in h5nsig['msigs']:
-                    for msig2 in idsigs[id]['msigs']:
+                    for msig2 in self.find_candidate_msigs(msig1, mindex):
                         if self.match_sigs(msig1, msig2) > 0:  
                             # count any match with member as one match, even if is 2
                             # There might be other methods, such as find num of maximal matches
@@ -3772,6 +4656,134 @@ class File(object):
         return None
         
         
+    def get_idsigs_index(self, idsigs):
+        """ Return index for dictionary of idsigs (either self.idsigs[ns] or the msigs
+        of a group).  Indexes are made the first time they are needed and saved in
+        self.idsigs_indexes, keyed by id of the idsigs dictionary.  The idsigs
+        dictionary is also saved so the id is not reused while the index is present."""
+        key = id(idsigs)
+        if key in self.idsigs_indexes:
+            return self.idsigs_indexes[key][1]
+        index = self.make_idsigs_index(idsigs)
+        self.idsigs_indexes[key] = (idsigs, index)
+        return index
+
+    def make_idsigs_index(self, idsigs):
+        """ Make inverted indexes mapping to ids in idsigs, used by find_matching_id to
+        only score ids that could match a node.  The index has the format:
+          { named: { (type, name): [id1, id2, ...], ... } -- ids that have a fixed name
+            unnamed: { type: [id3, ...], ... }  -- ids without a fixed name
+            const_keys: { id: frozenset(<keys of const attributes>), ... }
+            const_values: { key: { value1: [id4, ...], value2: [id5, ...] }, ... }
+            excluded: { (key, value): set(<ids>), ... } -- filled in by find_candidate_ids
+            members: { id: <member index>, ... } } -- for ids that have msigs
+        const_values only includes const attributes with values that are a string or
+        list of strings (see function get_index_value).  Const attributes of ids with
+        a unique name (name_unique) are not included, since match_sigs returns 5 for
+        those when the name matches without checking const attributes.
+        <member index> is made by function make_msigs_index."""
+        index = {'named': {}, 'unnamed': {}, 'const_keys': {}, 'const_values': {},
+            'excluded': {}, 'members': {}}
+        for id in idsigs:
+            sig = idsigs[id]
+            if sig['name']:
+                index['named'].setdefault((sig['type'], sig['name']), []).append(id)
+            else:
+                index['unnamed'].setdefault(sig['type'], []).append(id)
+            if sig['name'] and sig.get('name_unique'):
+                # always a candidate if the name matches (see match_sigs)
+                const_keys = []
+            else:
+                const_keys = [key for key in sig['attrs'] if sig['attrs'][key].get('const')]
+            if const_keys:
+                index['const_keys'][id] = frozenset(const_keys)
+            for key in const_keys:
+                value = self.get_index_value(sig['attrs'][key]['value'])
+                if value is not None:
+                    index['const_values'].setdefault(key, {}).setdefault(value, []).append(id)
+            if 'msigs' in sig:
+                index['members'][id] = self.make_msigs_index(sig['msigs'])
+        return index
+
+    def make_msigs_index(self, msigs):
+        """ Make index of member signatures (list of msigs in an idsig).  A member
+        signature can only match (have match_sigs return a value > 0) if it has the
+        same type and name, or if it does not have a name but shares an attribute
+        with the h5 member signature.  So the index has format:
+          { named: { (type, name): [msig1, ...], ... },
+            attrs: { (type, key): [msig2, ...], ... } } -- for msigs without a name"""
+        mindex = {'named': {}, 'attrs': {}}
+        for msig in msigs:
+            if msig['name']:
+                mindex['named'].setdefault((msig['type'], msig['name']), []).append(msig)
+            else:
+                for key in msig['attrs']:
+                    mindex['attrs'].setdefault((msig['type'], key), []).append(msig)
+        return mindex
+
+    def find_candidate_ids(self, h5nsig, index):
+        """ Return list of ids in index that may match h5nsig.  Ids not returned would
+        have match_sigs return -1, either because the type or fixed name does not match
+        or because h5nsig does not have (or has a different value for) an attribute that
+        is const in the id.  Ids with a unique name are never excluded because of const
+        attributes (see make_idsigs_index)."""
+        name = h5nsig['name']
+        type = h5nsig['type']
+        # h5nsig type is None for external links.  In that case the type is unknown
+        types = (type, ) if type else ('group', 'dataset')
+        candidates = []
+        for t in types:
+            candidates.extend(index['named'].get((t, name), []))
+            candidates.extend(index['unnamed'].get(t, []))
+        if type and index['const_keys']:
+            h5attrs = h5nsig['attrs']
+            const_keys = index['const_keys']
+            excluded = set()
+            for key in index['const_values']:
+                if key in h5attrs:
+                    value = self.get_index_value(h5attrs[key])
+                    if value is not None:
+                        excluded.update(self.get_excluded_ids(index, key, value))
+            candidates = [id for id in candidates if id not in excluded and (id not in
+                const_keys or all(key in h5attrs for key in const_keys[id]))]
+        return candidates
+
+    def get_excluded_ids(self, index, key, value):
+        """ Return set of ids in index that have a const attribute key with a value
+        that does not match value.  Saved in index['excluded'] since the same attribute
+        values are found in many nodes."""
+        if (key, value) not in index['excluded']:
+            excluded = set()
+            for const_value, ids in index['const_values'][key].items():
+                # only values of the same kind (str or tuple) are compared because
+                # a const list with one string matches the string (see match_sigs)
+                if type(const_value) == type(value) and const_value != value:
+                    excluded.update(ids)
+            index['excluded'][(key, value)] = excluded
+        return index['excluded'][(key, value)]
+
+    def get_index_value(self, value):
+        """ Return value of attribute in hashable form for use in idsigs index.  This
+        is only done for values that are a str or a list of str because for those
+        vs.values_match is the same as testing for equality.  Returns None otherwise."""
+        if isinstance(value, str):
+            return value
+        if (isinstance(value, (list, tuple)) and len(value) > 0 and
+                all(isinstance(v, str) for v in value)):
+            return tuple(value)
+        return None
+
+    def find_candidate_msigs(self, msig1, mindex):
+        """ Return list of member signatures in mindex (made by make_msigs_index) that
+        may match h5 member signature msig1"""
+        types = (msig1['type'], ) if msig1['type'] else ('group', 'dataset')
+        candidates = []
+        for t in types:
+            candidates.extend(mindex['named'].get((t, msig1['name']), []))
+            for key in msig1['attrs']:
+                candidates.extend(mindex['attrs'].get((t, key), []))
+        return candidates
+
     def make_path_parts(self,path):
         """ Split path into components, including '/' as first part.  path
         is assumed to be an absolute path"""
@@ -3861,7 +4873,7 @@ class File(object):
                     # make a sig with just the name
                     msig = self.make_minimal_msig(mname)
                 else:
-                    msig = self.make_h5nsig2(h5node[mname], mname)
+                    msig = self.make_h5nsig2(member, mname)
                 msigs.append(msig)
             sig['msigs'] = msigs
         return sig
@@ -3899,29 +4911,49 @@ class File(object):
             edf = sdef['df']
         fixed_attrs = self.get_sig_attrs(edf)
         changed_attrs = {}
-        for key in h5_node.attrs:
-            try:
-                value = h5_node.attrs[key]
-            except IOError as e:
-                # assume this error was detected previously in fetch_attributes
-                value = "???"
+        values = self.read_attributes(h5_node)['values']
+        for key in values:
+            # value is "???" if unable to read, this is reported in load_node
+            value = values[key]
             if (key not in fixed_attrs or not vs.values_match(fixed_attrs[key]['value'], value)):
                 changed_attrs[key] = value
         return changed_attrs
         
     def fetch_attributes(self, h5_node):
         """ Get attributes for hdf5 node as a dictionary"""
-        attrs = {}
+        return dict(self.read_attributes(h5_node)['str_values'])
+
+    def read_attributes(self, h5_node, remove_from_cache=False):
+        """ Read attributes of h5_node, or get them from the read_cache if they were
+        read previously.  Returns dictionary:
+          { 'values': { key: value, ... },  -- value as read from the hdf5 file
+            'str_values': { key: value, ... }, -- py3, values converted from bytes to str
+            'errors': [ key, ... ] } -- keys of attributes that could not be read
+        Attributes that could not be read have value "???".  If remove_from_cache is True,
+        the entry is removed from the cache because it will not be needed again."""
+        info = h5py.h5g.get_objinfo(h5_node.id)
+        objno = (info.fileno, info.objno)
+        cache = self.read_cache['attrs']
+        if objno in cache:
+            return cache.pop(objno) if remove_from_cache else cache[objno]
+        values = {}
+        str_values = {}
+        errors = []
         for key in h5_node.attrs.keys():
             try:
                 value = h5_node.attrs[key]
             except IOError as e:
-                # unable to read attribute.  Assume this will be reported in load_node
+                # unable to read attribute.  This will be reported in load_node
+                errors.append(key)
                 value = "???"
+            values[key] = value
             if version_info[0] > 2:  # py3, convert from bytes to str (unicode) if needed
                 value = vs.make_str(value)
-            attrs[key] = value
-        return attrs
+            str_values[key] = value
+        ainfo = {'values': values, 'str_values': str_values, 'errors': errors}
+        if not remove_from_cache:
+            cache[objno] = ainfo
+        return ainfo
             
     def get_dtype_and_shape(self, val, path, aid):
         """ Return data type and shape of value val, as a tuple.  This
@@ -4449,6 +5481,69 @@ class File(object):
             self.merge_def(expanded_def, sdef, to_include, id_sources, loc, descriptions)
 
 
+class Schema(object):
+    """ Format specifications that have been loaded and processed (definitions, idlookups,
+    subclasses and idsigs), ready to be used by File objects.  This is made once,
+    then passed to the File constructor (parameter "schema") for each file that uses
+    the same specification files.  Each File then skips processing the specifications
+    and all of the files share the same (read only) definitions.  The cache of member
+    signatures (msigs_cache) used when reading files is also shared.
+    """
+    def __init__(self, spec_files, default_ns="core", options={}):
+        """ spec_files and default_ns are the same as for class File.  options are
+        File options, only those related to loading specifications (e.g. 'spec_dir'
+        and 'spec_cache_dir') are used."""
+        self.spec_files = list(spec_files)
+        self.default_ns = default_ns
+        options = dict(options)
+        options['mode'] = 'no_file'
+        f = File(None, self.spec_files, default_ns, options)
+        if f.idsigs is None:
+            f.idsigs = f.make_idsigs()
+        self.bundle = {'ddef': f.ddef, 'fsname2ns': f.fsname2ns,
+            'name_spaces': f.name_spaces, 'subclasses': f.subclasses,
+            'idlookups': f.idlookups, 'idsigs': f.idsigs, 'msigs_cache': f.msigs_cache}
+
+    def get_bundle(self, spec_files, default_ns):
+        """ Return processed specifications for use by a File.  spec_files and
+        default_ns must match those used to make the schema."""
+        if list(spec_files) != self.spec_files or default_ns != self.default_ns:
+            raise Exception(("Schema made from specification files %s (default namespace '%s') "
+                "cannot be used with specification files %s (default namespace '%s')") % (
+                self.spec_files, self.default_ns, list(spec_files), default_ns))
+        return self.bundle
+
+
+class MessageList(list):
+    """ List of messages of one kind (code) generated while reading, creating or
+    validating a file.  Each message added is sent to the report sink (option
+    report_sink) if there is one, and is saved in the list only if option
+    keep_messages is True.  len() is the number of messages added, whether or
+    not they are saved."""
+    def __init__(self, file, code, severity, node_type=None):
+        list.__init__(self)
+        self.file = file
+        self.code = code
+        self.severity = severity
+        self.node_type = node_type
+        self.count = 0
+        self.report = file.options['report_sink'] is not None
+        self.keep = file.options['keep_messages']
+
+    def append(self, message):
+        self.count += 1
+        if self.report:
+            self.file.report_message(self, message)
+        if self.keep:
+            list.append(self, message)
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def __len__(self):
+        return self.count
+
 class SchemaIdError(Exception):
     # SchemaIdError is raised when attempting to create a group or dataset that
     # does not have an identifier in the schema.  e.g. make_group("invalid_id")
@@ -4541,6 +5636,7 @@ class Node(object):
                     # not reading, save the link information for later use in autogen
                     # find_links.save_info(objtype, objno, path, target, links):
                     find_links.save_info("link", None, self.full_path, target_node.full_path, self.file.links)
+                    self.file.changed_link_targets.add(target_node.full_path)
                 elif self.file.reading_file:
                     # reading file; and don't have target node (it was not created yet.  Do nothing.
                     return
@@ -4824,6 +5920,8 @@ class Node(object):
             # don't set attributes in hdf5 file if reading
             return
         ats = self.attributes  # convenient short name
+        # values are written together, so node is only opened once
+        values = []
         for aid in sorted(list(ats)):  #py3, sort so order is always consistent
             value = ats[aid]['nv'] if 'nv' in ats[aid] else (
                 ats[aid]['value'] if 'value' in ats[aid] else None)
@@ -4837,10 +5935,12 @@ class Node(object):
             self.h5attrs[aid] = value
 #                 self.h5node.attrs[aid] = value
             #- self.file.file_pointer[self.full_path].attrs[aid] = value
-            self.file.set_attribute(self.full_path, aid, value)
+            values.append((aid, value))
             #- self.file.h5save_attribute(self.full_path, aid, value)
             #- self.file.h5commands.append("set attribute(%s:%s)-%s" % (self.full_path,
             #-     aid, value))
+        if values:
+            self.file.set_attributes(self.full_path, values)
                 
     def set_attr(self, aid, value, custom=False, shape=None):
         """ This is one of the functions for the API.
@@ -5103,19 +6203,20 @@ class Dataset(Node):
                 value = np.string_(value)
             elif not dtype and self.file.options['use_default_size']:
                 dtype = self.get_default_dtype()
-            # use automatic compression if specified and either np_string or not scalar
-            if (not compress and self.file.options['auto_compress'] and
-                (self.dsinfo['shape'] != "scalar") and
-                not isinstance(value, np.string_)):
-                compress = True
             maxshape=self.get_maxshape()
+            # use storage policy (chunking and compression) if np_string or not scalar
+            if (self.dsinfo['shape'] != "scalar") and not isinstance(value, np.string_):
+                storage = self.get_storage_settings(value, dtype, maxshape)
+            else:
+                storage = None
+                compress = False
             # compress = "gzip" if compress else None
             # self.h5node = self.h5parent.create_dataset(self.name, data=value,
             #    dtype=dtype, compression=compress)
             #- self.file.file_pointer.create_dataset(self.full_path, data=value,
             #-     dtype=dtype, compression=compress)
             self.file.create_dataset(self.full_path, data=value, dtype=dtype,
-                compress=compress, maxshape=maxshape)
+                compress=compress, maxshape=maxshape, storage=storage)
             # self.file.h5commands.append("create_dataset(%s, %s)" % (self.full_path, value))
             # if dtype:
             #    self.h5node = self.h5parent.create_dataset(self.name, data=value, dtype=dtype)
@@ -5139,30 +6240,98 @@ class Dataset(Node):
             maxshape.append(msv)
         return maxshape
             
+    def get_storage_settings(self, value, dtype, maxshape):
+        """Return h5py create_dataset parameters (chunks, compression, ...) for this
+        dataset, selected by the file storage_policy option."""
+        if dtype is not None and not (isinstance(dtype, str) and dtype in ('binary', '')):
+            value_dtype = np.dtype(dtype)
+            value_shape = np.shape(value)
+        else:
+            value_arr = np.asarray(value)
+            value_dtype = value_arr.dtype
+            value_shape = value_arr.shape
+        nbytes = int(np.prod(value_shape)) * value_dtype.itemsize
+        if self.parent is not None:
+            qualified_id = self.parent.sdef['id'].rstrip('/') + '/' + self.sdef['id']
+        else:
+            qualified_id = self.sdef['id']
+        info = {'id': qualified_id, 'path': self.full_path, 'dtype': value_dtype,
+            'shape': value_shape, 'nbytes': nbytes, 'maxshape': maxshape}
+        return self.file.get_storage_settings(info)
+
     def append(self, value):
-        """append a value to an expandable dataset.  This method is only valid for
-        datasets defined with a dimension set to "*unlimited*".  It resizes the dataset
-        then appends the value"""
+        """append values to an expandable dataset.  This method is only valid for
+        datasets defined with the first dimension set to "*unlimited*".  value is either
+        a single element (an array with one fewer dimensions than the dataset, or a
+        scalar for 1-D datasets) or a block of elements stacked along the first dimension.
+        Space in the file is allocated geometrically (doubling the size of the first
+        dimension when full) so repeated calls do not each resize the dataset.  Unused
+        space is removed when the file is closed (or by calling trim).  Until then, code
+        reading the dataset must only read the first append_length elements."""
         dims = self.dsinfo['dimensions']
         if '*unlimited*' not in dims:
             msg = "append called on dataset '%s', but no dimension set to '*unlimited*'" % (
                 self.full_path)
             error_exit(msg)
-        if len(dims) > 1:
-            msg = "%s: append currently allowed for 1-D datasets.  Dims is: %s" % (
-                self.full_path, dims)
+        if dims[0] != '*unlimited*' or dims.count('*unlimited*') > 1:
+            msg = "%s: append only allowed if '*unlimited*' is the first dimension (and " \
+                "only that dimension).  Dims is: %s" % (self.full_path, dims)
             error_exit(msg)  
-        # dataset being appended
+        # dataset being appended, make sure it's created if using option write_behind
+        self.file.flush_writes()
         dset = self.file.file_pointer[self.full_path]
-        shape = dset.shape
-        # make new shape one larger in '*unlimited*' dimension
-        new_shape = []
-        for i in range(len(shape)):
-            nsv = shape[i]+1 if dims[i] == '*unlimited*' else shape[i]
-            new_shape.append(nsv)
-        dset.resize(new_shape)
-        new_length = new_shape[0]
-        dset[new_length - 1] = value
+        if not hasattr(self, 'append_length'):
+            # first call to append, save current length and make sure trimmed on close
+            self.append_length = dset.shape[0]
+            self.file.appended_datasets.append(self)
+        if isinstance(value, (str, unicode, bytes)):
+            value_ndim = 0
+        else:
+            value = np.asarray(value)
+            if value.dtype.kind == 'U':
+                # h5py does not store numpy unicode arrays, convert to utf-8
+                value = np.char.encode(value, 'utf-8')
+            value_ndim = value.ndim
+        if value_ndim == len(dset.shape) - 1:
+            num_new = 1
+        elif value_ndim == len(dset.shape):
+            num_new = value.shape[0]
+            if value.shape[1:] != dset.shape[1:]:
+                msg = "%s: shape of values appended %s, does not match shape of dataset %s" % (
+                    self.full_path, value.shape, dset.shape)
+                error_exit(msg)
+        else:
+            msg = "%s: values appended have %i dimensions, dataset has %i" % (
+                self.full_path, value_ndim, len(dset.shape))
+            error_exit(msg)
+        start = self.append_length
+        new_length = start + num_new
+        if new_length > dset.shape[0]:
+            # allocate more space, at least doubling current size
+            chunk_length = dset.chunks[0] if dset.chunks else 1
+            dset.resize(max(new_length, 2 * dset.shape[0], chunk_length), axis=0)
+        if num_new == 1 and value_ndim < len(dset.shape):
+            dset[start] = value
+        elif num_new > 0:
+            dset[start:new_length] = value
+        self.append_length = new_length
+        self.file.file_changed = True
+        self.file.changed_paths.add(self.full_path)
+
+    def trim(self):
+        """Remove space allocated by append but not used, and update the saved shape
+        of the dataset.  Called automatically when the file is closed."""
+        if not hasattr(self, 'append_length'):
+            return
+        dset = self.file.file_pointer[self.full_path]
+        if dset.shape[0] != self.append_length:
+            dset.resize(self.append_length, axis=0)
+        shape = self.dsinfo['shape']
+        if isinstance(shape, (list, tuple)):
+            self.dsinfo['shape'] = type(shape)([self.append_length] + list(shape[1:]))
+        dim = self.dsinfo['dimensions'][0]
+        if dim in self.dsinfo['dimdef']:
+            self.dsinfo['dimdef'][dim]['len'] = self.append_length
 
 
     def get_default_dtype(self):
@@ -5444,6 +6613,22 @@ def valid_dtype(ddt, found):
     return valid_type
 
 
+def make_value_key(value):
+    """ Return value converted to a form that can be included in a key made using
+    repr.  Numpy arrays are replaced by their type, shape and a hash of their contents,
+    so the key does not depend on how numpy prints large arrays."""
+    import numpy as np
+    if isinstance(value, dict):
+        return [(key, make_value_key(value[key])) for key in sorted(value)]
+    if isinstance(value, (list, tuple)):
+        return [make_value_key(item) for item in value]
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'O':
+            return ('ndarray', value.shape, repr(value.tolist()))
+        return ('ndarray', value.dtype.str, value.shape,
+            hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+    return repr(value)
+
 def patch_json_vals(json, replace):
     # Replace old_values with new_values in json
     # json is a dict (basically JSON format)
@@ -5550,6 +6735,54 @@ def is_arr_type(val):
     """ Return True if val is some type of array. """
     return isinstance(val, (list, tuple, np.ndarray))
     
+def make_chunk_shape(shape, dtype, maxshape, chunk_bytes):
+    """ Return chunk shape for dataset with the given shape, numpy dtype and maxshape
+    (None if not expandable) so chunks are about chunk_bytes in size.  Trailing
+    dimensions are included whole if possible, so reading a range of the first
+    dimension (e.g. a range of times) reads few chunks.  Expandable dimensions
+    (None in maxshape) are not limited by the current size of the dataset.  Returns
+    None (let h5py select the chunk shape) if the dataset has a fixed dimension that
+    is empty."""
+    # use a nominal size for text, since it may be stored as variable length
+    itemsize = dtype.itemsize if dtype.kind not in ('O', 'S', 'U') else 16
+    num_elements = max(chunk_bytes // max(itemsize, 1), 1)
+    chunks = []
+    for i in reversed(range(len(shape))):
+        if maxshape is not None and maxshape[i] is None:
+            dim_chunk = num_elements
+        elif shape[i] == 0:
+            return None
+        else:
+            dim_chunk = min(shape[i], num_elements)
+        chunks.insert(0, dim_chunk)
+        num_elements = max(num_elements // dim_chunk, 1)
+    return tuple(chunks)
+
+def attribute_fingerprint(value):
+    """ Return sha1 digest identifying attribute value, saved for each attribute written
+    so setting an attribute to the same value again does not write it, without keeping a
+    copy of the value.  Includes the type (and dtype and shape for numpy values, types of
+    elements for lists), since these determine how the value is stored.
+    Returns None (never matches, so always written) for other types of values (e.g.
+    region references), whose repr does not identify the value."""
+    import numpy as np
+    simple_types = (str, unicode, bytes, int, float, bool, np.generic)
+    if isinstance(value, (list, tuple)):
+        if not all(isinstance(v, simple_types) for v in value):
+            return None
+        element_types = [type(v).__name__ for v in value]
+    elif isinstance(value, np.ndarray):
+        if value.dtype.kind == 'O' and not all(isinstance(v, simple_types) for v in value.flat):
+            return None
+        element_types = None
+    elif isinstance(value, simple_types):
+        element_types = None
+    else:
+        return None
+    key = (type(value).__name__, str(getattr(value, 'dtype', None)),
+        getattr(value, 'shape', None), element_types, make_value_key(value))
+    return hashlib.sha1(repr(key).encode('utf-8')).digest()
+
 def str2h5(val):
     """ If val is a string type or array of string types, convert to a type
     that is optimized for storing in hdf5."""
@@ -5651,11 +6884,10 @@ class Group(Node):
             return
         self.description = []
         # self.parent_attributes = {}
-        self.get_expanded_def_and_includes()
+        self.expand_definition()
         self.check_attributes_for_autogen()
         # print "after get_expanded_def_and_includes, includes="
         # pp.pprint(self.includes)
-        self.get_member_stats()
         self.check_mstats_for_autogen()
         # self.add_parent_attributes()
         self.merge_attrs()
@@ -5672,6 +6904,76 @@ class Group(Node):
         self.set_attr_values()
 
 
+    def expand_definition(self):
+        """ Make expanded definition (self.expanded_def, self.attributes) and member
+        stats (self.mstats) for this group.  Groups with the same namespace, id and variable
+        path (and definition) have the same expanded definition, unless an absolute path in
+        the specifications refers to a location at or inside the group.  So the results are
+        saved in file.expanded_def_cache and reused, rather than repeating the merges, when
+        creating many groups of the same type (e.g. many <TimeSeries>/ or epochs)."""
+        cache_key = self.file.get_expanded_def_cache_key(self)
+        if cache_key is not None and cache_key in self.file.expanded_def_cache:
+            template = self.file.expanded_def_cache[cache_key]
+            if template['df'] is self.sdef['df']:
+                self.load_expanded_def_template(template)
+                return
+        self.get_expanded_def_and_includes()
+        self.get_member_stats()
+        if cache_key is not None:
+            self.file.expanded_def_cache[cache_key] = self.make_expanded_def_template()
+
+    def make_expanded_def_template(self):
+        """ Save expanded definition and member stats of this group for reuse by other
+        groups.  The mstats and expanded_def dictionaries are copied because they are changed
+        (by prune_subclass_merges and when members are created).  Definitions inside are
+        shared."""
+        template = {'df': self.sdef['df'], 'expanded_def': dict(self.expanded_def),
+            'includes': self.includes, 'id_sources': self.id_sources, 'merged': self.merged,
+            'attributes': self.copy_attributes(self.attributes),
+            'description': list(self.description), 'mstats': self.copy_mstats(self.mstats)}
+        for key in ('required', 'exclude_in', 'subclass_merge_ids'):
+            if hasattr(self, key):
+                template[key] = getattr(self, key)
+        return template
+
+    def load_expanded_def_template(self, template):
+        """ Setup expanded definition and member stats from template saved by
+        make_expanded_def_template.  This does what get_expanded_def_and_includes and
+        get_member_stats would do for this group."""
+        self.expanded_def = dict(template['expanded_def'])
+        self.includes = template['includes']
+        self.id_sources = template['id_sources']
+        self.merged = template['merged']
+        self.attributes = self.copy_attributes(template['attributes'])
+        self.description = list(template['description'])
+        self.mstats = self.copy_mstats(template['mstats'])
+        for key in ('required', 'exclude_in'):
+            if key in template:
+                setattr(self, key, template[key])
+        if hasattr(self, 'scratch_group'):
+            return
+        if 'subclass_merge_ids' in template:
+            self.subclass_merge_ids = list(template['subclass_merge_ids'])
+            self.file.subclassed_nodes['merge'].append(self)
+        subclass_include_count = len([mid for mid in self.includes
+            if self.includes[mid]['source'] == "subclass"])
+        if subclass_include_count > 1:
+            self.file.subclassed_nodes["include"].append(self)
+
+    def copy_attributes(self, attributes):
+        """ Copy attribute definitions.  Each attribute is copied since
+        values ('nv', 'ddt') are stored in it for each node."""
+        return dict((aid, dict(attributes[aid])) for aid in attributes)
+
+    def copy_mstats(self, mstats):
+        """ Copy member stats with new (empty) list of created nodes for each member"""
+        new_mstats = {}
+        for id in mstats:
+            minfo = dict(mstats[id])
+            minfo['created'] = []
+            new_mstats[id] = minfo
+        return new_mstats
+
     def check_mstats_for_autogen(self):
         """ Check for any members (groups or datasets) within this group that are 
         created by autogen.  If found, save the information necessary to create them
@@ -6220,6 +7522,15 @@ class Group(Node):
         grp = Group(self.file, sdef, name, path, attrs, parent)
         return grp
         
+    def get_members(self):
+        """ Returns list of nodes (groups and datasets) that are members of this group.
+        If the file was opened with option lazy_load, members are loaded if needed."""
+        self.file.load_lazy_group(self.full_path)
+        members = []
+        for id in self.mstats:
+            members.extend(self.mstats[id]['created'])
+        return members
+
     def get_node(self, path, abort=True):
         """ Returns node specified by path.  If path is relative, e.g. does
         not start with '/') Node specified is inside the current group.  If path is absolute,
@@ -0,0 +1,319 @@
+
+# program to make h5diffsig 'signatures' of many hdf5 (nwb) files using a pool of processes
+
+import sys
+import os
+import json
+import time
+import hashlib
+import multiprocessing
+import nwb.h5diffsig as h5diffsig
+try:
+    from StringIO import StringIO  # py2
+except ImportError:
+    from io import StringIO  # py3
+
+# options used by each worker process, and True if a cache is used (so a hash of each
+# file is needed).  Set by init_worker
+worker_options = None
+worker_use_cache = False
+
+# h5diffsig options allowed for making signatures.  'P' is not allowed because the worker
+# processes cannot start their own pool
+possible_options = "NaS"
+
+# modules whose source determines the signature.  If any change, signatures saved in the
+# cache are not used
+signature_modules = ("h5diffsig.py", "value_summary.py", "combine_messages.py")
+
+
+def find_hdf5_files(input_dir_or_file, extensions=("nwb", "h5")):
+    """ Return list of (input_file, output_name) for files to make signatures for.
+    input_dir_or_file is either a directory (all files ending with one of the extensions
+    inside it or any subdirectory are included) or a single file.  output_name is the
+    path (relative to the output directory) of the signature file, which mirrors the
+    location of the input file, with the extension replaced by "txt"."""
+    files = []
+    if os.path.isfile(input_dir_or_file):
+        dir_path, file_name = os.path.split(input_dir_or_file)
+        extension = get_extension(file_name, extensions)
+        if extension is not None:
+            files.append((input_dir_or_file, "%stxt" % file_name[0:-len(extension)]))
+        return files
+    for dir_path, dir_names, file_names in os.walk(input_dir_or_file):
+        output_path = dir_path[len(input_dir_or_file):].lstrip("/")
+        for file_name in sorted(file_names):
+            extension = get_extension(file_name, extensions)
+            if extension is not None:
+                files.append((os.path.join(dir_path, file_name), os.path.join(output_path,
+                    "%stxt" % file_name[0:-len(extension)])))
+    return sorted(files)
+
+
+def get_extension(file_name, extensions):
+    """ Return extension in extensions that file_name ends with or None"""
+    found = [e for e in extensions if file_name.endswith(".%s" % e)]
+    return found[0] if found else None
+
+
+def get_file_hash(file_name, block_bytes=2**24):
+    """ Return sha1 of file contents, reading a block at a time"""
+    digest = hashlib.sha1()
+    with open(file_name, "rb") as f:
+        block = f.read(block_bytes)
+        while block:
+            digest.update(block)
+            block = f.read(block_bytes)
+    return digest.hexdigest()
+
+
+def get_tool_version(options):
+    """ Return string identifying the h5diffsig options and source code used to make
+    signatures, so signatures made by a different version are not taken from the cache."""
+    digest = hashlib.sha1(options.encode('utf-8'))
+    nwb_dir = os.path.dirname(os.path.abspath(h5diffsig.__file__))
+    for module in signature_modules:
+        with open(os.path.join(nwb_dir, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_cache(cache_file, version):
+    """ Return dict of cached signatures saved in cache_file by a previous run, or empty
+    dict if the file does not exist, cannot be read, or was made by a different version"""
+    if not cache_file or not os.path.isfile(cache_file):
+        return {}
+    try:
+        with open(cache_file, "r") as f:
+            saved = json.load(f)
+    except (IOError, ValueError):
+        return {}
+    if saved.get('version') != version:
+        return {}
+    return saved.get('files', {})
+
+
+def save_cache(cache_file, version, cache):
+    # write to temporary file then rename, so an interrupted run does not leave a bad cache
+    temp_file = cache_file + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump({'version': version, 'files': cache}, f, sort_keys=True)
+    if os.path.exists(cache_file):
+        os.remove(cache_file)
+    os.rename(temp_file, cache_file)
+
+
+def find_cached(input_file, cache):
+    """ Return cache entry for input_file if the file is unchanged since the entry was
+    made (same size and either same modification time or same contents), else None."""
+    entry = cache.get(os.path.abspath(input_file))
+    if entry is None:
+        return None
+    stat = os.stat(input_file)
+    if stat.st_size != entry['size']:
+        return None
+    if stat.st_mtime != entry['mtime']:
+        # file may have been copied or touched; compare contents
+        if get_file_hash(input_file) != entry['hash']:
+            return None
+        entry['mtime'] = stat.st_mtime
+    return entry
+
+
+def init_worker(options, use_cache=False):
+    """ Initialize process used to make signatures"""
+    global worker_options, worker_use_cache
+    worker_options = options
+    worker_use_cache = use_cache
+
+
+def make_signature(input_file):
+    """ Make signature for one file by running h5diffsig in this process.  Returns dict
+    with keys:  'file' - input file name, 'status' - 'made' or 'error',  'signature' - text
+    of signature (or of messages displayed, if error), 'size', 'mtime', 'hash' - size,
+    modification time and sha1 of input file (used for the cache; hash is None if no
+    cache is used, to avoid reading the file again) and 'seconds' - time used."""
+    record = {'file': input_file}
+    t0 = time.time()
+    stat = os.stat(input_file)
+    saved_stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    try:
+        h5diffsig.diff_files(input_file, filter_nwb=("N" in worker_options),
+            alpha_sort=("a" in worker_options), stream_datasets=("S" in worker_options))
+        record['status'] = 'made'
+    except (Exception, SystemExit) as e:
+        # SystemExit is raised by error_exit in h5diffsig after displaying the error
+        record['status'] = 'error'
+        print("%s: %s" % (type(e).__name__, e))
+    finally:
+        sys.stdout = saved_stdout
+    record['signature'] = output.getvalue()
+    record['size'] = stat.st_size
+    record['mtime'] = stat.st_mtime
+    record['hash'] = get_file_hash(input_file) if worker_use_cache else None
+    record['seconds'] = round(time.time() - t0, 3)
+    return record
+
+
+def make_signatures(files, output_dir, options="Na", processes=None, cache_file=None,
+    report=None):
+    """
+    Make h5diffsig signatures for many files using a pool of processes.  Each process
+    runs h5diffsig directly (rather than starting a new Python for each file).
+
+    Parameters
+    ----------
+        files: list
+        (input_file, output_name) for each file, as made by find_hdf5_files.  The
+        signature of input_file is written to output_name inside output_dir
+        (subdirectories are created as needed).
+
+        options: str (default: "Na")
+        h5diffsig options used.  Any of "N", "a" and "S".
+
+        processes: int (default: None)
+        Number of processes to use.  None uses the number of CPUs.  If 1, signatures
+        are made in the calling process.
+
+        cache_file: str (default: None)
+        Name of file used to save signatures between runs.  Files that have the same
+        size and modification time (or contents) as when a signature was saved, are
+        not processed again.  The cache is not used if the h5diffsig source or the
+        options change.  Should not be inside output_dir.  None for no cache.
+
+        report: file object (default: None)
+        If given, a line is written to it for each file as soon as the signature is
+        written.
+
+    Returns
+    -------
+        records: list
+        One dict for each file (in the order finished), with keys 'file', 'output',
+        'status' ('made', 'cached' or 'error') and 'seconds'.
+    """
+    unknown = set(options) - set(possible_options)
+    if unknown:
+        raise ValueError("Invalid h5diffsig options: %s.  Should include only: %s" % (
+            "".join(sorted(unknown)), possible_options))
+    version = get_tool_version(options)
+    cache = load_cache(cache_file, version)
+    output_names = dict(files)
+    records = []
+    tasks = []
+    for input_file, output_name in files:
+        entry = find_cached(input_file, cache)
+        if entry is not None:
+            write_signature(output_dir, output_name, entry['signature'])
+            records.append(save_record(report, {'file': input_file, 'status': 'cached',
+                'seconds': 0.0}, output_name))
+        else:
+            tasks.append(input_file)
+    if processes == 1 or len(tasks) <= 1:
+        init_worker(options, bool(cache_file))
+        results = (make_signature(task) for task in tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, init_worker, (options, bool(cache_file)))
+        results = pool.imap_unordered(make_signature, tasks)
+    try:
+        for result in results:
+            input_file = result['file']
+            write_signature(output_dir, output_names[input_file], result['signature'])
+            if result['status'] == 'made' and cache_file:
+                cache[os.path.abspath(input_file)] = dict((key, result[key]) for key in
+                    ('size', 'mtime', 'hash', 'signature'))
+            records.append(save_record(report, dict((key, result[key]) for key in
+                ('file', 'status', 'seconds')), output_names[input_file]))
+        if pool:
+            pool.close()
+    finally:
+        if pool:
+            # does nothing if pool already closed normally
+            pool.terminate()
+            pool.join()
+        if cache_file:
+            save_cache(cache_file, version, cache)
+    return records
+
+
+def write_signature(output_dir, output_name, signature):
+    output_file = os.path.join(output_dir, output_name)
+    dir_path = os.path.dirname(output_file)
+    if dir_path and not os.path.exists(dir_path):
+        os.makedirs(dir_path)
+    with open(output_file, "w") as f:
+        f.write(signature)
+
+
+def save_record(report, record, output_name):
+    record['output'] = output_name
+    if report:
+        report.write("%s %s > %s (%s seconds)\n" % (record['status'], record['file'],
+            output_name, record['seconds']))
+        report.flush()
+    return record
+
+
+def summarize(records):
+    """ Return text summarizing records made by make_signatures."""
+    counts = {}
+    for record in records:
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+    summary = "%i signatures: " % len(records) + ", ".join(["%i %s" % (
+        counts.get(status, 0), status) for status in ('made', 'cached', 'error')])
+    return summary
+
+
+def display_doc():
+    print("format is:")
+    print("python %s [<options>] <dir_or_file> <output_dir>" % sys.argv[0])
+    print("where:")
+    print("<dir_or_file> is a directory containing hdf5/nwb files (including subdirectories)")
+    print("    or a single hdf5/nwb file")
+    print("<output_dir> is the directory for storing the signature files")
+    print("<options> are:")
+    print("  -x <extensions> - comma separated list of extensions used to find files.")
+    print("        Default is 'nwb,h5'")
+    print("  -s <h5diffsig_options> - options passed to h5diffsig.  Default is 'Na'")
+    print("  -j <processes> - number of processes.  Default is number of CPUs")
+    print("  -c <cache_file> - file for saving signatures, so unchanged files are not")
+    print("        processed again.  Default is no cache")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    opts = {'-x': 'nwb,h5', '-s': 'Na', '-j': None, '-c': None}
+    paths = []
+    while args:
+        arg = args.pop(0)
+        if arg in opts and args:
+            opts[arg] = args.pop(0)
+        elif arg.startswith('-') and len(arg) > 1:
+            print("Invalid option: %s" % arg)
+            display_doc()
+            sys.exit(1)
+        else:
+            paths.append(arg)
+    if len(paths) != 2:
+        display_doc()
+        sys.exit(0 if not paths else 1)
+    input_dir_or_file, output_dir = paths
+    if not os.path.exists(input_dir_or_file):
+        print("Input <dir_or_file> does not exist: %s" % input_dir_or_file)
+        sys.exit(1)
+    if not os.path.isdir(output_dir):
+        print("Output directory does not exist: %s" % output_dir)
+        sys.exit(1)
+    try:
+        processes = int(opts['-j']) if opts['-j'] else None
+    except ValueError:
+        print("Invalid number for option -j")
+        sys.exit(1)
+    files = find_hdf5_files(input_dir_or_file, opts['-x'].split(","))
+    if not files:
+        print("No files found")
+        sys.exit(1)
+    records = make_signatures(files, output_dir, options=opts['-s'].lstrip("-"),
+        processes=processes, cache_file=opts['-c'], report=sys.stdout)
+    print(summarize(records))
@@ -6,7 +6,10 @@ from . import nwb_init as ni
 
 def open(file_name, start_time=None, mode="w-", identifier=None, description=None,
     core_spec="nwb_core.py", extensions=[], default_ns="core",
-    keep_original=False, auto_compress=True, verbosity="all"):
+    keep_original=False, auto_compress=True, verbosity="all", spec_cache_dir=None,
+    schema=None, storage_policy=None, lazy_load=False, incremental_autogen=True,
+    validation_state=None, report_sink=None, keep_messages=True, combine_messages=True,
+    write_behind=False):
     """
     Open NWB file.  Initialize identifier and description if "write" mode.
     Returns h5gate File object which is used by API to add content to the file.
@@ -47,10 +50,82 @@ def open(file_name, start_time=None, mode="w-", identifier=None, description=Non
     "<filename>.prev".
     
     **auto_compress** - If true, data is compressed automatically through the API.
-    Otherwise, the data is not automatically compressed.
+    Otherwise, the data is not automatically compressed.  Small arrays (4 KiB or
+    less) are never compressed automatically.
     
     **verbosity** - Controls how much validation output is displayed.  Options are:
     'all' (default), 'summary', and 'none'.  'none' is mainly useful for unittests.
+    
+    **spec_cache_dir** - Directory for storing compiled format specifications.  If
+    specified, the processed core_spec and extensions are saved there and reused when
+    opening other files with the same (unchanged) specification files, which makes
+    opening files faster.  If None (default) specifications are not cached.
+    
+    **schema** - Schema object made by function "make_schema" (below).  If specified,
+    the specifications already loaded in the schema are used and parameters core_spec,
+    extensions and default_ns are ignored.  Useful when opening many files in the
+    same program, since the specifications are processed only once and are shared
+    by all the files.
+    
+    **storage_policy** - Chunking and compression settings for datasets.  None (default)
+    uses the default settings (controlled by auto_compress).  Otherwise, a list of
+    rules, each a dict with optional keys selecting datasets ("id", "path", "dtype",
+    "min_bytes", "max_bytes") and keys giving h5py storage settings ("chunks",
+    "compression", "compression_opts", "shuffle", "fletcher32", "fillvalue") or
+    "chunk_bytes" (approximate chunk size).  The first rule that matches is used.
+    Example::
+    
+        [{"id": "<ElectricalSeries>/data", "compression": "gzip", "compression_opts": 4,
+            "shuffle": True, "chunk_bytes": 1024*1024},
+         {"id": "timestamps", "compression": "lzf"},
+         {"dtype": "float*", "min_bytes": 1000000, "compression": "gzip"}]
+    
+    "id" is matched to the dataset id either alone or qualified by the id of
+    the parent group (as in the example above).  Patterns may include wildcards.
+    May also be a function which is passed a dict describing the dataset (keys:
+    id, path, dtype, shape, nbytes, maxshape) and returns a dict of settings.
+    
+    **lazy_load** - If True, and mode is "r", nodes are loaded from the file when they
+    are first accessed (using get_node, or get_members of a group) instead of when
+    the file is opened.  Makes reading a few nodes from a large file much faster.
+    The file is only validated (by close) if all nodes have been loaded, which can
+    be done by calling method load_all_nodes().
+    
+    **incremental_autogen** - If True, and an existing file is being modified (mode
+    "r+" or "a"), autogen values (e.g. data_link, num_samples) are only computed,
+    updated and validated in groups containing nodes that were changed.  Makes closing
+    a large file after a small change much faster.  If False, all autogen values
+    are processed when the file is closed.
+    
+    **validation_state** - Name of a file used to save validation results for each
+    group and dataset.  If specified, nodes that have not changed since the last time
+    the file was validated (with the same specification files) are not validated
+    again; the saved results are used instead.  Makes validating a large file
+    repeatedly much faster.  If None (default), all nodes are validated.
+    
+    **report_sink** - Function called with each validation message as soon as it is
+    made (including errors and warnings found when reading or creating the file).
+    It is passed a dict with keys: "code" (kind of message, e.g. "missing_nodes"),
+    "severity" ("error", "warning" or "info"), "node_type" ("group", "dataset" or None),
+    "path" (path of node message is about), "spec_id" (e.g. "core:<TimeSeries>/") and
+    "message" (text of message).  Allows processing messages without parsing the text
+    output.  If None (default), messages are only displayed when the file is closed.
+    
+    **keep_messages** - If True (default) all validation messages are kept so they can
+    be displayed when the file is closed.  If False, messages are only counted (and
+    sent to report_sink), which limits memory used for files with many messages.
+    
+    **combine_messages** - If True (default), displayed validation messages that differ
+    only by numbers are combined into one message.  If False, each message is displayed.
+    
+    **write_behind** - If True, groups, datasets, links and attributes are queued and
+    written to the file together (parents first, grouped by parent group) when the file
+    is closed, or when values need to be read from the file.  Makes creating files
+    containing many small groups and datasets faster.  Programs that access the hdf5
+    file directly (using f.file_pointer) must call f.flush_writes() first.  The contents
+    of the file are the same, but the layout and object addresses differ (so hard link
+    object ids shown by h5diffsig differ).  If False (default), each is written when it
+    is made.
     """
     # set unicode to str if using Python 3 (which does not have unicode class)
     try:
@@ -66,6 +141,8 @@ def open(file_name, start_time=None, mode="w-", identifier=None, description=Non
     valid_modes = ("r", "r+", "w", "w-", "a")
     if mode not in valid_modes:
         errors.append("Invalid mode.  Must be one of: %s" % valid_modes)
+    if lazy_load and mode != "r":
+        errors.append("lazy_load can only be used with mode 'r'")
     file_exists = os.path.isfile(file_name)
     if not file_exists and mode in ('r', 'r+'):
         errors.append("File not found.  File must exist to use mode 'r' or 'r+'")
@@ -93,17 +170,46 @@ def open(file_name, start_time=None, mode="w-", identifier=None, description=Non
     options['keep_original'] = keep_original
     options['auto_compress'] = auto_compress
     options['verbosity'] = verbosity
+    options['spec_cache_dir'] = spec_cache_dir
+    options['storage_policy'] = storage_policy
+    options['lazy_load'] = lazy_load
+    options['incremental_autogen'] = incremental_autogen
+    options['validation_state'] = validation_state
+    options['report_sink'] = report_sink
+    options['keep_messages'] = keep_messages
+    options['combine_messages'] = combine_messages
+    options['write_behind'] = write_behind
     # options['schema_id_attr'] = "neurodata_type"
     options['custom_node_identifier'] = ["neurodata_type", "Custom"]
     # options['custom_node_identifier'] = ["schema_id", "Custom"]
-    spec_files = extensions + [core_spec] if core_spec != '-' else []
+    if schema is not None:
+        spec_files = schema.spec_files
+        default_ns = schema.default_ns
+    else:
+        spec_files = extensions + [core_spec] if core_spec != '-' else []
     # open file
-    f = g.File(file_name, spec_files, default_ns, options)
+    f = g.File(file_name, spec_files, default_ns, options, schema=schema)
     # set initial metadata and call_back for updating modification_time
-    ni.nwb_init(f, mode, start_time, identifier, description, creating_file)
+    try:
+        ni.nwb_init(f, mode, start_time, identifier, description, creating_file)
+    except BaseException:
+        f.abort()
+        raise
     return f
-    
- 
 
-    
- 
+
+def make_schema(core_spec="nwb_core.py", extensions=[], default_ns="core", spec_cache_dir=None):
+    """
+    Load and process format specifications so they can be shared by many files.
+    Returns an h5gate Schema object which can be passed to function "open" (parameter
+    "schema").  Inputs core_spec, extensions, default_ns and spec_cache_dir are the
+    same as for function "open", except core_spec cannot be "-" (specifications
+    saved in an NWB file cannot be used to make a schema).
+    """
+    if not core_spec or core_spec == '-':
+        print ("Error: core_spec must be the name of a specification file to make a schema")
+        sys.exit(1)
+    spec_files = list(extensions) + [core_spec]
+    options = {'spec_cache_dir': spec_cache_dir}
+    schema = g.Schema(spec_files, default_ns, options)
+    return schema
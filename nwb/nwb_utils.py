@@ -4,6 +4,7 @@ import sys
 import numpy as np
 import traceback
 import datetime
+from collections import OrderedDict
 
 def load_file(filename):
     """ Load content of a file.  Useful 
@@ -34,9 +35,12 @@ def create_epoch(f, name, start_time, stop_time):
     return epoch
     
     
-# for storing cache to speedup finding timeseries overlaps
-tse_cache = {}
-tse_max_num_nans = 1000
+# settings for TimestampIndex, used to speedup finding timeseries overlaps
+# number of timestamps in each block (rounded to a multiple of the chunk length if the
+# timestamps dataset is chunked)
+tse_block_length = 2**16
+# maximum number of blocks of timestamps kept in memory by each index
+tse_max_cached_blocks = 8
 
 
 def add_epoch_ts(e,  start_time, stop_time, in_epoch_name, timeseries):
@@ -62,33 +66,12 @@ def add_epoch_ts(e,  start_time, stop_time, in_epoch_name, timeseries):
         Returns:
             *nothing*
     """
-    global tse_cache, tse_max_num_nans
-    if type(timeseries) is str:
-        # ts is path to node rather than node.  Get the node
-        timeseries = e.file.get_node(timeseries)
-    elif "h5gate.Group" not in str(type(timeseries)):  # change to use string, was: is not h5gate.Group:
-        print ("Don't recognize timeseries parameter as group or path, type=%s" % type(timeseries))
-        sys.exit(1)
-    timeseries_path = timeseries.full_path   
-    if timeseries_path not in tse_cache:
-        if timeseries_path not in e.file.file_pointer:
-            sys.exit("Time series '%s' not found" % timeseries_path) 
-        # get timeseries timestamps array (or generate using starting_time and sampling rate)
-        ts = e.file.file_pointer[timeseries_path]
-        if "timestamps" in ts:
-            t = ts["timestamps"].value
-        else:
-            n = ts["num_samples"].value
-            t0 = ts["starting_time"].value
-            rate = ts["starting_time"].attrs["rate"]
-            t = t0 + np.arange(n) / rate
-        # make cached info
-        get_tse_overlap_info(t, timeseries_path)
-        # print "created tse info for %s" % timeseries_path
+    timeseries = get_timeseries_node(e.file, timeseries)
+    tse_index = get_timestamp_index(e.file, timeseries.full_path)
     # if no overlap, don't add to timeseries
     # look for overlap between epoch and time series
     # i0, i1 = find_ts_overlap(start_time, stop_time, t, timeseries_path)
-    i0, i1 = find_ts_overlap_n(start_time, stop_time, timeseries_path)
+    i0, i1 = find_ts_overlap_n(start_time, stop_time, tse_index)
     if i0 is None:
         return
     tsx = e.make_group("<timeseries_X>", in_epoch_name)
@@ -98,6 +81,233 @@ def add_epoch_ts(e,  start_time, stop_time, in_epoch_name, timeseries):
     
 
 
+def create_epochs(f, names, start_times, stop_times, timeseries_list):
+    """ Create many epochs, and add to each the time series that overlap it.
+        This does the same as calling create_epoch for each epoch, then
+        add_epoch_ts for each time series, but the overlaps between all the
+        epochs and each time series are found at the same time (using arrays) so
+        is much faster when there are many epochs.
+
+        Arguments:
+            *f* - h5gate file object
+
+            *names* (list of text) names of epochs
+
+            *start_times* (float array) start time of each epoch
+
+            *stop_times* (float array) stop time of each epoch
+
+            *timeseries_list* (list) time series to add to each epoch.  Each
+            element is either a time series (full hdf5 path or h5gate.Group
+            TimeSeries object), or a tuple: (in_epoch_name, time series) if the
+            name used in the epoch should be different than the name of the
+            time series
+
+        Returns:
+            *list of h5gate.Group* epochs created
+    """
+    start_times = np.asarray(start_times, dtype=np.float64)
+    stop_times = np.asarray(stop_times, dtype=np.float64)
+    if not (len(names) == len(start_times) == len(stop_times)):
+        print ("create_epochs: names, start_times and stop_times must have the same length, "
+            "lengths are: %i, %i, %i" % (len(names), len(start_times), len(stop_times)))
+        sys.exit(1)
+    # find overlaps of all epochs with each time series
+    overlaps = []
+    for item in timeseries_list:
+        if isinstance(item, tuple):
+            in_epoch_name, timeseries = item
+            timeseries = get_timeseries_node(f, timeseries)
+        else:
+            timeseries = get_timeseries_node(f, item)
+            in_epoch_name = timeseries.name
+        tse_index = get_timestamp_index(f, timeseries.full_path)
+        i0, i1, found = find_ts_overlaps(start_times, stop_times, tse_index)
+        overlaps.append((in_epoch_name, timeseries, i0, i1 - i0 + 1, found))
+    # create epochs and the overlapping time series in each
+    epochs = []
+    for k in range(len(names)):
+        epoch = create_epoch(f, names[k], start_times[k], stop_times[k])
+        for in_epoch_name, timeseries, idx_start, count, found in overlaps:
+            if not found[k]:
+                continue
+            tsx = epoch.make_group("<timeseries_X>", in_epoch_name)
+            tsx.set_dataset("idx_start", idx_start[k])
+            tsx.set_dataset("count", count[k])
+            tsx.make_group("timeseries", timeseries)  # makes a link to ts group
+        epochs.append(epoch)
+    return epochs
+
+
+def get_timeseries_node(f, timeseries):
+    """ Return h5gate.Group for timeseries (either the path to the group or the group)"""
+    if type(timeseries) is str:
+        # ts is path to node rather than node.  Get the node
+        timeseries = f.get_node(timeseries)
+    elif "h5gate.Group" not in str(type(timeseries)):  # change to use string, was: is not h5gate.Group:
+        print ("Don't recognize timeseries parameter as group or path, type=%s" % type(timeseries))
+        sys.exit(1)
+    return timeseries
+
+
+def get_timestamp_index(f, timeseries_path):
+    """ Return TimestampIndex for timeseries at timeseries_path in h5gate file f.
+    Indexes are saved in the file object (and removed when the file is closed), so
+    each is made only once, unless timestamps were appended to the time series."""
+    # make sure time series is created if using option write_behind
+    f.flush_writes()
+    if timeseries_path not in f.file_pointer:
+        sys.exit("Time series '%s' not found" % timeseries_path)
+    ts = f.file_pointer[timeseries_path]
+    # if timestamps were appended, use the number stored by Dataset.append
+    timestamps_node = f.path2node.get(timeseries_path + "/timestamps")
+    appended_length = getattr(timestamps_node, 'append_length', None)
+    tse_indexes = f.indexes.setdefault('timestamps', {})
+    tse_index = tse_indexes.get(timeseries_path)
+    if tse_index is None or tse_index.length != TimestampIndex.get_length(ts, appended_length):
+        tse_index = TimestampIndex(ts, timeseries_path, appended_length)
+        tse_indexes[timeseries_path] = tse_index
+        # print "created tse index for %s" % timeseries_path
+    return tse_index
+
+
+class TimestampIndex(object):
+    """ Index for finding overlaps of epochs with the timestamps of one time series
+    without reading all the timestamps into memory.  The timestamps are divided into
+    blocks and only the first and last non-NaN value in each block are saved.  These
+    are found by reading the timestamps at the block boundaries (the whole block is only
+    read if a boundary value is NaN).  To find an overlap, only the blocks containing the
+    first and last timestamp in the epoch are read.  The most recently used blocks are
+    kept in memory.  Timestamps must be increasing (ignoring NaN values).  If the time
+    series does not have timestamps, they are computed from starting_time and rate."""
+
+    def __init__(self, ts, timeseries_path, appended_length=None):
+        """ ts is the h5py group for the time series.  appended_length is the number
+        of timestamps stored if they were made using Dataset.append"""
+        self.timeseries_path = timeseries_path
+        self.length = self.get_length(ts, appended_length)
+        if "timestamps" in ts:
+            self.timestamps = ts["timestamps"]
+            chunks = self.timestamps.chunks
+            # read whole chunks, so each chunk is only decompressed once per block
+            self.block_length = (max(1, tse_block_length // chunks[0]) * chunks[0]
+                if chunks else tse_block_length)
+        else:
+            self.timestamps = None
+            self.starting_time = ts["starting_time"].value
+            self.rate = ts["starting_time"].attrs["rate"]
+            self.block_length = tse_block_length
+        self.blocks = OrderedDict()  # block number -> info made by get_tse_overlap_info
+        self.make_summaries()
+
+    @staticmethod
+    def get_length(ts, appended_length=None):
+        """ Return number of timestamps in h5py group ts (time series).  appended_length,
+        if not None, is the number stored by Dataset.append"""
+        if appended_length is not None:
+            return appended_length
+        if "timestamps" in ts:
+            return ts["timestamps"].shape[0]
+        return int(ts["num_samples"].value)
+
+    def read(self, start, stop):
+        """ Return timestamps from index start up to (not including) stop"""
+        if self.timestamps is not None:
+            return self.timestamps[start:stop]
+        # same values as computing all timestamps, then taking the slice
+        return self.starting_time + np.arange(start, stop) / self.rate
+
+    def read_points(self, indices):
+        """ Return timestamps at indices (increasing array of ints)"""
+        if self.timestamps is not None:
+            return self.timestamps[list(indices)]
+        return self.starting_time + indices / self.rate
+
+    def make_summaries(self):
+        """ Find the first and last non-NaN timestamp in each block.  Saves for each block
+        the last non-NaN value at or before the block (-inf if none) and the first non-NaN
+        value at or after the block (inf if none).  Both are increasing, so can be
+        searched to find the blocks containing the start and stop of an epoch."""
+        block_starts = np.arange(0, self.length, self.block_length, dtype=np.int64)
+        block_ends = np.minimum(block_starts + self.block_length, self.length) - 1
+        self.num_blocks = len(block_starts)
+        if self.num_blocks == 0:
+            self.max_before = self.min_after = np.zeros(0, dtype=np.float64)
+            return
+        points = np.unique(np.concatenate((block_starts, block_ends)))
+        values = self.read_points(points)
+        first = values[np.searchsorted(points, block_starts)].astype(np.float64)
+        last = values[np.searchsorted(points, block_ends)].astype(np.float64)
+        for b in np.flatnonzero(np.isnan(first) | np.isnan(last)):
+            # block boundary is NaN, read block to find first and last non-NaN values
+            block = self.read(block_starts[b], block_ends[b] + 1)
+            valid = np.flatnonzero(~np.isnan(block))
+            first[b] = block[valid[0]] if len(valid) > 0 else np.inf
+            last[b] = block[valid[-1]] if len(valid) > 0 else -np.inf
+        self.max_before = np.maximum.accumulate(last)
+        self.min_after = np.minimum.accumulate(first[::-1])[::-1]
+
+    def get_block(self, b):
+        """ Return info (made by get_tse_overlap_info) for timestamps in block b"""
+        if b in self.blocks:
+            # move to end, so least recently used blocks are first
+            info = self.blocks.pop(b)
+        else:
+            start = b * self.block_length
+            timestamps = self.read(start, min(start + self.block_length, self.length))
+            info = get_tse_overlap_info(timestamps, self.timeseries_path)
+            if len(self.blocks) >= tse_max_cached_blocks:
+                self.blocks.popitem(last=False)
+        self.blocks[b] = info
+        return info
+
+    def find_first(self, starts):
+        """ Return array with index of first non-NaN timestamp >= each value in array
+        starts, or -1 if there is none"""
+        result = np.full(len(starts), -1, dtype=np.int64)
+        # first block with a non-NaN value >= start
+        blocks = np.searchsorted(self.max_before, starts)
+        for b in np.unique(blocks[blocks < self.num_blocks]):
+            k = np.flatnonzero(blocks == b)
+            info = self.get_block(b)
+            result[k] = b * self.block_length + find_in_block(info, starts[k], "first")
+        return result
+
+    def find_last(self, stops):
+        """ Return array with index of last non-NaN timestamp <= each value in array
+        stops, or -1 if there is none"""
+        result = np.full(len(stops), -1, dtype=np.int64)
+        # last block with a non-NaN value <= stop
+        blocks = np.searchsorted(self.min_after, stops, side="right") - 1
+        for b in np.unique(blocks[blocks >= 0]):
+            k = np.flatnonzero(blocks == b)
+            info = self.get_block(b)
+            result[k] = b * self.block_length + find_in_block(info, stops[k], "last")
+        return result
+
+
+def find_in_block(info, values, which):
+    """ Return array with index (in block described by info, made by get_tse_overlap_info)
+    of the first non-NaN timestamp >= each value (if which is "first") or the last
+    non-NaN timestamp <= each value (if which is "last").  The block must contain the
+    timestamps found."""
+    times = info['ts_fixed']
+    if which == "first":
+        idx = np.searchsorted(times, values)
+    else:
+        idx = np.searchsorted(times, values, side="right") - 1
+    if info['num_nans'] == 0:
+        return idx
+    # map index of NaN values to next (if "first") or previous (if "last") non-NaN value.
+    # Index of non-NaN values is not changed
+    num_valid_before = info['num_valid_before']
+    if which == "first":
+        rank = num_valid_before[idx]
+    else:
+        rank = num_valid_before[idx + 1] - 1
+    return info['valid_index'][rank]
+
+
 # internal function
 # Finds the first element in *timestamps* that is >= *epoch_start*
 # and last element that is <= "epoch_stop"
@@ -166,110 +376,61 @@ def find_ts_overlap(start, stop, timestamps, timeseries_path):
 
 
 def get_tse_overlap_info(timestamps, timeseries_path):
-    # get info about timeseries useful to speedup finding overlaps
-    # stores info in cache
-    # this mainly setup to deal with NaN values in the timeseries
-    global tse_cache, tse_max_num_nans
+    """ Get info about timeseries (or block of timestamps from a timeseries) useful to
+    speedup finding overlaps.  This mainly setup to deal with NaN values in the timestamps.
+    Returns dict with keys:
+      'num_nans' - number of NaN values,
+      'ts_fixed' - timestamps with each NaN value replaced by the closest previous
+          non-NaN value (or next non-NaN value if at start of array), so can be searched,
+      'valid_index' - indices of non-NaN values, and
+      'num_valid_before' - number of non-NaN values before each index (prefix sum of
+          non-NaN mask, with one more element than timestamps), used to map an index to
+          the next or previous non-NaN value.
+    The last two are only included if there are NaN values.  timeseries_path is not used
+    (was used for messages).  Everything is done using arrays, so any number of NaN
+    values can be handled quickly."""
     isnan = np.isnan(timestamps)
     num_nans = np.count_nonzero(isnan)
-    if num_nans == 0 or num_nans == len(timestamps) or num_nans > tse_max_num_nans:
-        info = {'num_nans': num_nans, 'timestamps': timestamps}
-        if num_nans > tse_max_num_nans:
-            print ("Warning: more than %i NaN's (%i) in timestamps for %s, not caching" % (
-                tse_max_num_nans, num_nans, timeseries_path))
-        tse_cache[timeseries_path] = info
-        return
-    # ok, are some NaN's, but not too many
-    # build dictionary mapping each NaN index to the index of the first non-NaN value
-    # before and after it
-    nan_indicies = np.flatnonzero(isnan)
-    nans = {}
-    blocks = []
-    block_last_index = None
-    for i in range(len(nan_indicies)):
-        nani = nan_indicies[i]
-        if block_last_index is None:
-            # this is the start of a new block, there was no previous block
-            block_first_index = nani
-            block_last_index = nani
-        elif nani == block_last_index + 1:
-            # this is the continuation of a block
-            block_last_index = nani
-        else:
-            # this is the start of a new block; there was a previous block
-            # make dict lookups for items in previous block
-            block_prev_non_nan = block_first_index - 1 if block_first_index > 0 else None
-            block_next_non_nan = block_last_index + 1
-            block = (block_prev_non_nan, block_next_non_nan)
-            # save the block
-            blocks.append(block)
-            # save map from each eleent in block to block
-            for j in range(block_first_index, block_last_index + 1):
-                nans[j] = block
-            # start keeping track of new block
-            block_first_index = nani
-            block_last_index = nani
-    # save info for last block
-    block_prev_non_nan = block_first_index - 1
-    block_next_non_nan = block_last_index + 1 if block_last_index + 1 < len(timestamps) else None
-    block = (block_prev_non_nan, block_next_non_nan)
-    blocks.append(block)
-    for j in range(block_first_index, block_last_index + 1):
-        nans[j] = block
-    # make copy of timeseries with NaN values replaced by previous non-NaN values (or next
-    # non-NaN value if at start of array)
-    ts_fixed = np.copy(timestamps)
-    # replace all NaN values in array with the closest non_NaN value
-    for block in blocks:
-        block_prev_non_nan, block_next_non_nan = block
-        start_index = block_prev_non_nan + 1 if block_prev_non_nan is not None else 0
-        end_index = block_next_non_nan if block_next_non_nan is not None else len(ts_fixed)
-        value = timestamps[block_prev_non_nan] if block_prev_non_nan is not None else timestamps[block_next_non_nan]
-        for j in range(start_index, end_index):
-            # replace nan with value matching boundary, used for sorting
-            ts_fixed[j] = value
-    info = {'num_nans': num_nans, 'nans': nans, 'ts_fixed': ts_fixed}
-    tse_cache[timeseries_path] = info
-    return
+    if num_nans == 0 or num_nans == len(timestamps):
+        # no NaN values, or all NaN (no overlaps)
+        return {'num_nans': num_nans, 'ts_fixed': timestamps}
+    valid = ~isnan
+    valid_index = np.flatnonzero(valid)
+    # forward-fill: index of last non-NaN value at or before each index.  Indices before
+    # the first non-NaN value use the first non-NaN value
+    fill_index = np.where(valid, np.arange(len(timestamps)), valid_index[0])
+    fill_index = np.maximum.accumulate(fill_index)
+    info = {'num_nans': num_nans, 'ts_fixed': timestamps[fill_index],
+        'valid_index': valid_index,
+        'num_valid_before': np.concatenate(([0], np.cumsum(valid)))}
+    return info
     
 
 # Internal function, find time_series overlaps.
-# use cache to make faster, but call original if too many NaN values
-def find_ts_overlap_n(start, stop, timeseries_path):
-    global tse_cache, tse_max_num_nans
-    tse_info = tse_cache[timeseries_path]
-    num_nans = tse_info['num_nans']
-    # if no NaNs, use normal search for overlaps, else use ts_fixed and later make sure all
-    # returned values are not NaN
-    times = tse_info['timestamps'] if 'timestamps' in tse_info else tse_info['ts_fixed']
-    if num_nans > tse_max_num_nans:
-        # use brute-force, slow method of finding overlaps
-        return find_ts_overlap(start, stop, times, timeseries_path)
-    elif num_nans == len(times):
-        # all are NaNs, no overlap
-        return None, None
-    # now start searching to find overlaps
-    i0 = np.searchsorted(times, start)
-    if i0 == len(times):
-        # start time is after last timestamp, no overlap
+# Returns index of first and last timestamp in epoch, or None, None if there is no overlap.
+def find_ts_overlap_n(start, stop, tse_index):
+    i0, i1, found = find_ts_overlaps(np.array([start], dtype=np.float64),
+        np.array([stop], dtype=np.float64), tse_index)
+    if not found[0]:
         return None, None
-    if stop < times[i0]:
-        # timestamps values only before start and after stop (none overlap)
-        return None, None
-    # search for stop index
-    i1 = np.searchsorted(times[i0:], stop, side="right")
-    i1 = i1 + i0 - 1 # adjust for offset and side
-    if num_nans > 0:
-        # make sure index to retured values are not NaN
-        nans = tse_info['nans']
-        if i0 in nans:
-            i0 = nans[i0][1]
-        if i1 in nans:
-            i1 = nans[i1][0]
-    return i0, i1
+    return i0[0], i1[0]
     
   
     
+# Internal function, vectorized version of find_ts_overlap_n.  Finds overlaps
+# of all epochs (given by arrays starts and stops) with one time series, using
+# tse_index (TimestampIndex for the time series).
+# Returns arrays i0, i1 (index of first and last element in each epoch) and
+# boolean array found, which is False for epochs not overlapping the time series.
+def find_ts_overlaps(starts, stops, tse_index):
+    i0 = tse_index.find_first(starts)
+    i1 = tse_index.find_last(stops)
+    found = (i0 >= 0) & (i1 >= i0)
+    i0[~found] = 0
+    i1[~found] = 0
+    return i0, i1, found
+
+  
 ###############
 ## Imaging utilities, from: borg_modules.py
 
@@ -300,11 +461,7 @@ def add_roi_mask_pixels(seg_iface, image_plane, name, desc, pixel_list, weights,
             *nothing*
     """
     # create image out of pixel list
-    img = np.zeros((height, width))
-    for i in range(len(pixel_list)):
-        x = pixel_list[i][0]
-        y = pixel_list[i][1]
-        img[y][x] = weights[i]
+    img = make_roi_image(pixel_list, weights, width, height)
     add_masks(seg_iface, image_plane, name, desc, pixel_list, weights, img, start_time)
         
         
@@ -330,16 +487,122 @@ def add_roi_mask_img(seg_iface, image_plane, name, desc, img, start_time=0):
         Returns:
             *nothing*
     """
-    # create pixel list out of image
-    pixel_list = []
-    weights = []
-    for y in range(len(img)):
-        row = img[y]
-        for x in range(len(row)):
-            if row[x] != 0:
-                pixel_list.append([x, y])
-                weights.append(row[x])
-    add_masks(seg_iface, image_plane, name, pixel_list, weights, img, start_time)
+    # create pixel list out of image, pixels in order of rows (y), then columns (x)
+    img = np.asarray(img)
+    y, x = np.nonzero(img)
+    pixel_list = np.column_stack((x, y))
+    weights = img[y, x]
+    add_masks(seg_iface, image_plane, name, desc, pixel_list, weights, img, start_time)
+
+
+def add_roi_masks(seg_iface, image_plane, names, descs, masks, weights=None,
+    width=None, height=None, start_time=0):
+    """ Adds many ROIs to an imaging plane at once.  This does the same as calling
+        add_roi_mask_pixels or add_roi_mask_img for each ROI, but the pixel lists and
+        images for all ROIs are made using arrays, so is much faster when there are
+        many ROIs.
+
+        Args:
+            *seg_iface* (h5gate Group object) ImageSegmentation folder
+
+            *image_plane* (text) name of imaging plane
+
+            *names* (list of text) name of each ROI
+
+            *descs* (list of text) description of each ROI
+
+            *masks* ROIs, in one of the following forms:
+                label image - 2D int array ([y][x]) with the number of the ROI
+                    each pixel is in (1 for names[0], 2 for names[1], ...) or 0 if none.
+                    Pixel weights are given by *weights* (2D float array, same shape) or
+                    are 1.0 if *weights* is None.
+                sparse matrix - (e.g. scipy.sparse.coo_matrix) with one row for
+                    each ROI and one column for each pixel (column is y * width + x).
+                    Values are the pixel weights.  Can also be given as a tuple of
+                    arrays (row, column, weight) in COO format.
+                list of pixel lists - one for each ROI, each a 2D int array of [x,y]
+                    pixel values.  *weights* is a list of float arrays (weights of the
+                    pixels in each ROI), or None if all weights are 1.0.
+
+            *width* (int) width of reference image, in pixels.  Not needed for label image
+
+            *height* (int) height of reference image, in pixels.  Not needed for label image
+
+            *start_time* (double) <ignore for now>
+
+        Returns:
+            *nothing*
+    """
+    if len(names) != len(descs):
+        print ("add_roi_masks: names and descs must have the same length, lengths are: "
+            "%i, %i" % (len(names), len(descs)))
+        sys.exit(1)
+    num_rois = len(names)
+    roi, x, y, w, width, height = get_roi_pixels(masks, weights, num_rois, width, height)
+    # order pixels by ROI, keeping the order of pixels within each ROI
+    order = np.argsort(roi, kind="mergesort")
+    roi, x, y, w = roi[order], x[order], y[order], w[order]
+    bounds = np.searchsorted(roi, np.arange(num_rois + 1))
+    ip = get_image_plane(seg_iface, image_plane)
+    for k in range(num_rois):
+        i0, i1 = bounds[k], bounds[k + 1]
+        pixel_list = np.column_stack((x[i0:i1], y[i0:i1]))
+        img = make_roi_image(pixel_list, w[i0:i1], width, height)
+        write_roi(ip, names[k], descs[k], pixel_list, w[i0:i1], img)
+
+
+def get_roi_pixels(masks, weights, num_rois, width, height):
+    """ Internal function.  Convert masks given to add_roi_masks into arrays with the
+    ROI number (0, 1, ...), x, y and weight of each pixel.  Returns tuple:
+    (roi, x, y, weight, width, height)."""
+    if hasattr(masks, "tocoo") or (isinstance(masks, tuple) and len(masks) == 3):
+        # sparse matrix, one row per ROI
+        if width is None:
+            print ("add_roi_masks: width must be given for sparse matrix")
+            sys.exit(1)
+        if hasattr(masks, "tocoo"):
+            coo = masks.tocoo()
+            masks = (coo.row, coo.col, coo.data)
+        roi = np.asarray(masks[0], dtype=np.int64)
+        pixel = np.asarray(masks[1], dtype=np.int64)
+        y, x = pixel // width, pixel % width
+        w = np.asarray(masks[2], dtype=np.float64)
+    elif isinstance(masks, np.ndarray) and masks.ndim == 2 and masks.dtype.kind in "iu":
+        # label image
+        height, width = masks.shape
+        y, x = np.nonzero(masks)
+        roi = masks[y, x].astype(np.int64) - 1
+        w = (np.asarray(weights, dtype=np.float64)[y, x] if weights is not None
+            else np.ones(len(roi)))
+    else:
+        # list of pixel lists
+        if len(masks) != num_rois:
+            print ("add_roi_masks: expected %i pixel lists, found %i" % (num_rois, len(masks)))
+            sys.exit(1)
+        counts = [len(pixel_list) for pixel_list in masks]
+        roi = np.repeat(np.arange(num_rois), counts)
+        pixels = (np.concatenate([np.asarray(p, dtype=np.int64).reshape(-1, 2) for p in masks])
+            if num_rois > 0 else np.zeros((0, 2), dtype=np.int64))
+        x, y = pixels[:, 0], pixels[:, 1]
+        w = (np.concatenate([np.asarray(wt, dtype=np.float64).reshape(-1) for wt in weights])
+            if weights is not None and num_rois > 0 else np.ones(len(roi)))
+    if width is None or height is None:
+        print ("add_roi_masks: width and height must be given for sparse matrix or pixel lists")
+        sys.exit(1)
+    if len(roi) > 0 and (roi.min() < 0 or roi.max() >= num_rois):
+        print ("add_roi_masks: masks have ROI numbers outside range of names (%i ROIs)" %
+            num_rois)
+        sys.exit(1)
+    return (roi, x, y, w, width, height)
+
+
+def make_roi_image(pixel_list, weights, width, height):
+    """ Internal function.  Return 2D image ([y][x]) with weights at pixels in pixel_list
+    (array of [x,y] values) and zero elsewhere."""
+    img = np.zeros((height, width))
+    pixels = np.asarray(pixel_list, dtype=np.int64).reshape(-1, 2)
+    img[pixels[:, 1], pixels[:, 0]] = weights
+    return img
 
 def add_masks(seg_iface, image_plane, name, desc, pixel_list, weights, img, start_time):
     """ Internal/private function to store the masks. 
@@ -369,6 +632,13 @@ def add_masks(seg_iface, image_plane, name, desc, pixel_list, weights, img, star
         Returns:
             *nothing*
     """
+    ip = get_image_plane(seg_iface, image_plane)
+    write_roi(ip, name, desc, pixel_list, weights, img)
+
+
+def get_image_plane(seg_iface, image_plane):
+    """ Internal function.  Return group for imaging plane inside ImageSegmentation
+    folder seg_iface, creating it if it doesn't exist"""
     # create folder for imaging plane if it doesn't exist
     #- if image_plane not in self.iface_folder:
     folder_path = seg_iface.full_path + "/" + image_plane
@@ -380,6 +650,12 @@ def add_masks(seg_iface, image_plane, name, desc, pixel_list, weights, img, star
         #- self.roi_list[image_plane] = []
     #- else:
     #-    ip = self.iface_folder[image_plane]
+    return ip
+
+
+def write_roi(ip, name, desc, pixel_list, weights, img):
+    """ Internal function.  Create ROI group inside imaging plane ip, storing the
+    pixel list, weights and image mask"""
     # create ROI folder
     #- ip.create_group(name)
     roi_folder = ip.make_group("<roi_name>", name)
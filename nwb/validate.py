@@ -5,7 +5,8 @@ import sys
 import nwb.nwb_file as nwb_file
 # import cProfile  # for profiling
 
-def validate_file(name, core_spec="nwb_core.py", extensions=None, verbosity="all"):
+def validate_file(name, core_spec="nwb_core.py", extensions=None, verbosity="all",
+    spec_cache_dir=None, validation_state=None, report_sink=None, keep_messages=True):
     """
     Parameters
     ----------
@@ -21,6 +22,23 @@ def validate_file(name, core_spec="nwb_core.py", extensions=None, verbosity="all
         verbosity: string (default: 'all')
         Controls how much validation output is displayed.  Options are:
         'all', 'summary', and 'none'
+
+        spec_cache_dir: string (default: None)
+        Directory for caching compiled specifications.  Speeds up validating
+        many files that use the same specifications.
+
+        validation_state: string (default: None)
+        File for saving validation results of each node.  Nodes that have not
+        changed since the file was last validated are not validated again.
+
+        report_sink: function (default: None)
+        Function called with each validation message as it is made.  It is passed
+        a dict with keys: 'code', 'severity', 'node_type', 'path', 'spec_id' and
+        'message'.  See function open in nwb_file.py.
+
+        keep_messages: boolean (default: True)
+        If False, messages are only counted and sent to report_sink, not kept
+        for display.  Limits memory used for files with many messages.
         
 
     Returns
@@ -34,7 +52,9 @@ def validate_file(name, core_spec="nwb_core.py", extensions=None, verbosity="all
     if extensions is None:
         extensions = []
     # to validate, open the file in read-only mode, then close it
-    f = nwb_file.open(name, mode="r", core_spec=core_spec, extensions=extensions, verbosity=verbosity)
+    f = nwb_file.open(name, mode="r", core_spec=core_spec, extensions=extensions, verbosity=verbosity,
+        spec_cache_dir=spec_cache_dir, validation_state=validation_state,
+        report_sink=report_sink, keep_messages=keep_messages)
     validation_result = f.close()
     return validation_result
 
@@ -0,0 +1,243 @@
+
+# program to validate many nwb files using a pool of processes
+
+import sys
+import os
+import glob
+import json
+import time
+import signal
+import multiprocessing
+import nwb.nwb_file as nwb_file
+try:
+    from StringIO import StringIO  # py2
+except ImportError:
+    from io import StringIO  # py3
+
+# settings and schema used by each worker process.  Set by init_worker so the
+# format specifications are loaded only once in each process
+worker_settings = None
+worker_schema = None
+# set when the timer for validating a file expires (see raise_timeout)
+timer_expired = False
+
+
+class ValidationTimeout(Exception):
+    """ Raised when validating a file takes longer than the timeout."""
+    pass
+
+
+def raise_timeout(signum, frame):
+    # exception might be ignored if raised in a finalizer (e.g. when collecting h5py
+    # objects), so also save that time has expired
+    global timer_expired
+    timer_expired = True
+    raise ValidationTimeout()
+
+
+def find_nwb_files(paths):
+    """ Return sorted list of files given by paths.  Each path is either a directory
+    (all files ending in ".nwb" inside it or any subdirectory are included) or a
+    file name which may contain wildcards (glob pattern)."""
+    file_names = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, dir_names, names in os.walk(path):
+                file_names.update([os.path.join(dir_path, name) for name in names
+                    if name.endswith(".nwb")])
+        else:
+            file_names.update([name for name in glob.glob(path) if os.path.isfile(name)])
+    return sorted(file_names)
+
+
+def init_worker(core_spec, extensions, spec_cache_dir):
+    """ Initialize process used to validate files.  Makes the schema (processed
+    format specifications) used for all files validated by the process."""
+    global worker_settings, worker_schema
+    worker_settings = {'core_spec': core_spec, 'extensions': list(extensions),
+        'spec_cache_dir': spec_cache_dir}
+    if core_spec != '-':
+        worker_schema = nwb_file.make_schema(core_spec, extensions,
+            spec_cache_dir=spec_cache_dir)
+    else:
+        # specifications are loaded from each file
+        worker_schema = None
+
+
+def validate_one(args):
+    """ Validate one file.  args is tuple (file_name, timeout).  Returns dict with
+    keys:  'file' - file name, 'status' - one of 'passed', 'failed' (validation
+    found errors), 'error' (file could not be validated) or 'timeout';  'errors',
+    'warnings', 'added' - counts from the validation result (if validated),
+    'message' - text displayed when the file could not be validated, and
+    'seconds' - time used."""
+    global timer_expired
+    file_name, timeout = args
+    timer_expired = False
+    record = {'file': file_name}
+    t0 = time.time()
+    # collect anything displayed (e.g. error messages and stack traces), rather than
+    # mixing it with the report
+    saved_stdout, saved_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = output, error_output = StringIO(), StringIO()
+    use_timer = timeout and hasattr(signal, 'setitimer')
+    if use_timer:
+        saved_handler = signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    f = None
+    try:
+        f = nwb_file.open(file_name, mode="r", core_spec=worker_settings['core_spec'],
+            extensions=worker_settings['extensions'], verbosity="none",
+            spec_cache_dir=worker_settings['spec_cache_dir'], schema=worker_schema)
+        validation_result = f.close()
+        if timer_expired:
+            raise ValidationTimeout()
+        record.update(validation_result)
+        record['status'] = 'passed' if validation_result['errors'] == 0 else 'failed'
+    except ValidationTimeout:
+        if f is not None:
+            # timeout while validating.  Close file now, rather than when collected
+            f.abort()
+        record['status'] = 'timeout'
+        record['message'] = "validation not finished after %s seconds" % timeout
+    except (Exception, SystemExit) as e:
+        # SystemExit is raised by error_exit in h5gate after displaying the error
+        if f is not None:
+            f.abort()
+        record['status'] = 'error'
+        message = output.getvalue().strip() or error_output.getvalue().strip()
+        record['message'] = message if message else "%s: %s" % (type(e).__name__, e)
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, saved_handler)
+        sys.stdout, sys.stderr = saved_stdout, saved_stderr
+    record['seconds'] = round(time.time() - t0, 3)
+    return record
+
+
+def validate_files(file_names, core_spec="nwb_core.py", extensions=None, processes=None,
+    timeout=None, spec_cache_dir=None, report=None):
+    """
+    Validate files using a pool of processes.  Each process loads the format
+    specifications once, then validates files given to it.
+
+    Parameters
+    ----------
+        file_names: list
+        Names of files to validate.  Function find_nwb_files can be used to make
+        this from directories or glob patterns.
+
+        core_spec, extensions, spec_cache_dir:
+        Same as for function validate_file in validate.py.  All files are validated
+        using the same specifications.
+
+        processes: int (default: None)
+        Number of processes to use.  None uses the number of CPUs.  If 1, files are
+        validated in the calling process.
+
+        timeout: number (default: None)
+        Maximum time (seconds) for validating one file.  Files taking longer are
+        reported with status 'timeout'.  None for no limit.  Only works on systems
+        that have signal.setitimer (not Windows).
+
+        report: file object (default: None)
+        If given, a line of JSON is written to it for each file as soon as the file
+        is validated (JSON lines format).
+
+    Returns
+    -------
+        records: list
+        One dict for each file (in the order validated), made by function
+        validate_one.
+    """
+    if extensions is None:
+        extensions = []
+    tasks = [(file_name, timeout) for file_name in file_names]
+    records = []
+    if processes == 1:
+        init_worker(core_spec, extensions, spec_cache_dir)
+        results = (validate_one(task) for task in tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, init_worker,
+            (core_spec, extensions, spec_cache_dir))
+        results = pool.imap_unordered(validate_one, tasks)
+    try:
+        for record in results:
+            records.append(record)
+            if report:
+                report.write(json.dumps(record, sort_keys=True) + "\n")
+                report.flush()
+        if pool:
+            pool.close()
+    finally:
+        if pool:
+            # does nothing if pool already closed normally
+            pool.terminate()
+            pool.join()
+    return records
+
+
+def summarize(records):
+    """ Return text summarizing validation records."""
+    counts = {}
+    for record in records:
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+    summary = "%i files validated: " % len(records) + ", ".join(["%i %s" % (
+        counts.get(status, 0), status) for status in ('passed', 'failed', 'error', 'timeout')])
+    return summary
+
+
+def display_doc():
+    print("format is:")
+    print("python %s [<options>] <dir_or_glob> [<dir_or_glob> ...]" % sys.argv[0])
+    print("where:")
+    print("<dir_or_glob> is a directory (all *.nwb files in it and subdirectories are validated)")
+    print("    or a file name, which may contain wildcards (quote it to prevent shell expansion)")
+    print("<options> are:")
+    print("  -e <extensions> - comma separated list of extension files")
+    print("  -c <core_spec> - core format specification file.  Default is 'nwb_core.py'.")
+    print("        Use '-c -' to load specifications saved in each file")
+    print("  -j <processes> - number of processes.  Default is number of CPUs")
+    print("  -t <seconds> - maximum time for validating each file.  Default is no limit")
+    print("  -o <report_file> - file to write report to (JSON lines).  Default is standard output")
+    print("  -d <spec_cache_dir> - directory for caching compiled specifications")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    opts = {'-e': '', '-c': 'nwb_core.py', '-j': None, '-t': None, '-o': None, '-d': None}
+    paths = []
+    while args:
+        arg = args.pop(0)
+        if arg in opts and args:
+            opts[arg] = args.pop(0)
+        elif arg.startswith('-') and len(arg) > 1:
+            print("Invalid option: %s" % arg)
+            display_doc()
+            sys.exit(1)
+        else:
+            paths.append(arg)
+    if not paths:
+        display_doc()
+        sys.exit(0)
+    extensions = opts['-e'].split(',') if opts['-e'] else []
+    try:
+        processes = int(opts['-j']) if opts['-j'] else None
+        timeout = float(opts['-t']) if opts['-t'] else None
+    except ValueError:
+        print("Invalid number for option -j or -t")
+        sys.exit(1)
+    file_names = find_nwb_files(paths)
+    if not file_names:
+        print("No files found")
+        sys.exit(1)
+    report = open(opts['-o'], "w") if opts['-o'] else sys.stdout
+    try:
+        records = validate_files(file_names, core_spec=opts['-c'], extensions=extensions,
+            processes=processes, timeout=timeout, spec_cache_dir=opts['-d'], report=report)
+    finally:
+        if opts['-o']:
+            report.close()
+    sys.stderr.write(summarize(records) + "\n")
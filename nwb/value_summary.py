@@ -210,8 +210,13 @@ def make_value_summary(val, fileObj, max_summary_length = 50):
             # try used in case is array of objects --which fails with .view
             val_view = val.view(np.byte)
         except TypeError as e:
-            # assume array of objects;  convert to list then back to numpy array and try again
-            val_view = np.array(val.tolist()).view(np.byte)
+            # assume array of objects.  If strings, convert directly to fixed length
+            # strings, otherwise convert to list then back to numpy array and try again
+            kind = get_string_kind(val)
+            if kind:
+                val_view = val.astype(kind).view(np.byte)
+            else:
+                val_view = np.array(val.tolist()).view(np.byte)
         hash = hashval(val_view)
     elif isinstance(val, unicode):
         hash = hashval(val.encode('utf-8'))
@@ -309,6 +314,137 @@ def summarize_region_reference(ref, fileObj):
 
 
 
+## Routines for making summary and hash of h5py datasets reading values a block at a time.
+## These make the same summary and hash as make_value_summary given the whole value.
+
+def iter_blocks(dset, block_bytes):
+    """ Generator returning (start, block) for consecutive blocks (slices along the first
+    dimension) of h5py dataset dset.  Each block is about block_bytes in size, rounded to
+    a multiple of the chunk length if the dataset is chunked, so chunks are only read once."""
+    length = dset.shape[0]
+    row_bytes = max(1, dset.dtype.itemsize * int(np.prod(dset.shape[1:])))
+    block_length = max(1, block_bytes // row_bytes)
+    if dset.chunks:
+        chunk_length = dset.chunks[0]
+        block_length = max(1, block_length // chunk_length) * chunk_length
+    for start in range(0, length, block_length):
+        yield (start, dset[start:start + block_length])
+
+
+def get_string_kind(val):
+    """ If val (numpy array of objects) contains only strings of the same type, return
+    numpy kind of fixed length strings made by np.array(val.tolist()), either 'S' (bytes)
+    or 'U' (unicode).  Otherwise return None."""
+    if val.size == 0:
+        return None
+    flat = val.ravel()
+    for kind, stype in (('S', bytes), ('U', unicode)):
+        if all([isinstance(v, stype) for v in flat]):
+            return kind
+    return None
+
+
+def is_vlen_string(dtype):
+    """ Return True if dtype (of h5py dataset) is variable length string"""
+    return dtype.kind == 'O' and h5py.check_dtype(vlen=dtype) in (bytes, unicode, str)
+
+
+def can_summarize_blocks(dset):
+    """ Return True if summary of h5py dataset dset can be made block by block by
+    make_dataset_summary.  This is done for arrays of numbers, fixed length strings and
+    variable length strings.  Other types (e.g. references) are read all at once."""
+    return (len(dset.shape) > 0 and dset.size > 0 and
+        (dset.dtype.kind in 'biufS' or is_vlen_string(dset.dtype)))
+
+
+class StringHash(object):
+    """ Computes hash (adler32) of variable length strings as if they were stored in a
+    numpy array of fixed length strings (the length of the longest string), which is how
+    make_value_summary hashes arrays of strings.  Strings are added in blocks, so the
+    length of the longest string is not known until all have been added.  This works
+    because zero bytes used to pad the strings do not change the sum of bytes (adler32 A),
+    and change the sum of sums (B) by an amount computed from the final length in digest.
+    For strings j = 0..N-1 with bytes b[j,t] (t = 0..L-1, padded to length L):
+        A = 1 + S
+        B = N*L + L*(N*S - P) - T   (mod 65521)
+    where S = sum of all bytes, P = sum of j * (sum of bytes in string j) and
+    T = sum of t * b[j,t] (computed from the sum of bytes at each offset t)."""
+
+    modulus = 65521
+
+    def __init__(self):
+        self.count = 0        # N, number of strings
+        self.width = 0        # L, bytes in longest string (at least one character)
+        self.byte_sum = 0     # S
+        self.index_sum = 0    # P
+        self.offset_sum = 0   # T
+        self.kind = None      # 'S' (bytes) or 'U' (unicode)
+
+    def update(self, block):
+        """ Add strings in numpy array block (objects, all bytes or all unicode, as read
+        from an h5py dataset)"""
+        flat = block.ravel()
+        if len(flat) == 0:
+            return
+        if self.kind is None:
+            self.kind = 'S' if isinstance(flat[0], bytes) else 'U'
+        fixed = flat.astype(self.kind)
+        width = fixed.dtype.itemsize
+        data = fixed.view(np.uint8).reshape(len(fixed), width)
+        # sum of bytes in each string, and of each offset in all strings
+        sums = data.sum(axis=1, dtype=np.int64) % self.modulus
+        offset_sums = data.sum(axis=0, dtype=np.int64) % self.modulus
+        indices = np.arange(self.count, self.count + len(fixed), dtype=np.int64) % self.modulus
+        self.byte_sum = (self.byte_sum + int(sums.sum())) % self.modulus
+        self.index_sum = (self.index_sum + int((indices * sums).sum())) % self.modulus
+        self.offset_sum = (self.offset_sum + int((np.arange(width, dtype=np.int64) *
+            offset_sums).sum())) % self.modulus
+        self.count += len(fixed)
+        self.width = max(self.width, width)
+
+    def digest(self):
+        """ Return hash (adler32, as integer) of strings added"""
+        a = (1 + self.byte_sum) % self.modulus
+        b = (self.count * self.width + self.width * (self.count * self.byte_sum - self.index_sum)
+            - self.offset_sum) % self.modulus
+        return (b << 16) | a
+
+
+def hash_dataset(dset, block_bytes = 2**24):
+    """ Return hash (adler32, as integer) of all values in h5py dataset dset, the same as
+    used by make_value_summary, but reading values a block at a time.  Dataset type must
+    be supported by can_summarize_blocks."""
+    if is_vlen_string(dset.dtype):
+        string_hash = StringHash()
+        for start, block in iter_blocks(dset, block_bytes):
+            if len(block) == dset.shape[0]:
+                # all strings in one block, faster to hash directly
+                kind = 'S' if isinstance(block.flat[0], bytes) else 'U'
+                return zlib.adler32(block.astype(kind).view(np.byte)) & 0xffffffff
+            string_hash.update(block)
+        return string_hash.digest()
+    hash = zlib.adler32(b"")
+    for start, block in iter_blocks(dset, block_bytes):
+        hash = zlib.adler32(block.view(np.byte), hash)
+    return hash & 0xffffffff
+
+
+def make_dataset_summary(dset, fileObj, max_summary_length = 50, block_bytes = 2**24):
+    """ Return same as make_value_summary(dset[()], fileObj, max_summary_length), but
+    reading the values of h5py dataset dset a block at a time, so memory used does not
+    depend on the size of the dataset, and variable length strings are not converted to
+    a list.  Dataset type must be supported by can_summarize_blocks."""
+    global vs_msg, vs_msg_type
+    vs_msg = vs_msg_type = None
+    # each value adds at least two characters to the prefix, so this is enough
+    prefix = get_prefix(dset[0:max_summary_length + 1], fileObj, max_summary_length)
+    if len(prefix) < max_summary_length:
+        return (prefix, vs_msg, vs_msg_type)
+    hash = hash_dataset(dset, block_bytes)
+    val_str = "%s...%s" % (prefix[0:max_summary_length - 9], int2alph(hash))
+    return (val_str, vs_msg, vs_msg_type)
+
+
 def test_value_summary():
     if version_info[0] > 2:
         # python 3 binary data
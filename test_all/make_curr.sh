@@ -15,6 +15,11 @@ logFile="curr/log.txt"
 # inside, they are used for additional consistency tests (validation and signatures).
 # Otherwise this is ignored.
 nwb_test_files_dir="nwb_test_files"
+
+# File for saving h5diffsig signatures between runs.  Signatures are not made again for
+# nwb files that have not changed (and if the h5diffsig software has not changed).
+# Must not be inside directory curr
+h5sig_cache="$cwd/h5sig_cache.json"
  
 
 # delete all files in a directory except 0_README.txt
@@ -141,7 +146,7 @@ else
     curr_ml_unittest_sig_dir="$curr_ml_unittest_dir/h5sig"
     mkdir -p $curr_ml_unittest_sig_dir
     ml_unittest_dir="../matlab_bridge/matlab_unittest"
-    python ../examples/utility_scripts/make_h5sig.py $ml_unittest_dir $curr_ml_unittest_sig_dir
+    python ../examples/utility_scripts/make_h5sig.py -c $h5sig_cache $ml_unittest_dir $curr_ml_unittest_sig_dir
 
     echo "copying example create results files"
     curr_ml_examples_dir="$curr_ml_dir/examples"
@@ -153,7 +158,7 @@ else
     echo "making signature files for matlab examples"
     curr_ml_examples_sig_dir="$curr_ml_examples_dir/h5sig"
     mkdir -p $curr_ml_examples_sig_dir
-    python ../examples/utility_scripts/make_h5sig.py $ml_examples_nwb_dir $curr_ml_examples_sig_dir
+    python ../examples/utility_scripts/make_h5sig.py -c $h5sig_cache $ml_examples_nwb_dir $curr_ml_examples_sig_dir
 
 
 fi
@@ -181,7 +186,7 @@ mkdir -p $validate_unittest_dir
 # Generate h5diffsig output for unittest nwb files
 h5sig_unittest_dir="curr/unittest/h5sig"
 mkdir -p $h5sig_unittest_dir
-python ../examples/utility_scripts/make_h5sig.py $unittest_nwb_dir $h5sig_unittest_dir
+python ../examples/utility_scripts/make_h5sig.py -c $h5sig_cache $unittest_nwb_dir $h5sig_unittest_dir
 
 
 # echo "done unittests"
@@ -254,7 +259,7 @@ cp `find $validate_output_dir -type f -name "*.txt" ! -name "README.txt"` $examp
 echo "Generating h5sig files for examples"
 examples_h5sig_dir="curr/examples/h5sig"
 mkdir -p $examples_h5sig_dir
-python ../examples/utility_scripts/make_h5sig.py $examples_created_dir $examples_h5sig_dir
+python ../examples/utility_scripts/make_h5sig.py -c $h5sig_cache $examples_created_dir $examples_h5sig_dir
 
 # Validate schema examples
 echo "validating schema files"
@@ -289,7 +294,7 @@ else
     dest="curr/$nwb_tf_dir/h5sig"
     mkdir -p $dest
     echo "Generating $dest"
-    python ../examples/utility_scripts/make_h5sig.py $nwb_test_files_dir $dest
+    python ../examples/utility_scripts/make_h5sig.py -c $h5sig_cache $nwb_test_files_dir $dest
 
     dest="curr/$nwb_tf_dir/validate"
     mkdir -p $dest
@@ -9,6 +9,7 @@ import sys
 import glob
 import os, fnmatch
 import re
+import multiprocessing
 from sys import version_info
 from nwb import value_summary as vs
 
@@ -44,13 +45,25 @@ def get_file_hash(path):
         hash = "%s%s" % (hash, hash[1]*(6-len(hash)))  # append repeats of second character
     return hash
     
-def process_files(input_dir_or_file):
+def get_file_hashes(paths, processes=None):
+    # return hashes of files in paths, using a pool of processes if there are many
+    if processes == 1 or len(paths) < 100:
+        return [get_file_hash(path) for path in paths]
+    pool = multiprocessing.Pool(processes)
+    try:
+        hashes = pool.map(get_file_hash, paths, chunksize=16)
+    finally:
+        pool.terminate()
+        pool.join()
+    return hashes
+
+def process_files(input_dir_or_file, processes=None):
     if os.path.isfile(input_dir_or_file):
         hash = get_file_hash(input_dir_or_file)
         print ("%s %s" % (hash, input_dir_or_file))
     else:
         # input_dir_or_file is a directory, processes files within it
-        output = []
+        paths = []
         output_file_name = "dirsig.txt"
         ignore_files = [output_file_name, "log.txt"]
         for dirpath, dirnames, filenames in os.walk(input_dir_or_file):
@@ -60,10 +73,11 @@ def process_files(input_dir_or_file):
                 if path in [os.path.join(input_dir_or_file, x) for x in ignore_files]:
                     # don't include signature for this file
                     continue
-                hash = get_file_hash(path)
-                output_path = path[len(input_dir_or_file):].lstrip("/")
-                output.append("%s %s" % (hash, output_path))
-                # print ("dirpath=%s, output_path=%s, filename=%s" % (dirpath, output_path, filename))
+                paths.append(path)
+                # print ("dirpath=%s, filename=%s" % (dirpath, filename))
+        hashes = get_file_hashes(paths, processes)
+        output = ["%s %s" % (hash, path[len(input_dir_or_file):].lstrip("/"))
+            for hash, path in zip(hashes, paths)]
         # write output
         output_file_path = os.path.join(input_dir_or_file, output_file_name)
         f = open(output_file_path, "w")
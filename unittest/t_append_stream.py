@@ -0,0 +1,131 @@
+#!/usr/bin/python
+import os
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test appending blocks of values to datasets with an '*unlimited*' dimension
+# TESTS appending single elements and blocks of elements to 1-D and 2-D datasets
+# TESTS space is allocated geometrically, so appending elements does not resize each time
+# TESTS append_length is the number of values appended (before close)
+# TESTS autogen num_samples uses the final length of appended data
+# TESTS epoch overlapping appended timestamps (added before file closed)
+
+# count of dataset resizes made by h5py, by dataset name
+resizes = {}
+
+def count_resizes(resize):
+    def counting_resize(self, size, axis=None):
+        resizes[self.name] = resizes.get(self.name, 0) + 1
+        resize(self, size, axis)
+    return counting_resize
+
+extension = """
+{"fs": {"stream": {
+"info": {
+    "name": "Streaming test extension",
+    "version": "1.0",
+    "date": "Oct 18, 2026",
+    "author": "test",
+    "contact": "test",
+    "description": "TimeSeries with expandable data and timestamps"},
+"schema": {
+    "<StreamSeries>/": {
+        "description": "TimeSeries that can be appended to",
+        "merge": ["core:<TimeSeries>/"],
+        "data": {
+            "description": "Multi-channel data, appended in blocks",
+            "dimensions": ["*unlimited*", "num_channels"],
+            "data_type": "float32"},
+        "timestamps": {
+            "description": "Timestamps, appended in blocks",
+            "dimensions": ["*unlimited*"],
+            "data_type": "float64!"}}
+}}}}
+"""
+
+def test_append_stream():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    ext_file = fname + "_ext.py"
+    fname = fname + ".nwb"
+    with open(ext_file, "w") as ef:
+        ef.write(extension)
+    num_channels = 4
+    data = np.arange(1003 * num_channels, dtype=np.float32).reshape(1003, num_channels)
+    times = np.arange(1003) * 0.001
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("append stream test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test appending blocks of data"
+    settings["verbosity"] = "none"
+    settings["extensions"] = [ext_file]
+    resize = h5py.Dataset.resize
+    h5py.Dataset.resize = count_resizes(resize)
+    try:
+        expected_overlaps = create_file(settings, data, times)
+    finally:
+        h5py.Dataset.resize = resize
+    os.remove(ext_file)
+    h5 = h5py.File(fname, "r")
+    ts = h5["acquisition/timeseries/stream"]
+    # 32 calls to append timestamps, resized to double size only when full (and trimmed)
+    if resizes.get(ts["timestamps"].name, 0) > 12:
+        ut.error("test_append_stream", "timestamps resized %i times" %
+            resizes[ts["timestamps"].name])
+    if ts["data"].shape != data.shape or not np.array_equal(ts["data"][()], data):
+        ut.error("test_append_stream", "data not stored correctly, shape=%s" % (ts["data"].shape,))
+    if ts["timestamps"].shape != times.shape or not np.array_equal(ts["timestamps"][()], times):
+        ut.error("test_append_stream", "timestamps not stored correctly, shape=%s" %
+            (ts["timestamps"].shape,))
+    if ts["data"].chunks is None or ts["data"].chunks[1] != num_channels:
+        ut.error("test_append_stream", "unexpected chunk shape: %s" % (ts["data"].chunks,))
+    if ts["num_samples"][()] != len(times):
+        ut.error("test_append_stream", "num_samples is %s, expected %i" % (
+            ts["num_samples"][()], len(times)))
+    for path in sorted(expected_overlaps):
+        found = ((h5[path + "/idx_start"][()], h5[path + "/count"][()])
+            if path in h5 else None)
+        if found != expected_overlaps[path]:
+            ut.error("test_append_stream", "%s overlap found %s, expected %s" % (
+                path, found, expected_overlaps[path]))
+    h5.close()
+
+
+def create_file(settings, data, times):
+    # create file, appending data and timestamps.  Returns overlaps expected for epochs
+    f = nwb_file.open(**settings)
+    ts = f.make_group("stream:<StreamSeries>", "stream", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    dset = ts.set_dataset("data", data[0:1], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    tset = ts.set_dataset("timestamps", times[0:1])
+    # append single elements, then blocks of different sizes
+    dset.append(data[1])
+    tset.append(times[1])
+    i = 2
+    expected_overlaps = {}
+    for k, size in enumerate((1,) * 26 + (7, 100, 0, 500, 368)):
+        dset.append(data[i:i+size])
+        tset.append(times[i:i+size])
+        i = i + size
+        # code reading timestamps before close must only read append_length values
+        if tset.append_length != i or f.file_pointer[tset.full_path].shape[0] < i:
+            ut.error("test_append_stream", "timestamps append_length is %i, expected %i" % (
+                tset.append_length, i))
+        # find overlap with epoch including the last timestamps appended
+        epoch = utils.create_epoch(f, "epoch_%i" % k, times[i - 1] - 0.0005, 100.0)
+        utils.add_epoch_ts(epoch, times[i - 1] - 0.0005, 100.0, "stream", ts)
+        expected_overlaps["epochs/epoch_%i/stream" % k] = (i - 1, 1)
+    f.close()
+    return expected_overlaps
+
+test_append_stream()
+print("%s PASSED" % __file__)
+
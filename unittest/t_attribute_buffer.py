@@ -0,0 +1,103 @@
+#!/usr/bin/python
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test buffering of attribute writes and skipping of unchanged attribute values
+# TESTS setting an attribute to an unchanged value does not write it again
+# TESTS setting an attribute to a value with a different type does write it
+# TESTS attributes set while buffering are written once, with the last value
+# TESTS attributes made by autogen (data_link) are stored correctly
+# TESTS value changed in place by the caller then set again is written
+# TESTS record of attributes written is removed when file is closed
+
+# count of attribute writes made by h5py, by attribute name
+writes = {}
+
+def count_writes(setitem):
+    def counting_setitem(self, name, value):
+        writes[name] = writes.get(name, 0) + 1
+        setitem(self, name, value)
+    return counting_setitem
+
+def test_attribute_buffer():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    setitem = h5py.AttributeManager.__setitem__
+    h5py.AttributeManager.__setitem__ = count_writes(setitem)
+    try:
+        create_file(fname)
+    finally:
+        h5py.AttributeManager.__setitem__ = setitem
+    h5 = h5py.File(fname, "r")
+    ts1 = h5["acquisition/timeseries/ts1"]
+    if ts1.attrs["comments"] != b"last" or ts1.attrs["description"] != b"changed":
+        ut.error("test_attribute_buffer", "buffered attribute values not stored")
+    if not np.array_equal(ts1["data"].attrs["resolution"], np.array([1, 2])):
+        ut.error("test_attribute_buffer", "attribute with changed type not stored")
+    h5.close()
+    for path in ("acquisition/timeseries/ts1", "acquisition/timeseries/ts2"):
+        val = ut.verify_attribute_present(fname, path, "data_link")
+        if not (ut.search_for_substring(val, "ts1") and ut.search_for_substring(val, "ts2")):
+            ut.error("test_attribute_buffer", "%s data_link attribute incorrect" % path)
+
+
+def create_file(fname):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("attribute buffer test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test buffering attribute writes"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    ts1 = f.make_group("<TimeSeries>", "ts1", path="/acquisition/timeseries",
+        attrs={"source": "test", "description": "original"})
+    data = ts1.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    ts1.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    ts2 = f.make_group("<TimeSeries>", "ts2", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts2.set_dataset("data", data)
+    ts2.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    # unchanged value is not written again
+    num_writes = writes.get("source", 0)
+    ts1.set_attr("source", "test")
+    if writes.get("source", 0) != num_writes:
+        ut.error("test_attribute_buffer", "unchanged attribute value written again")
+    # value with a different type is written
+    num_writes = writes.get("resolution", 0)
+    data.set_attr("resolution", 1)
+    data.set_attr("resolution", [1, 2])
+    if writes.get("resolution", 0) != num_writes + 2:
+        ut.error("test_attribute_buffer", "attribute with changed type not written")
+    # value changed in place is written again
+    num_writes = writes.get("resolution", 0)
+    resolution = np.array([1.0, 2.0])
+    data.set_attr("resolution", resolution)
+    resolution[1] = 3.0
+    data.set_attr("resolution", resolution)
+    data.set_attr("resolution", [1, 2])
+    if writes.get("resolution", 0) != num_writes + 3:
+        ut.error("test_attribute_buffer", "attribute changed in place not written")
+    # values set while buffering are written once, when flushed
+    num_writes = writes.get("comments", 0)
+    f.buffer_attributes()
+    for comments in ("first", "second", "last"):
+        ts1.set_attr("comments", comments)
+    ts1.set_attr("description", "changed")
+    if writes.get("comments", 0) != num_writes:
+        ut.error("test_attribute_buffer", "buffered attribute written before flush")
+    f.flush_attributes()
+    if writes.get("comments", 0) != num_writes + 1:
+        ut.error("test_attribute_buffer", "buffered attribute not written once when flushed")
+    f.close()
+    if f.written_attributes:
+        ut.error("test_attribute_buffer", "record of attributes written not removed")
+
+test_attribute_buffer()
+print("%s PASSED" % __file__)
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+from nwb import find_links
+
+# test autogen 'values' and 'length' computed without reading entire datasets
+# TESTS autogen 'values' (Clustering cluster_nums) found by reading target in blocks
+# TESTS autogen 'length' (TimeSeries num_samples) found from dataset shape
+# TESTS iter_dataset_blocks returns all of a chunked dataset
+
+def test_autogen_values():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    # enough values so target is read in more than one block
+    num = np.arange(600000, dtype='int32') % 37
+    create_file(fname, num)
+    cluster_nums = ut.verify_present(fname, "processing/shank_0/Clustering", "cluster_nums")
+    if list(cluster_nums) != list(range(37)):
+        ut.error("test_autogen_values", "incorrect cluster_nums: %s" % cluster_nums)
+    num_samples = ut.verify_present(fname, "acquisition/timeseries/ts", "num_samples")
+    if num_samples != len(num):
+        ut.error("test_autogen_values", "num_samples is %s, expected %i" % (num_samples, len(num)))
+    fp = h5py.File(fname, "r")
+    dset = fp["processing/shank_0/Clustering/num"]
+    blocks = list(find_links.iter_dataset_blocks(dset, 100000))
+    if len(blocks) < 2 or not np.array_equal(np.concatenate(blocks), num):
+        ut.error("test_autogen_values", "iter_dataset_blocks did not return dataset")
+    fp.close()
+
+
+def create_file(fname, num):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("autogen values test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test autogen values and length"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    mod = f.make_group("<Module>", "shank_0")
+    clu = mod.make_group("Clustering", attrs={"source": "test"})
+    clu.set_dataset("description", "test clusters")
+    clu.set_dataset("times", np.arange(len(num)) * 0.001)
+    clu.set_dataset("num", num)
+    clu.set_dataset("peak_over_rms", np.zeros(37, dtype='float32'))
+    ts = f.make_group("<TimeSeries>", "ts", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts.set_dataset("data", num, attrs={"unit": "n/a", "conversion": 1.0,
+        "resolution": 1.0})
+    ts.set_dataset("timestamps", np.arange(len(num)) * 0.001)
+    f.close()
+
+test_autogen_values()
+print("%s PASSED" % __file__)
+
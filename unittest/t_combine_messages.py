@@ -0,0 +1,52 @@
+#!/usr/bin/python
+import test_utils as ut
+from nwb import combine_messages as cm
+
+# test combining messages that differ only by numbers
+# TESTS messages with numbers in the same place are combined, showing ranges of numbers
+# TESTS template with the most messages is used, ties use the rightmost number
+# TESTS numbers inside longer numbers are not replaced
+
+def test_combine_messages():
+    messages = [
+        "some prefix trial-none",
+        "some prefix trial23",
+        "some prefix trial23/timestamps",
+        "some prefix trial23 timestamps",
+        "some prefix 32-bits, trial32",
+        "some prefix 32-bits, trial33",
+        "some prefix 32-bits, trial34",
+        "some prefix 32-bits, trial35",
+        "some prefix trial-11",
+        "some prefix trial23 and trial23 again",
+        "some prefix trial27",
+        "some prefix trial27/timestamps",
+        "some prefix trial27 timestamps",
+        "some prefix 32-bits, trial27",
+        "some prefix trial27 and trial27 again"]
+    expected = [
+        "some prefix trial-none",
+        "some prefix trial# (#=23,27)",
+        "some prefix trial#/timestamps (#=23,27)",
+        "some prefix trial# timestamps (#=23,27)",
+        "some prefix 32-bits, trial32",
+        "some prefix 32-bits, trial# (#=27,33-35)",
+        "some prefix trial-11",
+        "some prefix trial# and trial# again (#=23,27)"]
+    check(messages, expected)
+    messages = ["/epochs/epoch_%i/start_time - x%i" % (i, i) for i in (1, 2, 3, 5, 7, 8)]
+    expected = ["/epochs/epoch_#/start_time - x# (#=1-3,5,7-8)"]
+    check(messages, expected)
+    messages = ["value 123 in 12", "value 124 in 12", "value 12 in 12"]
+    expected = ["value # in 12 (#=123-124)", "value 12 in 12"]
+    check(messages, expected)
+
+
+def check(messages, expected):
+    found = cm.combine_messages(messages)
+    if found != expected:
+        ut.error("test_combine_messages", "combined messages:\n%s\ndo not match "
+            "expected:\n%s" % (found, expected))
+
+test_combine_messages()
+print("%s PASSED" % __file__)
@@ -0,0 +1,92 @@
+#!/usr/bin/python
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test creating many epochs at once
+# TESTS create_epochs makes the same epochs as create_epoch and add_epoch_ts
+# TESTS time series with NaN timestamps and time series that do not overlap epochs
+
+def test_create_epochs():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    fname1 = fname + "_1.nwb"
+    fname2 = fname + "_2.nwb"
+    names = ["epoch-%i" % i for i in range(20)]
+    starts = np.arange(20) * 0.5 - 1.0
+    stops = starts + 0.75
+    # set one epoch to be entirely inside NaN timestamps of ts2
+    starts[10], stops[10] = 3.45, 3.58
+    # create file using create_epoch and add_epoch_ts
+    f, ts_list = create_file(fname1)
+    for k in range(len(names)):
+        epoch = utils.create_epoch(f, names[k], starts[k], stops[k])
+        for ts in ts_list:
+            utils.add_epoch_ts(epoch, starts[k], stops[k], ts.name, ts)
+    f.close()
+    # create file using create_epochs
+    f, ts_list = create_file(fname2)
+    epochs = utils.create_epochs(f, names, starts, stops, ts_list[0:2] +
+        [(ts_list[2].name, ts_list[2].full_path)])
+    if len(epochs) != len(names):
+        ut.error("test_create_epochs", "expected %i epochs, found %i" % (len(names), len(epochs)))
+    f.close()
+    compare_epochs(fname1, fname2, names)
+
+
+def create_file(fname):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("create epochs test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test creating many epochs"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    t1 = np.arange(100) * 0.1
+    t2 = np.arange(100) * 0.1
+    t2[30:40] = np.nan
+    t3 = np.arange(10) * 0.1 + 50.0
+    ts_list = []
+    for i, t in enumerate((t1, t2, t3)):
+        ts = f.make_group("<TimeSeries>", "ts%i" % i, path="/acquisition/timeseries",
+            attrs={"source": "test"})
+        ts.set_dataset("data", np.ones(len(t)), attrs={"unit": "n/a",
+            "conversion": 1.0, "resolution": 1.0})
+        ts.set_dataset("timestamps", t)
+        ts_list.append(ts)
+    return f, ts_list
+
+
+def compare_epochs(fname1, fname2, names):
+    f1 = h5py.File(fname1, "r")
+    f2 = h5py.File(fname2, "r")
+    for name in names:
+        e1 = f1["epochs/" + name]
+        e2 = f2["epochs/" + name]
+        if sorted(e1.keys()) != sorted(e2.keys()):
+            ut.error("test_create_epochs", "members of %s differ: %s, %s" %
+                (name, sorted(e1.keys()), sorted(e2.keys())))
+        for key in e1:
+            if key in ("start_time", "stop_time"):
+                if e1[key][()] != e2[key][()]:
+                    ut.error("test_create_epochs", "%s/%s differs" % (name, key))
+                continue
+            if not isinstance(e1[key], h5py.Group):
+                continue
+            for member in ("idx_start", "count"):
+                if e1[key][member][()] != e2[key][member][()]:
+                    ut.error("test_create_epochs", "%s/%s/%s differs: %s, %s" % (name,
+                        key, member, e1[key][member][()], e2[key][member][()]))
+            if e1[key]["timeseries"].name != e2[key]["timeseries"].name:
+                ut.error("test_create_epochs", "%s/%s/timeseries link differs" % (name, key))
+    f1.close()
+    f2.close()
+
+test_create_epochs()
+print("%s PASSED" % __file__)
+
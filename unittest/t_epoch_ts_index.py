@@ -0,0 +1,90 @@
+#!/usr/bin/python
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test finding overlaps of epochs with time series using the timestamp index
+# TESTS idx_start and count match values found by searching all the timestamps
+# TESTS timestamps with NaN values (including at start of blocks)
+# TESTS timestamps with many scattered NaN values (more than one per block)
+# TESTS time series with starting_time and rate rather than timestamps
+# TESTS only a limited number of blocks of timestamps are kept in memory
+# TESTS index is removed when file is closed
+
+def test_epoch_ts_index():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    # use small blocks so timestamps are divided into many blocks
+    saved_block_length = utils.tse_block_length
+    utils.tse_block_length = 50
+    t1 = np.arange(5000) * 0.01
+    t1[0:5] = np.nan
+    t1[100:180] = np.nan
+    t1[500:4000:3] = np.nan
+    t1[4990:] = np.nan
+    rate = 100.0
+    starts = np.arange(40) * 0.5 - 0.2
+    stops = starts + 0.3
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("epoch timestamp index test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test finding epoch overlaps using timestamp index"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    ts1 = f.make_group("<TimeSeries>", "ts1", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts1.set_dataset("data", np.ones(len(t1)), attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    ts1.set_dataset("timestamps", t1)
+    ts2 = f.make_group("<TimeSeries>", "ts2", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts2.set_dataset("data", np.ones(1500), attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    ts2.set_dataset("starting_time", 1.0, attrs={"rate": rate})
+    ts2.set_dataset("num_samples", 1500)
+    for k in range(len(starts)):
+        epoch = utils.create_epoch(f, "epoch_%i" % k, starts[k], stops[k])
+        for ts in (ts1, ts2):
+            utils.add_epoch_ts(epoch, starts[k], stops[k], ts.name, ts)
+    tse_indexes = f.indexes['timestamps']
+    for tse_index in tse_indexes.values():
+        if len(tse_index.blocks) > utils.tse_max_cached_blocks:
+            ut.error("test_epoch_ts_index", "%i blocks kept in memory, maximum is %i" % (
+                len(tse_index.blocks), utils.tse_max_cached_blocks))
+    f.close()
+    utils.tse_block_length = saved_block_length
+    if f.indexes:
+        ut.error("test_epoch_ts_index", "indexes not removed when file closed")
+    t2 = 1.0 + np.arange(1500) / rate
+    h5 = h5py.File(fname, "r")
+    for k in range(len(starts)):
+        for name, t in (("ts1", t1), ("ts2", t2)):
+            expected = find_overlap(t, starts[k], stops[k])
+            path = "epochs/epoch_%i/%s" % (k, name)
+            if path not in h5:
+                found = None
+            else:
+                found = (h5[path + "/idx_start"][()], h5[path + "/count"][()])
+            if found != expected:
+                ut.error("test_epoch_ts_index", "%s (%s, %s) found %s, expected %s" % (
+                    path, starts[k], stops[k], found, expected))
+    h5.close()
+
+
+def find_overlap(t, start, stop):
+    # return (idx_start, count) for non-NaN timestamps t in epoch, or None if none
+    valid = ~np.isnan(t)
+    inside = np.flatnonzero(valid & (np.where(valid, t, start) >= start) &
+        (np.where(valid, t, stop) <= stop))
+    if len(inside) == 0:
+        return None
+    return (inside[0], inside[-1] - inside[0] + 1)
+
+test_epoch_ts_index()
+print("%s PASSED" % __file__)
@@ -0,0 +1,44 @@
+#!/usr/bin/python
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test reusing expanded definitions for groups of the same type
+# TESTS groups made from a cached expanded definition have their own member stats
+# TESTS groups made from a cached expanded definition have their own attributes
+
+def test_expanded_def_cache():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("expanded def cache test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test caching expanded definitions"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    ts = []
+    for i in range(3):
+        g = f.make_group("<TimeSeries>", "ts%i" % i, path="/acquisition/timeseries",
+            attrs={"source": "source %i" % i})
+        g.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+            "conversion": 1.0, "resolution": 1.0})
+        ts.append(g)
+    for i in range(1, 3):
+        if ts[i].mstats is ts[0].mstats or ts[i].mstats['data']['created'] is ts[0].mstats['data']['created']:
+            ut.error("test_expanded_def_cache", "mstats shared between groups")
+        if len(ts[i].mstats['data']['created']) != 1:
+            ut.error("test_expanded_def_cache", "wrong number of created members in %s" %
+                ts[i].full_path)
+        if ts[i].attributes['source']['nv'] != "source %i" % i:
+            ut.error("test_expanded_def_cache", "attribute value not correct in %s: %s" %
+                (ts[i].full_path, ts[i].attributes['source']['nv']))
+    f.close()
+    ut.verify_attribute_present(fname, "acquisition/timeseries/ts2", "source")
+
+test_expanded_def_cache()
+print("%s PASSED" % __file__)
+
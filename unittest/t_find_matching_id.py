@@ -0,0 +1,60 @@
+#!/usr/bin/python
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test matching nodes read from a file to the definitions in the specification
+# TESTS groups of different TimeSeries subclasses are matched to the correct id
+# TESTS matching uses a small candidate set from the idsigs index
+# TESTS ids with a unique name are candidates even if const attributes do not match
+
+def test_find_matching_id():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    types = ["<TimeSeries>", "<AnnotationSeries>", "<IntervalSeries>", "<SpatialSeries>"]
+    create_file(fname, types)
+    f = nwb_file.open(fname, mode="r", verbosity="none")
+    for i, type in enumerate(types):
+        path = "/acquisition/timeseries/ts%i" % i
+        node = f.get_node(path)
+        if node.sdef['id'] != type + "/":
+            ut.error("test_find_matching_id", "%s matched to '%s', expected '%s/'" %
+                (path, node.sdef['id'], type))
+    # index should exclude ids with a const ancestry that does not match
+    index = f.get_idsigs_index(f.idsigs['core'])
+    h5nsig = f.make_h5nsig(f.file_pointer["/acquisition/timeseries/ts1"], "ts1")
+    candidates = f.find_candidate_ids(h5nsig, index)
+    if "<AnnotationSeries>/" not in candidates or "<ElectricalSeries>/" in candidates:
+        ut.error("test_find_matching_id", "unexpected candidates: %s" % candidates)
+    # match_sigs scores id with unique (matching) name 5 without checking const attributes
+    idsigs = {"unique/": {"type": "group", "name": "unique", "name_unique": True,
+        "attrs": {"kind": {"value": "a", "const": True}}}}
+    for attrs in ({"kind": "b"}, {}):
+        h5nsig = {"type": "group", "name": "unique", "attrs": attrs}
+        candidates = f.find_candidate_ids(h5nsig, f.make_idsigs_index(idsigs))
+        if f.match_sigs(h5nsig, idsigs["unique/"]) != 5 or candidates != ["unique/"]:
+            ut.error("test_find_matching_id", "id with unique name not a candidate "
+                "for attrs %s: %s" % (attrs, candidates))
+    f.close()
+
+
+def create_file(fname, types):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("find matching id test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test matching nodes to definitions"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    for i, type in enumerate(types):
+        ts = f.make_group(type, "ts%i" % i, path="/acquisition/timeseries",
+            attrs={"source": "test"})
+        ts.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    f.close()
+
+test_find_matching_id()
+print("%s PASSED" % __file__)
+
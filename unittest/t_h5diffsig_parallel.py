@@ -0,0 +1,77 @@
+#!/usr/bin/python
+import sys
+import os
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import h5diffsig
+try:
+    from StringIO import StringIO  # py2
+except ImportError:
+    from io import StringIO  # py3
+
+# test comparing groups in parallel in h5diffsig (option 'P')
+# TESTS report made using a pool of processes matches report made using one process
+# TESTS hard links between subtrees compared by different processes are found
+# TESTS group tree is partitioned into tasks containing all groups
+
+def test_h5diffsig_parallel():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    fnames = [fname + "_%i.h5" % i for i in range(2)]
+    create_file(fnames[0], False)
+    create_file(fnames[1], True)
+    for file2 in (fnames[1], None):
+        expected = diff(fnames[0], file2, 1)
+        found = diff(fnames[0], file2, 3)
+        if found != expected:
+            ut.error("test_h5diffsig_parallel", "report using processes:\n%s\ndoes not match "
+                "report using one process:\n%s" % (found, expected))
+    if "/trial_0/data'" not in expected or "/trial_0/sub_0'" not in expected:
+        ut.error("test_h5diffsig_parallel", "hard links not found:\n%s" % expected)
+    comparison = h5diffsig.Comparison(fnames[0], fnames[1])
+    comparison.open_files()
+    groups, skip_paths = comparison.walk_groups()
+    comparison.close_files()
+    tasks = h5diffsig.partition_groups(groups, 4)
+    if len(tasks) != 4 or sorted(sum(tasks, [])) != list(range(len(groups))):
+        ut.error("test_h5diffsig_parallel", "groups not partitioned correctly: %s" % tasks)
+    for name in fnames:
+        os.remove(name)
+
+
+def diff(file1, file2, processes):
+    # return report made by h5diffsig, ignoring first lines that have the file names
+    stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    try:
+        h5diffsig.diff_files(file1, file2, alpha_sort=True, processes=processes)
+    finally:
+        sys.stdout = stdout
+    lines = output.getvalue().split("\n")
+    return "\n".join(lines[3:])
+
+
+def create_file(fname, modify):
+    f = h5py.File(fname, "w")
+    for i in range(12):
+        trial = f.create_group("trial_%i" % i)
+        trial.attrs["number"] = i
+        trial.create_dataset("data", data=np.arange(100) * i)
+        for j in range(3):
+            sub = trial.create_group("sub_%i" % j)
+            sub.create_dataset("values", data=np.linspace(0, 1, 50) + j)
+    # hard links in other subtrees, compared by other processes
+    f["analysis/data_link"] = f["trial_0/data"]
+    f["analysis/group_link"] = f["trial_0/sub_0"]
+    f["analysis/soft_link"] = h5py.SoftLink("/trial_1/data")
+    if modify:
+        f["trial_3/data"][5] = -1
+        f["trial_4"].attrs["number"] = 40
+        f.create_dataset("trial_5/extra", data=[1, 2, 3])
+    f.close()
+
+test_h5diffsig_parallel()
+print("%s PASSED" % __file__)
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+import sys
+import os
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import h5diffsig
+try:
+    from StringIO import StringIO  # py2
+except ImportError:
+    from io import StringIO  # py3
+
+# test comparing datasets block by block in h5diffsig (option 'S')
+# TESTS report is the same as when comparing datasets read into memory
+# TESTS NaN values in the same location match
+# TESTS values that differ are reported, with the first row that differs
+# TESTS datasets with identical stored chunks match
+
+def test_h5diffsig_stream():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    fnames = [fname + "_%i.h5" % i for i in range(3)]
+    data = np.arange(20000, dtype='float64').reshape(5000, 4)
+    data[10, 2] = np.nan
+    different = data.copy()
+    different[3000, 1] = -1.0
+    create_file(fnames[0], data)
+    create_file(fnames[1], data)
+    create_file(fnames[2], different)
+    # datasets with the same values match, and report is the same as without streaming
+    for file2 in (fnames[1], None):
+        expected = diff(fnames[0], file2, False)
+        found = diff(fnames[0], file2, True)
+        if found != expected:
+            ut.error("test_h5diffsig_stream", "report when streaming:\n%s\ndoes not match "
+                "report without streaming:\n%s" % (found, expected))
+    if "types match (dtype=float64, shape=(5000, 4)), but not values" in expected:
+        ut.error("test_h5diffsig_stream", "datasets with NaN values do not match")
+    found = diff(fnames[0], fnames[2], True)
+    if "differ starting at row 3000" not in found:
+        ut.error("test_h5diffsig_stream", "difference not reported:\n%s" % found)
+    # datasets only compared using stored chunks
+    ds1 = h5py.File(fnames[0], "r")["compressed"]
+    ds2 = h5py.File(fnames[1], "r")["compressed"]
+    ds3 = h5py.File(fnames[2], "r")["compressed"]
+    if (hasattr(ds1.id, 'get_chunk_info') and (not h5diffsig.raw_chunks_match(ds1, ds2)
+        or h5diffsig.raw_chunks_match(ds1, ds3))):
+        ut.error("test_h5diffsig_stream", "stored chunks not compared correctly")
+    for ds in (ds1, ds2, ds3):
+        ds.file.close()
+    for name in fnames:
+        os.remove(name)
+
+
+def diff(file1, file2, stream):
+    # return report made by h5diffsig, ignoring first lines that have the file names
+    stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    try:
+        h5diffsig.diff_files(file1, file2, alpha_sort=True, stream_datasets=stream,
+            stream_min_bytes=1000, stream_block_bytes=4000)
+    finally:
+        sys.stdout = stdout
+    lines = output.getvalue().split("\n")
+    return "\n".join(lines[3:])
+
+
+def create_file(fname, data):
+    f = h5py.File(fname, "w")
+    f.create_dataset("data", data=data)
+    f.create_dataset("compressed", data=data, chunks=(500, 4), compression="gzip")
+    f.create_dataset("ints", data=np.arange(100000, dtype='int32'), chunks=(3000,))
+    f.close()
+
+test_h5diffsig_stream()
+print("%s PASSED" % __file__)
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+import sys
+import os
+import shutil
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+from nwb import h5diffsig
+from nwb import h5sig_batch
+try:
+    from StringIO import StringIO  # py2
+except ImportError:
+    from io import StringIO  # py3
+
+# test making signatures of many files using a pool of processes
+# TESTS signatures match those made by running h5diffsig on each file
+# TESTS signatures of unchanged files are taken from the cache
+# TESTS file with a new modification time but same contents is taken from the cache
+# TESTS file that changed is processed again
+# TESTS files are not read to make a hash if no cache is used
+
+def test_h5sig_batch():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    input_dir = fname + "_in"
+    output_dir = fname + "_out"
+    cache_file = fname + "_cache.txt"
+    for dir_name in (input_dir, os.path.join(input_dir, "sub"), output_dir):
+        if not os.path.isdir(dir_name):
+            os.mkdir(dir_name)
+    fnames = [os.path.join(input_dir, "f0.nwb"), os.path.join(input_dir, "sub", "f1.nwb")]
+    for i, name in enumerate(fnames):
+        create_file(name, [1.0, 2.0, 3.0 + i])
+    files = h5sig_batch.find_hdf5_files(input_dir)
+    if files != [(fnames[0], "f0.txt"), (fnames[1], os.path.join("sub", "f1.txt"))]:
+        ut.error("test_h5sig_batch", "files found do not match: %s" % files)
+    records = h5sig_batch.make_signatures(files, output_dir, processes=2, cache_file=cache_file)
+    check_records(records, ['made', 'made'])
+    for input_file, output_name in files:
+        with open(os.path.join(output_dir, output_name), "r") as f:
+            found = f.read()
+        expected = make_signature(input_file)
+        if found != expected:
+            ut.error("test_h5sig_batch", "signature for %s:\n%s\ndoes not match h5diffsig "
+                "output:\n%s" % (input_file, found, expected))
+    records = h5sig_batch.make_signatures(files, output_dir, processes=2, cache_file=cache_file)
+    check_records(records, ['cached', 'cached'])
+    # change modification time of first file, and contents of second
+    stat = os.stat(fnames[0])
+    os.utime(fnames[0], (stat.st_atime, stat.st_mtime + 10))
+    create_file(fnames[1], [5.0, 6.0, 7.0])
+    records = h5sig_batch.make_signatures(files, output_dir, processes=2, cache_file=cache_file)
+    check_records(records, ['cached', 'made'])
+    with open(os.path.join(output_dir, files[1][1]), "r") as f:
+        if f.read() != make_signature(fnames[1]):
+            ut.error("test_h5sig_batch", "signature for changed file not made again")
+    # without a cache, hash of files is not needed
+    get_file_hash = h5sig_batch.get_file_hash
+    hashed = []
+    h5sig_batch.get_file_hash = lambda file_name: hashed.append(file_name)
+    try:
+        records = h5sig_batch.make_signatures(files, output_dir, processes=1)
+    finally:
+        h5sig_batch.get_file_hash = get_file_hash
+    check_records(records, ['made', 'made'])
+    if hashed:
+        ut.error("test_h5sig_batch", "hash made without cache: %s" % hashed)
+    shutil.rmtree(input_dir)
+    shutil.rmtree(output_dir)
+    os.remove(cache_file)
+
+
+def check_records(records, expected):
+    # check status of records (ordered by file name) matches expected
+    found = [r['status'] for r in sorted(records, key=lambda r: r['file'])]
+    if found != expected:
+        ut.error("test_h5sig_batch", "status found %s, expected %s" % (found, expected))
+
+
+def make_signature(file_name):
+    # return signature made by h5diffsig
+    stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    try:
+        h5diffsig.diff_files(file_name, filter_nwb=True, alpha_sort=True)
+    finally:
+        sys.stdout = stdout
+    return output.getvalue()
+
+
+def create_file(fname, data):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("signature batch test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test making signatures of many files"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    ts = f.make_group("<TimeSeries>", "ts1", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts.set_dataset("data", data, attrs={"unit": "n/a", "conversion": 1.0,
+        "resolution": 1.0})
+    ts.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    f.close()
+
+test_h5sig_batch()
+print("%s PASSED" % __file__)
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+from nwb import find_links
+
+# test computing only autogen values that may have changed when modifying a file
+# TESTS autogen in groups that were not changed is not computed in mode r+
+# TESTS autogen in a new group and in the target of a new link is computed
+# TESTS validation result is the same as when computing all autogen values
+
+def test_incremental_autogen():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    fnames = [fname + "_%i.nwb" % i for i in range(2)]
+    results = []
+    for fname, incremental in zip(fnames, (True, False)):
+        create_file(fname)
+        computed, result = modify_file(fname, incremental)
+        results.append(result)
+        if incremental:
+            if "/acquisition/timeseries/ts2/num_samples" in computed:
+                ut.error("test_incremental_autogen", "autogen computed in unchanged group")
+            for path in ("/acquisition/timeseries/ts0/num_samples",
+                "/acquisition/timeseries/ts3/num_samples"):
+                if path not in computed:
+                    ut.error("test_incremental_autogen", "autogen not computed: %s" % path)
+        elif "/acquisition/timeseries/ts2/num_samples" not in computed:
+            ut.error("test_incremental_autogen", "autogen not computed in all groups")
+        # timestamp_link in target of new link must be updated
+        val = ut.verify_attribute_present(fname, "acquisition/timeseries/ts0", "timestamp_link")
+        if not ut.search_for_substring(val, "ts3"):
+            ut.error("test_incremental_autogen", "timestamp_link not updated: %s" % val)
+        ut.verify_present(fname, "acquisition/timeseries/ts3", "num_samples")
+    if results[0] != results[1]:
+        ut.error("test_incremental_autogen", "validation result with incremental autogen "
+            "(%s) does not match result without (%s)" % (results[0], results[1]))
+
+
+def create_file(fname):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("incremental autogen test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test incremental autogen"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    for i in range(3):
+        add_timeseries(f, "ts%i" % i, [0.1, 0.2, 0.3])
+    f.close()
+
+
+def modify_file(fname, incremental):
+    # add a TimeSeries with timestamps linked to ts0, return paths of autogens computed
+    computed = []
+    compute_autogen = find_links.compute_autogen
+    def recording_compute_autogen(f, a):
+        computed.append(a['node_path'])
+        compute_autogen(f, a)
+    find_links.compute_autogen = recording_compute_autogen
+    try:
+        f = nwb_file.open(fname, mode="r+", verbosity="none", incremental_autogen=incremental)
+        ts0 = f.get_node("/acquisition/timeseries/ts0")
+        add_timeseries(f, "ts3", ts0.get_node("timestamps"))
+        result = f.close()
+    finally:
+        find_links.compute_autogen = compute_autogen
+    return (computed, result)
+
+
+def add_timeseries(f, name, timestamps):
+    ts = f.make_group("<TimeSeries>", name, path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    ts.set_dataset("timestamps", timestamps)
+
+test_incremental_autogen()
+print("%s PASSED" % __file__)
+
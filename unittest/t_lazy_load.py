@@ -0,0 +1,81 @@
+#!/usr/bin/python
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test reading file with option lazy_load
+# TESTS only nodes needed to reach the requested node are loaded
+# TESTS links to nodes that have not been loaded are filled in
+# TESTS validating after loading all nodes gives same result as without lazy_load
+
+def test_lazy_load():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    create_file(fname)
+    f = nwb_file.open(fname, mode="r", verbosity="none")
+    num_nodes = len(f.path2node)
+    result = f.close()
+    f = nwb_file.open(fname, mode="r", verbosity="none", lazy_load=True)
+    if len(f.path2node) != 1:
+        ut.error("test_lazy_load", "expected only root node loaded, found %i" % len(f.path2node))
+    f.get_node("/stimulus/presentation/ts2/data")
+    if "/acquisition/timeseries/ts3" in f.path2node or len(f.path2node) >= num_nodes:
+        ut.error("test_lazy_load", "nodes loaded that were not needed")
+    # link to time series not yet loaded
+    link = f.get_node("/epochs/epoch_1/ts3/timeseries")
+    if not link.link_info or link.link_info['node'] is None:
+        ut.error("test_lazy_load", "link in %s not filled in" % link.full_path)
+    elif link.link_info['node'].full_path != "/acquisition/timeseries/ts3":
+        ut.error("test_lazy_load", "link in %s to wrong node: %s" % (link.full_path,
+            link.link_info['node'].full_path))
+    epoch = f.get_node("/epochs/epoch_1")
+    names = sorted(node.name for node in epoch.get_members())
+    if names != ["start_time", "stop_time", "ts3"]:
+        ut.error("test_lazy_load", "unexpected members of epoch: %s" % names)
+    if f.get_node("/acquisition/timeseries/missing", abort=False) is not None:
+        ut.error("test_lazy_load", "found node that does not exist")
+    if f.close() is not None:
+        ut.error("test_lazy_load", "validation done without loading all nodes")
+    f = nwb_file.open(fname, mode="r", verbosity="none", lazy_load=True)
+    f.get_node("/acquisition/timeseries/ts3/timestamps")
+    f.load_all_nodes()
+    if len(f.path2node) != num_nodes:
+        ut.error("test_lazy_load", "loaded %i nodes, expected %i" % (len(f.path2node), num_nodes))
+    lazy_result = f.close()
+    if lazy_result != result:
+        ut.error("test_lazy_load", "validation result with lazy_load (%s) does not match "
+            "result without (%s)" % (lazy_result, result))
+
+
+def create_file(fname):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("lazy load test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test lazy loading"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    ts1 = f.make_group("<TimeSeries>", "ts1", path="/stimulus/templates",
+        attrs={"source": "test"})
+    d1 = ts1.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    ts1.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    ts2 = f.make_group("<TimeSeries>", "ts2", path="/stimulus/presentation",
+        attrs={"source": "test"})
+    ts2.set_dataset("data", d1)
+    ts2.set_dataset("timestamps", [0.4, 0.5, 0.6])
+    ts3 = f.make_group("<TimeSeries>", "ts3", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts3.set_dataset("data", np.arange(10.0), attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    ts3.set_dataset("timestamps", np.arange(10.0))
+    utils.create_epochs(f, ["epoch_1"], [1.0], [5.0], [ts3])
+    f.close()
+
+test_lazy_load()
+print("%s PASSED" % __file__)
+
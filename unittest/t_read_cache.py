@@ -0,0 +1,68 @@
+#!/usr/bin/python
+import h5py
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test cache of opened nodes and attributes used when reading a file
+# TESTS each attribute is read from the hdf5 file only once when reading
+# TESTS read cache is empty after file is read
+# TESTS attributes read are saved in the nodes
+
+def test_read_cache():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    create_file(fname)
+    num_attrs = count_attributes(fname)
+    # count number of attribute reads while reading the file
+    reads = [0]
+    getitem = h5py.AttributeManager.__getitem__
+    def counting_getitem(self, name):
+        reads[0] += 1
+        return getitem(self, name)
+    h5py.AttributeManager.__getitem__ = counting_getitem
+    try:
+        f = nwb_file.open(fname, mode="r", verbosity="none")
+    finally:
+        h5py.AttributeManager.__getitem__ = getitem
+    if reads[0] != num_attrs:
+        ut.error("test_read_cache", "%i attributes read, file has %i" % (reads[0], num_attrs))
+    if f.read_cache['members'] or f.read_cache['attrs']:
+        ut.error("test_read_cache", "read cache not empty after reading file")
+    ts = f.get_node("/acquisition/timeseries/ts1")
+    if ts.h5attrs.get("source") != "source 1":
+        ut.error("test_read_cache", "attribute not read, found: %s" % ts.h5attrs)
+    f.close()
+
+
+def count_attributes(fname):
+    counts = []
+    fp = h5py.File(fname, "r")
+    counts.append(len(fp.attrs))
+    fp.visititems(lambda name, obj: counts.append(len(obj.attrs)))
+    fp.close()
+    return sum(counts)
+
+
+def create_file(fname):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("read cache test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test cache used when reading"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    for i in range(3):
+        ts = f.make_group("<TimeSeries>", "ts%i" % i, path="/acquisition/timeseries",
+            attrs={"source": "source %i" % i})
+        ts.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+            "conversion": 1.0, "resolution": 1.0})
+        ts.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    f.close()
+
+test_read_cache()
+print("%s PASSED" % __file__)
+
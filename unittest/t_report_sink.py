@@ -0,0 +1,67 @@
+#!/usr/bin/python
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test sending validation messages to a report sink
+# TESTS each message is sent to the report sink as an event
+# TESTS number of events of each severity matches the validation result
+# TESTS events have the path and specification id of the node
+# TESTS with keep_messages False, messages are counted but not kept
+
+def test_report_sink():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    create_file(fname)
+    results = []
+    for keep_messages in (True, False):
+        events = []
+        f = nwb_file.open(fname, mode="r", verbosity="none", report_sink=events.append,
+            keep_messages=keep_messages)
+        result = f.close()
+        results.append((result, sorted([event['message'] for event in events])))
+        counts = {'error': 0, 'warning': 0, 'info': 0}
+        for event in events:
+            counts[event['severity']] += 1
+        if (counts['error'], counts['warning'], counts['info']) != (result['errors'],
+            result['warnings'], result['added']):
+            ut.error("test_report_sink", "event counts %s do not match result %s" % (
+                counts, result))
+        if keep_messages and sorted(f.error) != sorted([event['message'] for event in events
+            if event['code'] == 'error']):
+            ut.error("test_report_sink", "error events do not match messages kept")
+        if not keep_messages and (list(f.error) or list(f.warning)):
+            ut.error("test_report_sink", "messages kept when keep_messages is False")
+        xor = [event for event in events if event['path'] == "/acquisition/timeseries/ts1"
+            and event['severity'] == 'error']
+        if len(xor) != 1 or xor[0]['spec_id'] != "core:<TimeSeries>/":
+            ut.error("test_report_sink", "event for missing timestamps not found: %s" % xor)
+        custom = [event for event in events if event['path'] == "/analysis/custom_group"
+            and event['code'] == 'identified_custom_nodes']
+        if len(custom) != 1 or custom[0]['node_type'] != 'group':
+            ut.error("test_report_sink", "event for custom group not found: %s" % custom)
+    if results[0] != results[1]:
+        ut.error("test_report_sink", "events with keep_messages False do not match")
+
+
+def create_file(fname):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("report sink test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test report sink"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    # ts1 is missing timestamps, an error
+    ts = f.make_group("<TimeSeries>", "ts1", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    f.make_custom_group("custom_group", path="/analysis", attrs={"note": "added"})
+    f.close()
+
+test_report_sink()
+print("%s PASSED" % __file__)
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test adding many ROIs at once with add_roi_masks
+# TESTS ROIs from label image, sparse (COO) matrix and pixel lists match ROIs
+# TESTS made by add_roi_mask_pixels and add_roi_mask_img
+# TESTS ROI with no pixels
+
+def test_roi_masks():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    width, height = 20, 15
+    num_rois = 6
+    # label image, ROI 4 (label 5) has no pixels
+    rng = np.random.RandomState(2)
+    labels = rng.randint(0, num_rois + 1, (height, width))
+    labels[labels == 5] = 0
+    label_weights = rng.rand(height, width)
+    names = ["roi_%i" % k for k in range(num_rois)]
+    descs = ["ROI %i" % k for k in range(num_rois)]
+    # pixel lists and weights for each ROI (same as label image)
+    pixel_lists = []
+    weights = []
+    for k in range(num_rois):
+        y, x = np.nonzero(labels == k + 1)
+        pixel_lists.append(np.column_stack((x, y)))
+        weights.append(label_weights[y, x])
+    y, x = np.nonzero(labels)
+    coo = (labels[y, x] - 1, y * width + x, label_weights[y, x])
+    f = create_file(fname)
+    seg_iface = f.make_group("<Module>", "rois").make_group("ImageSegmentation",
+        attrs={"source": "test"})
+    for k in range(num_rois):
+        utils.add_roi_mask_pixels(seg_iface, "pixels", names[k], descs[k], pixel_lists[k],
+            weights[k], width, height)
+        img = np.zeros((height, width))
+        img[labels == k + 1] = label_weights[labels == k + 1]
+        utils.add_roi_mask_img(seg_iface, "img", names[k], descs[k], img)
+    utils.add_roi_masks(seg_iface, "labels", names, descs, labels, weights=label_weights)
+    utils.add_roi_masks(seg_iface, "coo", names, descs, coo, width=width, height=height)
+    utils.add_roi_masks(seg_iface, "lists", names, descs, pixel_lists, weights=weights,
+        width=width, height=height)
+    f.close()
+    h5 = h5py.File(fname, "r")
+    seg = h5["processing/rois/ImageSegmentation"]
+    for plane in ("img", "labels", "coo", "lists"):
+        for name in names:
+            for member in ("pix_mask", "pix_mask_weight", "img_mask", "roi_description"):
+                expected = seg["pixels"][name][member]
+                found = seg[plane][name][member]
+                if (expected.dtype != found.dtype or expected.shape != found.shape or
+                    not np.array_equal(expected[()], found[()])):
+                    ut.error("test_roi_masks", "%s/%s/%s does not match ROI made by "
+                        "add_roi_mask_pixels" % (plane, name, member))
+    if seg["labels"]["roi_4"]["pix_mask"].shape[0] != 0:
+        ut.error("test_roi_masks", "ROI without pixels has pixels")
+    h5.close()
+
+
+def create_file(fname):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("roi masks test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test adding many ROIs at once"
+    settings["verbosity"] = "none"
+    return nwb_file.open(**settings)
+
+test_roi_masks()
+print("%s PASSED" % __file__)
@@ -0,0 +1,51 @@
+#!/usr/bin/python
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test sharing one schema among multiple files
+# TESTS creating files using a schema made by make_schema
+# TESTS files opened with the same schema share specification definitions
+# TESTS validating file using a schema gives the same result as without
+
+def test_schema():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    fnames = [fname + "_%i.nwb" % i for i in range(3)]
+    schema = nwb_file.make_schema()
+    files = [create_file(name, schema) for name in fnames]
+    for f in files[1:]:
+        if f.ddef is not files[0].ddef or f.idlookups is not files[0].idlookups:
+            ut.error("test_schema", "files opened with the same schema do not share definitions")
+    for f in files:
+        f.close()
+    for name in fnames:
+        result1 = nwb_file.open(name, mode="r", verbosity="none").close()
+        result2 = nwb_file.open(name, mode="r", verbosity="none", schema=schema).close()
+        if result1 != result2:
+            ut.error("test_schema", "validation result with schema (%s) does not match "
+                "result without schema (%s)" % (result2, result1))
+
+
+def create_file(fname, schema):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("schema test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test sharing schema"
+    settings["verbosity"] = "none"
+    settings["schema"] = schema
+    f = nwb_file.open(**settings)
+    ts = f.make_group("<TimeSeries>", "ts1", path="/acquisition/timeseries")
+    ts.set_attr("source", "test")
+    ts.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    ts.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    return f
+
+test_schema()
+print("%s PASSED" % __file__)
+
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+import os
+import glob
+import shutil
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test caching of compiled format specifications
+# TESTS cache file is created when option spec_cache_dir is specified
+# TESTS validating file using cached specifications gives the same result
+
+def test_spec_cache():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".nwb"
+    else:
+        fname = "s" + __file__[1:-3] + ".nwb"
+    cache_dir = fname[:-4] + "_specs"
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    create_file(fname, cache_dir)
+    cache_files = glob.glob(os.path.join(cache_dir, "*.pkl"))
+    if len(cache_files) != 1:
+        ut.error("test_spec_cache", "expected one cache file, found: %s" % cache_files)
+    # validate without, then with cached specifications
+    result1 = validate_file(fname, None)
+    result2 = validate_file(fname, cache_dir)
+    if result1 != result2:
+        ut.error("test_spec_cache", "validation result with cache (%s) does not match "
+            "result without cache (%s)" % (result2, result1))
+    if glob.glob(os.path.join(cache_dir, "*.pkl")) != cache_files:
+        ut.error("test_spec_cache", "cache file changed when specifications did not")
+    shutil.rmtree(cache_dir)
+
+
+def create_file(fname, cache_dir):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("spec cache test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test caching compiled specifications"
+    settings["verbosity"] = "none"
+    settings["spec_cache_dir"] = cache_dir
+    f = nwb_file.open(**settings)
+    ts = f.make_group("<TimeSeries>", "ts1", path="/acquisition/timeseries")
+    ts.set_attr("source", "test")
+    ts.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    ts.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    f.close()
+
+
+def validate_file(fname, cache_dir):
+    f = nwb_file.open(fname, mode="r", verbosity="none", spec_cache_dir=cache_dir)
+    return f.close()
+
+test_spec_cache()
+print("%s PASSED" % __file__)
+
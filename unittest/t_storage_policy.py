@@ -0,0 +1,90 @@
+#!/usr/bin/python
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+
+# test selecting chunking and compression of datasets using option storage_policy
+# TESTS rules selected by qualified id, unqualified id and size
+# TESTS default settings do not compress small arrays, but do compress large ones
+# TESTS storage policy given as a function
+
+def test_storage_policy():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    fname1 = fname + "_1.nwb"
+    fname2 = fname + "_2.nwb"
+    policy = [
+        {"id": "<TimeSeries>/data", "max_bytes": 100000, "compression": "lzf",
+            "shuffle": True, "chunks": (100,)},
+        {"id": "timestamps", "compression": "gzip", "compression_opts": 9,
+            "fletcher32": True, "fillvalue": -1.0}]
+    create_file(fname1, policy)
+    h5 = h5py.File(fname1, "r")
+    check(h5, "acquisition/timeseries/small/data", "lzf", None, (100,), True)
+    check(h5, "acquisition/timeseries/small/timestamps", "gzip", 9, None, False)
+    if not h5["acquisition/timeseries/small/timestamps"].fletcher32:
+        ut.error("test_storage_policy", "fletcher32 not set for timestamps")
+    if h5["acquisition/timeseries/small/timestamps"].fillvalue != -1.0:
+        ut.error("test_storage_policy", "fillvalue not set for timestamps")
+    # large data does not match first rule (too big), so uses default settings
+    check(h5, "acquisition/timeseries/large/data", "gzip", None, None, False)
+    check(h5, "acquisition/timeseries/tiny/data", "lzf", None, (100,), True)
+    h5.close()
+    # storage policy function, then no storage policy (small arrays not compressed)
+    create_file(fname2, lambda info: {"compression": "lzf"} if info['nbytes'] > 10000 else {})
+    h5 = h5py.File(fname2, "r")
+    check(h5, "acquisition/timeseries/tiny/data", None, None, None, False)
+    check(h5, "acquisition/timeseries/large/data", "lzf", None, None, False)
+    h5.close()
+    create_file(fname2, None)
+    h5 = h5py.File(fname2, "r")
+    check(h5, "acquisition/timeseries/tiny/data", None, None, None, False)
+    check(h5, "acquisition/timeseries/large/data", "gzip", None, None, False)
+    if h5["acquisition/timeseries/large/data"].chunks[1] != 8:
+        ut.error("test_storage_policy", "default chunks do not span trailing dimension: %s" %
+            (h5["acquisition/timeseries/large/data"].chunks,))
+    h5.close()
+
+
+def check(h5, path, compression, compression_opts, chunks, shuffle):
+    dset = h5[path]
+    if dset.compression != compression:
+        ut.error("test_storage_policy", "%s compression is %s, expected %s" % (path,
+            dset.compression, compression))
+    if compression_opts is not None and dset.compression_opts != compression_opts:
+        ut.error("test_storage_policy", "%s compression_opts is %s, expected %s" % (path,
+            dset.compression_opts, compression_opts))
+    if chunks is not None and dset.chunks != chunks:
+        ut.error("test_storage_policy", "%s chunks is %s, expected %s" % (path,
+            dset.chunks, chunks))
+    if dset.shuffle != shuffle:
+        ut.error("test_storage_policy", "%s shuffle is %s, expected %s" % (path,
+            dset.shuffle, shuffle))
+
+
+def create_file(fname, policy):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("storage policy test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test storage policy"
+    settings["verbosity"] = "none"
+    settings["storage_policy"] = policy
+    f = nwb_file.open(**settings)
+    for name, data in (("tiny", np.arange(200.0)), ("small", np.arange(1000.0)),
+            ("large", np.random.randn(20000, 8))):
+        ts = f.make_group("<TimeSeries>", name, path="/acquisition/timeseries",
+            attrs={"source": "test"})
+        ts.set_dataset("data", data, dtype="float64", attrs={"unit": "n/a",
+            "conversion": 1.0, "resolution": 1.0})
+        ts.set_dataset("timestamps", np.arange(data.shape[0]) * 0.001)
+    f.close()
+
+test_storage_policy()
+print("%s PASSED" % __file__)
+
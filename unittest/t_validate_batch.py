@@ -0,0 +1,92 @@
+#!/usr/bin/python
+import sys
+import os
+import gc
+import json
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+from nwb import validate_batch
+try:
+    from StringIO import StringIO  # py2
+except ImportError:
+    from io import StringIO  # py3
+
+# test validating many files using a pool of processes
+# TESTS results from batch validation match validating each file separately
+# TESTS report is written with one line of JSON per file
+# TESTS file that cannot be read is reported with status 'error'
+# TESTS file taking longer than the timeout is reported with status 'timeout'
+# TESTS nothing is displayed (e.g. when closing file) after a timeout
+
+def test_validate_batch():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    fnames = [fname + "_%i.nwb" % i for i in range(3)]
+    for i, name in enumerate(fnames):
+        # second file is missing timestamps, an error
+        create_file(name, i != 1)
+    bad_file = fname + "_bad.nwb"
+    with open(bad_file, "w") as f:
+        f.write("not an hdf5 file\n")
+    report_file = fname + "_report.txt"
+    file_names = validate_batch.find_nwb_files([fname + "_*.nwb"])
+    if file_names != sorted(fnames + [bad_file]):
+        ut.error("test_validate_batch", "files found do not match: %s" % file_names)
+    with open(report_file, "w") as report:
+        records = validate_batch.validate_files(file_names, processes=2, report=report)
+    with open(report_file, "r") as f:
+        reported = [json.loads(line) for line in f]
+    if sorted(reported, key=lambda r: r['file']) != sorted(records, key=lambda r: r['file']):
+        ut.error("test_validate_batch", "report does not match records returned")
+    records = dict((record['file'], record) for record in records)
+    for name in fnames:
+        expected = nwb_file.open(name, mode="r", verbosity="none").close()
+        found = dict((key, records[name][key]) for key in expected)
+        if found != expected:
+            ut.error("test_validate_batch", "result for %s (%s) does not match "
+                "validating file alone (%s)" % (name, found, expected))
+        expected_status = 'passed' if expected['errors'] == 0 else 'failed'
+        if records[name]['status'] != expected_status:
+            ut.error("test_validate_batch", "status for %s is '%s', expected '%s'" % (
+                name, records[name]['status'], expected_status))
+    if records[bad_file]['status'] != 'error' or not records[bad_file]['message']:
+        ut.error("test_validate_batch", "unreadable file not reported as error: %s" %
+            records[bad_file])
+    stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    try:
+        records = validate_batch.validate_files(fnames[0:1], processes=1, timeout=0.001)
+        # file not closed would be closed (displaying a message) when collected
+        gc.collect()
+    finally:
+        sys.stdout = stdout
+    if records[0]['status'] != 'timeout':
+        ut.error("test_validate_batch", "timeout not reported: %s" % records[0])
+    if output.getvalue():
+        ut.error("test_validate_batch", "displayed after timeout: %s" % output.getvalue())
+    os.remove(bad_file)
+    os.remove(report_file)
+
+
+def create_file(fname, include_timestamps):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("batch validation test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test batch validation"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    ts = f.make_group("<TimeSeries>", "ts1", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    if include_timestamps:
+        ts.set_dataset("timestamps", [0.1, 0.2, 0.3])
+    f.close()
+
+test_validate_batch()
+print("%s PASSED" % __file__)
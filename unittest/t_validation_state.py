@@ -0,0 +1,96 @@
+#!/usr/bin/python
+import os
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+from nwb import h5gate
+
+# test saving validation results and reusing them for unchanged nodes
+# TESTS unchanged nodes are not validated again when a validation state is saved
+# TESTS validation result and messages are the same as when validating all nodes
+# TESTS nodes changed in mode r+ are validated again
+
+def test_validation_state():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    state_file = fname + "_state.json"
+    fname = fname + ".nwb"
+    if os.path.isfile(state_file):
+        os.remove(state_file)
+    create_file(fname)
+    expected = validate(fname, None)
+    first = validate(fname, state_file)
+    if not os.path.isfile(state_file):
+        ut.error("test_validation_state", "validation state file not saved")
+    second = validate(fname, state_file)
+    for result in (first, second):
+        if result['messages'] != expected['messages']:
+            ut.error("test_validation_state", "validation messages with state (%s) do not "
+                "match messages without state (%s)" % (result['messages'], expected['messages']))
+    if first['validated'] != expected['validated']:
+        ut.error("test_validation_state", "not all datasets validated when state not saved")
+    if second['validated']:
+        ut.error("test_validation_state", "unchanged datasets validated again: %s" %
+            second['validated'])
+    # change file, only changed nodes should be validated
+    result = validate(fname, state_file, modify=True)
+    if "/acquisition/timeseries/ts0/timestamps" in result['validated']:
+        ut.error("test_validation_state", "unchanged dataset validated after change")
+    if "/acquisition/timeseries/ts3/data" not in result['validated']:
+        ut.error("test_validation_state", "new dataset not validated")
+    expected = validate(fname, None)
+    result = validate(fname, state_file)
+    if result['messages'] != expected['messages']:
+        ut.error("test_validation_state", "validation messages after change (%s) do not "
+            "match messages without state (%s)" % (result['messages'], expected['messages']))
+    os.remove(state_file)
+
+
+def validate(fname, state_file, modify=False):
+    # validate file, return validation messages and paths of datasets validated
+    validated = []
+    validate_dataset = h5gate.File.validate_dataset
+    def recording_validate_dataset(self, node):
+        validated.append(node.full_path)
+        validate_dataset(self, node)
+    h5gate.File.validate_dataset = recording_validate_dataset
+    try:
+        mode = "r+" if modify else "r"
+        f = nwb_file.open(fname, mode=mode, verbosity="none", validation_state=state_file)
+        if modify:
+            add_timeseries(f, "ts3", True)
+        result = f.close()
+    finally:
+        h5gate.File.validate_dataset = validate_dataset
+    messages = (result, sorted(f.error), sorted(f.warning))
+    return {'messages': messages, 'validated': validated}
+
+
+def create_file(fname):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = utils.create_identifier("validation state test")
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test saving validation state"
+    settings["verbosity"] = "none"
+    f = nwb_file.open(**settings)
+    for i in range(3):
+        # ts1 is missing timestamps, an error
+        add_timeseries(f, "ts%i" % i, i != 1)
+    f.make_custom_group("custom_group", path="/analysis", attrs={"note": "added"})
+    f.close()
+
+
+def add_timeseries(f, name, include_timestamps):
+    ts = f.make_group("<TimeSeries>", name, path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    ts.set_dataset("data", [1.0, 2.0, 3.0], attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    if include_timestamps:
+        ts.set_dataset("timestamps", [0.1, 0.2, 0.3])
+
+test_validation_state()
+print("%s PASSED" % __file__)
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+import os
+import h5py
+import numpy as np
+import test_utils as ut
+from nwb import value_summary as vs
+
+# test making summary of datasets reading values a block at a time
+# TESTS summary is the same as made by make_value_summary from the whole value
+# TESTS hash of variable length strings made in several blocks matches
+# TESTS datasets with the same fletcher32 checksums but different values have different
+# TESTS summaries (fletcher32 does not distinguish 0 and 65535)
+
+def test_value_summary_stream():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3] + ".h5"
+    else:
+        fname = "s" + __file__[1:-3] + ".h5"
+    f = h5py.File(fname, "w")
+    vlen = h5py.special_dtype(vlen=bytes)
+    strings = np.array([("string %i" % i + "x" * (i % 23)).encode('utf-8')
+        for i in range(5000)], dtype=object)
+    f.create_dataset("vlen", data=strings, dtype=vlen, chunks=(100,))
+    f.create_dataset("short", data=strings[0:3], dtype=vlen)
+    f.create_dataset("numeric", data=np.arange(30000, dtype='int32').reshape(10000, 3),
+        chunks=(500, 3))
+    f.create_dataset("fixed", data=strings.astype('S'))
+    data = np.linspace(0.0, 1.0, 20000)
+    f.create_dataset("checksum1", data=data, chunks=(1000,), compression="gzip",
+        fletcher32=True)
+    f.create_dataset("checksum2", data=data, chunks=(1000,), compression="gzip",
+        fletcher32=True)
+    for name in ("vlen", "short", "numeric", "fixed", "checksum1"):
+        dset = f[name]
+        if not vs.can_summarize_blocks(dset):
+            ut.error("test_value_summary_stream", "cannot summarize %s by blocks" % name)
+        expected = vs.make_value_summary(dset[()], f)[0]
+        for block_bytes in (1000, 2**24):
+            found = vs.make_dataset_summary(dset, f, block_bytes=block_bytes)[0]
+            if found != expected:
+                ut.error("test_value_summary_stream", "summary of %s with block_bytes=%i is "
+                    "'%s', expected '%s'" % (name, block_bytes, found, expected))
+    # hash of strings added in several blocks
+    for values in (strings, np.array([s.decode('utf-8') + u"é" for s in strings],
+        dtype=object)):
+        string_hash = vs.StringHash()
+        for start in range(0, len(values), 700):
+            string_hash.update(values[start:start + 700])
+        expected = vs.hashval(np.array(values.tolist()).view(np.byte))
+        found = vs.int2alph(string_hash.digest())
+        if found != expected:
+            ut.error("test_value_summary_stream", "hash of strings in blocks is '%s', "
+                "expected '%s'" % (found, expected))
+    # values differ only by 0 and 65535, so fletcher32 checksums of chunks are the same
+    a = np.arange(1000, dtype='uint16')
+    a[500] = 0
+    b = a.copy()
+    b[500] = 65535
+    f.create_dataset("fletcher_a", data=a, chunks=(100,), fletcher32=True)
+    f.create_dataset("fletcher_b", data=b, chunks=(100,), fletcher32=True)
+    summaries = [vs.make_dataset_summary(f[name], f)[0] for name in ("fletcher_a", "fletcher_b")]
+    if summaries[0] == summaries[1]:
+        ut.error("test_value_summary_stream", "datasets with different values have the "
+            "same summary: '%s'" % summaries[0])
+    f.close()
+    os.remove(fname)
+
+test_value_summary_stream()
+print("%s PASSED" % __file__)
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+import sys
+import re
+import numpy as np
+import test_utils as ut
+from nwb import nwb_file
+from nwb import nwb_utils as utils
+from nwb import h5diffsig
+try:
+    from StringIO import StringIO  # py2
+except ImportError:
+    from io import StringIO  # py3
+
+# test queueing nodes and attributes created (option write_behind)
+# TESTS nodes are not created in the file until the queue is written
+# TESTS data changed by the caller after set_dataset is not stored
+# TESTS groups, datasets, links, attributes and epochs made
+# TESTS with write_behind are the same as made without it (except object ids)
+# TESTS dataset larger than write_behind_bytes is written immediately
+
+def test_write_behind():
+    if __file__.startswith("./"):
+        fname = "s" + __file__[3:-3]
+    else:
+        fname = "s" + __file__[1:-3]
+    fnames = [fname + "_queued.nwb", fname + "_direct.nwb"]
+    create_file(fnames[0], True)
+    create_file(fnames[1], False)
+    sigs = [make_signature(name) for name in fnames]
+    if sigs[0] != sigs[1]:
+        ut.error("test_write_behind", "file made with write_behind:\n%s\ndoes not match "
+            "file made without:\n%s" % (sigs[0], sigs[1]))
+
+
+def make_signature(file_name):
+    # return signature made by h5diffsig, with lines giving file name removed and
+    # object ids (which depend on location of objects in file) replaced by "id"
+    stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    try:
+        h5diffsig.diff_files(file_name, filter_nwb=True, alpha_sort=True)
+    finally:
+        sys.stdout = stdout
+    return "\n".join([re.sub(r"id=\(\d+, \d+\)", "id", line) for line in
+        output.getvalue().splitlines() if file_name not in line])
+
+
+def create_file(fname, write_behind):
+    settings = {}
+    settings["file_name"] = fname
+    settings["identifier"] = "write behind test"
+    settings["mode"] = "w"
+    settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    settings["description"] = "Test queueing nodes created"
+    settings["verbosity"] = "none"
+    settings["write_behind"] = write_behind
+    f = nwb_file.open(**settings)
+    data = np.arange(4.0)
+    ts_paths = []
+    for i in range(20):
+        ts = f.make_group("<TimeSeries>", "ts%i" % i, path="/acquisition/timeseries",
+            attrs={"source": "test %i" % i, "description": "series %i" % i})
+        ts_paths.append(ts.full_path)
+        if i == 0:
+            data_node = ts.set_dataset("data", data, attrs={"unit": "n/a",
+                "conversion": 1.0, "resolution": 1.0})
+        else:
+            # link data to that in first time series
+            ts.set_dataset("data", data_node)
+        ts.set_dataset("timestamps", data + i)
+        # change data, should not change value stored
+        data += 10
+    if write_behind and ts_paths[-1] in f.file_pointer:
+        ut.error("test_write_behind", "node created before queue written")
+    module = f.make_group("<Module>", "shank_0")
+    for i in range(20):
+        module.make_custom_group("group_%i" % i, attrs={"index": i}).set_custom_dataset(
+            "values", [i, i + 1])
+    # large dataset
+    ts = f.make_group("<TimeSeries>", "large", path="/acquisition/timeseries",
+        attrs={"source": "test"})
+    large = ts.set_dataset("data", np.zeros((200, 100)), attrs={"unit": "n/a",
+        "conversion": 1.0, "resolution": 1.0})
+    if large.full_path not in f.file_pointer:
+        ut.error("test_write_behind", "large dataset not written immediately")
+    ts.set_dataset("timestamps", np.arange(200.0))
+    # epochs, finding overlaps writes queue
+    for i in range(3):
+        epoch = utils.create_epoch(f, "epoch_%i" % i, i * 3.0, i * 3.0 + 2.5)
+        for path in ts_paths[0:5]:
+            utils.add_epoch_ts(epoch, i * 3.0, i * 3.0 + 2.5, path.split("/")[-1], path)
+    f.close()
+
+test_write_behind()
+print("%s PASSED" % __file__)